@@ -24,6 +24,7 @@
 # - "Entire Nodes.xlsx"
 # - "consumer_nodes_new.csv"
 # - "depot-x_arccs.xlsx" with x being 1 through 16
+#     -compiled into the "network_cache" directory on the first run (see zedz_model/network.py)
 # 
 # Outputs:
 # - "FinalResults - status quo dist.xlsx"
@@ -38,168 +39,39 @@
 #     -the distance driven by tour and vehicle under no policy
 # - "FinalResults - mandatory ZEDZ vehicles.xlsx"
 #     -the distance driven by tour and vehicle under a mandatory ZEDZ policy
+# - "FinalResults - monte carlo summary.xlsx" and "FinalResults - monte carlo replicates.xlsx" (only when replications > 0)
+#     -mean, percentiles and confidence intervals of the distances and tour counts over seeded replicates, and the replicates themselves
+# - the run profile, when profile_report is set (see In[4])
+#     -time, CPU time, peak memory and hot-path counters of every stage of the run
 # 
 # *Model description taken from our APP report
+# 
+# The model itself lives in the zedz_model package (see zedz_model/model.py); this script only holds the settings of a run and
+# starts it when it is run as a script or notebook, so importing it does not read any input or write any file. The same run can
+# be started from the command line with the settings in a config file: python -m zedz_model --config model.toml
 
 # In[1]:
 
 
 #Import Statements
-import pandas as pd 
-import numpy as np
-import random
-
-
-# In[2]:
-
-
-#Import consumer nodes
-consumer_nodes = pd.read_csv("consumer_nodes edited.csv")
-consumer_nodes
-
-
-# In[3]:
-
-
-#import logistic nodes
-logistic_nodes = pd.read_csv("depot_nodes edited.csv")
-logistic_nodes
-
-
-# In[4]:
-
-
-#Import depot arcs
-depot_1 = pd.read_excel("depot-1_arccs.xlsx")
-depot_2 = pd.read_excel("depot-2_arcs.xlsx")
-depot_3 = pd.read_excel("depot-3_arcs.xlsx")
-depot_4 = pd.read_excel("depot-4_arccs.xlsx")
-depot_5 = pd.read_excel("depot-5_arccs.xlsx")
-depot_6 = pd.read_excel("depot-6_arccs.xlsx")
-depot_7 = pd.read_excel("depot-7_arccs.xlsx")
-depot_8 = pd.read_excel("depot-8_arccs.xlsx")
-depot_9 = pd.read_excel("depot-9_arccs.xlsx")
-depot_10 = pd.read_excel("depot-10_arccs.xlsx")
-depot_11 = pd.read_excel("depot-11_arccs.xlsx")
-depot_12 = pd.read_excel("depot-12_arccs.xlsx")
-depot_13 = pd.read_excel("depot-13_arccs.xlsx")
-depot_14 = pd.read_excel("depot-14_arccs.xlsx")
-depot_15 = pd.read_excel("depot-15_arccs.xlsx")
-depot_16 = pd.read_excel("depot-16_arccs.xlsx")
-
-
-# In[5]:
-
-
-#Merge depot dataframes together
-depot_arcs = pd.concat([depot_1, depot_2, depot_3, depot_4, depot_5, depot_6, depot_7, depot_8, depot_9, depot_10, depot_11, depot_12, depot_13, depot_14, depot_15, depot_16])
-depot_arcs
-
-
-# In[6]:
-
-
-#Import Entire Nodes dataset
-entire_nodes = pd.read_excel("Entire Nodes.xlsx")
-entire_nodes
+from zedz_model import make_config, run_model
 
 
 # <font size="5">Part I: Shipment Synthesizer</font>
 
-# In[1]:
+# In[2]:
 
 
 #Part 1.1: Depot Proportions
-#This part declares the proportions of shipments that originate from each logistic depot
-
-depots = logistic_nodes["depot_id"]
-depot_share = logistic_nodes["depot_share"]
-
-#Share of shipments that originate from each company (data from APP report)
+#Every parcel of a consumer node is assigned to a company according to company_share (data from APP report) and sent from
+#that company's depot for the node (the USPS_ID/UPS_ID/Amazon_ID/FedEx_ID columns of "consumer_nodes edited.csv"). The
+#driving distance from that depot to the consumer node and the weight of the parcel are attached to every shipment.
 company_share = [0.38, 0.24, 0.21, 0.17]
 company_names = ["USPS", "UPS", "Amazon Logistics", "FedEx"]
 
-parcels_per_day = pd.read_csv("consumer_nodes_new.csv")
-parcels_per_day = parcels_per_day["parcel_delivered(#/day)"].tolist()
-parcels_per_day = [round(num) for num in parcels_per_day]
-
-
-# In[9]:
-
-
 #Part 1.2: Generate Shipments
-
-#The list of consumer node IDs
-consumer_ids = consumer_nodes["street_id"]
-
-#Dataframe that will ultimately contain all shipment data
-shipment_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-
-#Inputs a consumer node, and outputs the appropriate depot based on the company share proportions and the nearest depots to the consumer node.
-def which_sender(consumer_id):
-    the_consumer = consumer_nodes.iloc[consumer_id]
-    the_business = np.random.choice( company_names, 1, p = company_share)
-    if the_business[0] == "USPS":
-        return the_consumer["USPS_ID"]
-    if the_business[0] == "UPS":
-        return the_consumer["UPS_ID"]
-    if the_business[0] == "Amazon Logistics":
-        return the_consumer["Amazon_ID"]
-    if the_business[0] == "FedEx":
-        return the_consumer["FedEx_ID"]
-    
-#Copy of consumer_node Dataframe
-num_shipments = consumer_nodes
-
-#Combines consumer and depot node information into the shipment_df dataframe, and selects appropriate sender depot for shipment to each node.
-for i in range(len(consumer_ids)):
-    ship_per_node =  parcels_per_day[i]
-    for j in range(ship_per_node):
-        receiver = consumer_nodes.iloc[i]
-        sender_id = which_sender(i)
-        sender = logistic_nodes.loc[logistic_nodes["depot_id"] == sender_id]
-
-        receiver_id = receiver["street_id"]
-        receiver_lat = receiver["latitude"]
-        receiver_lon = receiver["longitude"]
-        receiver_name = receiver["street_address"]
-        rec_ZEDZ = receiver["ZEDZ(inside =1)"]
-
-        sender_name = sender.iloc[0]["logistics_company_name"]
-        sender_lat = sender.iloc[0]["depot_latitude"]
-        sender_lon = sender.iloc[0]["depot_longitude"]
-        sen_ZEDZ = sender.iloc[0]["ZEDZ(inside =1)"]
-    
-        shipment_df.loc[len(shipment_df.index)] = [receiver_name, receiver_id, receiver_lat, receiver_lon, rec_ZEDZ, sender_name, sender_id, sender_lat, sender_lon, sen_ZEDZ]
-    
-
-
-
-
-#Calculates the distance between each consumer node and its depot
-ship_dist = []
-for i in range(shipment_df[shipment_df.columns[0]].count()):
-    the_shipment = shipment_df.iloc[[i]]
-    the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-    the_depot_id = the_shipment.iloc[0]["Sender_ID"]
-    #Get the Entire_nodes ID for the receiver
-    rec_node = entire_nodes[entire_nodes['street_id'] == the_ship_id]
-    receiver_entire_ID = rec_node.iloc[0]["ID"]
-    #Get the Entire_nodes ID for the sender
-    sen_node = entire_nodes[entire_nodes["depot_id"] == the_depot_id ]
-    sender_entire_ID = sen_node.iloc[0]["ID"]
-
-    
-    poss_depo_arcs = depot_arcs[depot_arcs['origin_id'] == sender_entire_ID]
-    the_arc = poss_depo_arcs[poss_depo_arcs['destination_id'] == receiver_entire_ID]
-    the_arc_dist = the_arc.iloc[0]['Distance in meter']
-    
-    ship_dist.append(the_arc_dist)
-
-#Adds distances to shipment_df
-shipment_df["Distance"] = ship_dist
- 
-shipment_df
+#Seed of the carrier draws (None draws a new day on every run; pass a seed to reproduce a run)
+seed = None
 
 
 # <font size="5">Part II: Tour Formation + Part III: Network Assignment</font>
@@ -208,1231 +80,92 @@ shipment_df
 # 
 # This grouping is conducted in such a way that the tour is already arranged in an optimal way, also satisfying Part III.
 
-# In[10]:
-
-
-#Tours without ZEDZ
-
-UPS_tours = []
-Amazon_tours = []
-USPS_tours = []
-FedEx_tours = []
-#Our analysis found that diesel vehicles can carry 30 shipments before having to return to the depot
-stops_per_vehicle = 30
-max_dist = 20000000000
-
-UPS_shipments = shipment_df.loc[shipment_df["Sender"] == "UPS"]
-Amazon_shipments = shipment_df.loc[shipment_df["Sender"] == "Amazon Logistics"]
-USPS_shipments = shipment_df.loc[shipment_df["Sender"] == "USPS"]
-FedEx_shipments = shipment_df.loc[shipment_df["Sender"] == "FedEx"]
-
-#Calculates the Euclidian distance between two locations
-def calc_dist(A_lat, A_lon, B_lat, B_lon):
-    dist = ((((A_lon - B_lon )**2) + ((A_lat - B_lat)**2) )**0.5)
-    return dist
-
-#Returns the actual driving distance between two locations
-def calc_dist_nodes(A_ID, B_ID):
-    #convert A_ID to its entire_node_ID
-    A_node = entire_nodes[entire_nodes['street_id'] == A_ID]
-    A_entire_ID = A_node.iloc[0]["ID"]
-    
-    #convert B_ID to its entire_node_ID
-    B_node = entire_nodes[entire_nodes['street_id'] == B_ID]
-    B_entire_ID = B_node.iloc[0]["ID"]
-    
-    poss_depo_arcs = depot_arcs[depot_arcs['origin_id'] == A_entire_ID]
-    the_arc = poss_depo_arcs[poss_depo_arcs['destination_id'] == B_entire_ID]
-    the_arc_dist = the_arc.iloc[0]['Distance in meter']
-    return the_arc_dist
-
-#The following functions generate a list of dataframes for each company.
-#Each dataframe in these lists represent a single tour.
-def UPS_tour_formation():
-    remaining_shipments = pd.DataFrame.copy(UPS_shipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                
-        else:
-            UPS_tours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            if len(remaining_shipments.index) > 0:
-                the_shipment = remaining_shipments.iloc[[0]]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    if len(tour_df.index) > 0:
-        UPS_tours.append(tour_df)
-        
-def Amazon_tour_formation():
-    remaining_shipments = pd.DataFrame.copy(Amazon_shipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            Amazon_tours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    Amazon_tours.append(tour_df)
-    
-def USPS_tour_formation():
-    remaining_shipments = pd.DataFrame.copy(USPS_shipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            USPS_tours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    USPS_tours.append(tour_df)
-    
-def FedEx_tour_formation():
-    remaining_shipments = pd.DataFrame.copy(FedEx_shipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            FedEx_tours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    FedEx_tours.append(tour_df)
-    
-
-
-UPS_tour_formation()
-Amazon_tour_formation()
-USPS_tour_formation()
-FedEx_tour_formation()
-
-
-
-# In[11]:
-
-
-#Tours with ZEDZ policy
-UPS_Ztours = []
-Amazon_Ztours = []
-USPS_Ztours = []
-FedEx_Ztours = []
-UPS_nZtours = []
-Amazon_nZtours = []
-USPS_nZtours = []
-FedEx_nZtours = []
-max_dist = 200
-
-UPS_Zshipments = shipment_df.loc[shipment_df["Sender"] == "UPS"]
-UPS_Zshipments =  UPS_Zshipments[(UPS_Zshipments["Receiver_ZEDZ"] == 1) | (UPS_Zshipments["Sender_ZEDZ"] == 1)]
-Amazon_Zshipments = shipment_df.loc[shipment_df["Sender"] == "Amazon Logistics"]
-Amazon_Zshipments = Amazon_Zshipments[(Amazon_Zshipments["Receiver_ZEDZ"] == 1) | (Amazon_Zshipments["Sender_ZEDZ"] == 1)]
-USPS_Zshipments = shipment_df.loc[shipment_df["Sender"] == "USPS"]
-USPS_Zshipments = USPS_Zshipments[(USPS_Zshipments["Receiver_ZEDZ"] == 1) | (USPS_Zshipments["Sender_ZEDZ"] == 1)]
-FedEx_Zshipments = shipment_df.loc[shipment_df["Sender"] == "FedEx"]
-FedEx_Zshipments = FedEx_Zshipments[(FedEx_Zshipments["Receiver_ZEDZ"] == 1) | (FedEx_Zshipments["Sender_ZEDZ"] == 1)]
-
-UPS_nZshipments = shipment_df.loc[shipment_df["Sender"] == "UPS"]
-UPS_nZshipments =  UPS_nZshipments[(UPS_nZshipments["Receiver_ZEDZ"] == 0)]
-UPS_nZshipments = UPS_nZshipments[(UPS_nZshipments["Sender_ZEDZ"] == 0)]
-Amazon_nZshipments = shipment_df.loc[shipment_df["Sender"] == "Amazon Logistics"]
-Amazon_nZshipments = Amazon_nZshipments[(Amazon_nZshipments["Receiver_ZEDZ"] == 0)]
-Amazon_nZshipments = Amazon_nZshipments[(Amazon_nZshipments["Sender_ZEDZ"] == 0)]
-USPS_nZshipments = shipment_df.loc[shipment_df["Sender"] == "USPS"]
-USPS_nZshipments = USPS_nZshipments[(USPS_nZshipments["Receiver_ZEDZ"] == 0)]
-USPS_nZshipments = USPS_nZshipments[(USPS_nZshipments["Sender_ZEDZ"] == 0)]
-FedEx_nZshipments = shipment_df.loc[shipment_df["Sender"] == "FedEx"]
-FedEx_nZshipments = FedEx_nZshipments[(FedEx_nZshipments["Receiver_ZEDZ"] == 0)]
-FedEx_nZshipments = FedEx_nZshipments[(FedEx_nZshipments["Sender_ZEDZ"] == 0)]
-
-tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-new_tour_df = pd.DataFrame.copy(tour_df)
-
-#EV vehicles can do 33 stops from our analysis (mainly because they don't have to refuel as often)
-stops_per_vehicle = 33
-
-
-#The following functions generate a list of dataframes for each company and for whether the vehicle enters the ZEDZ zone.
-#Each dataframe in these lists represent a single tour.
-#Functions with "Z" are EVs that must enter the zone, and "nZ" do not
-def UPS_Ztour_formation():
-    remaining_shipments = pd.DataFrame.copy(UPS_Zshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            UPS_Ztours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    UPS_Ztours.append(tour_df)
-    
-#This variable is redefined since the vehicles are now diesel
-stops_per_vehicle = 30
-
-def UPS_nZtour_formation():
-    remaining_shipments = pd.DataFrame.copy(UPS_nZshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            UPS_nZtours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    UPS_nZtours.append(tour_df)
-   
-stops_per_vehicle = 33
-
-def Amazon_Ztour_formation():
-    remaining_shipments = pd.DataFrame.copy(Amazon_Zshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            Amazon_Ztours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    Amazon_Ztours.append(tour_df)
-   
-stops_per_vehicle = 30
-
-def Amazon_nZtour_formation():
-    remaining_shipments = pd.DataFrame.copy(Amazon_nZshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            Amazon_nZtours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    Amazon_nZtours.append(tour_df)
-    
-stops_per_vehicle = 33
-
-def USPS_Ztour_formation():
-    remaining_shipments = pd.DataFrame.copy(USPS_Zshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            USPS_Ztours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    USPS_Ztours.append(tour_df)
-    
-stops_per_vehicle = 30
-
-def USPS_nZtour_formation():
-    remaining_shipments = pd.DataFrame.copy(USPS_nZshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    new_tour_df = pd.DataFrame.copy(tour_df)
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            USPS_nZtours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    USPS_nZtours.append(tour_df)
-    
-stops_per_vehicle = 33    
-
-def FedEx_Ztour_formation():
-    remaining_shipments = pd.DataFrame.copy(FedEx_Zshipments)
-    tour_df = pd.DataFrame(columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"] )
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if (len(tour_df)) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            FedEx_Ztours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    FedEx_Ztours.append(tour_df)
-    
-    
-stops_per_vehicle = 30    
-    
-def FedEx_nZtour_formation():
-    remaining_shipments = pd.DataFrame.copy(FedEx_nZshipments)
-    tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-    for i in range(remaining_shipments[remaining_shipments.columns[0]].count()):
-        if len(remaining_shipments.index) == 0:
-            break
-        if len(tour_df) < stops_per_vehicle:
-            if len(tour_df) == 0:
-                the_shipment = remaining_shipments.iloc[:1]
-                the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-                tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-                tour_df.reset_index()
-            else:
-                starting_lat = tour_df.iloc[0]["Receiver Lat"]
-                starting_lon = tour_df.iloc[0]["Receiver Lon"]
-                starting_ID = tour_df.iloc[0]["Receiver_ID"]
-                min_dist = 1000000
-                for k in range(len(remaining_shipments)):
-                    q = remaining_shipments.iloc[[k]]
-                    k_lat = q.iloc[0]["Receiver Lat"]
-                    k_lon = q.iloc[0]["Receiver Lon"]
-                    k_ID = q.iloc[0]["Receiver_ID"]
-                    the_dist = calc_dist_nodes(starting_ID, k_ID)
-                    if the_dist < min_dist:
-                        the_chosen = q
-                        min_dist = the_dist
-                tour_df = pd.concat([tour_df, the_chosen], ignore_index = True)
-                the_ship_id = the_chosen.iloc[0]["Receiver_ID"]
-                remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-        else:
-            FedEx_nZtours.append(tour_df)
-            tour_df = pd.DataFrame( columns = [ "Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"])
-            the_shipment = remaining_shipments.iloc[[0]]
-            the_ship_id = the_shipment.iloc[0]["Receiver_ID"]
-            remaining_shipments = remaining_shipments[remaining_shipments["Receiver_ID"] != the_ship_id]
-            tour_df = pd.concat([tour_df, the_shipment], ignore_index = True)
-    FedEx_nZtours.append(tour_df)
-    
-
-    
-UPS_Ztour_formation()
-UPS_nZtour_formation()
-Amazon_Ztour_formation()
-Amazon_nZtour_formation()
-USPS_Ztour_formation()
-USPS_nZtour_formation()
-FedEx_Ztour_formation()
-FedEx_nZtour_formation()
-
-
-# In[13]:
-
-
-#Calculate Distances
-#This section calculates the total vehicle miles driven under each scenario, company, and type of vehicle.
-
-#Status Quo - No ZEDZ
-UPS_dist = 0
-for i in range(len(UPS_tours)):
-    the_tour = UPS_tours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            UPS_dist = UPS_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            UPS_dist = UPS_dist + calc_dist_nodes(start_id, end_id)
-Amazon_dist = 0
-for i in range(len(Amazon_tours)):
-    the_tour = Amazon_tours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            Amazon_dist = Amazon_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            Amazon_dist = Amazon_dist + calc_dist_nodes(start_id, end_id)
-USPS_dist = 0
-for i in range(len(USPS_tours)):
-    the_tour = USPS_tours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            USPS_dist = USPS_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            USPS_dist = USPS_dist + calc_dist_nodes(start_id, end_id)
-FedEx_dist = 0
-for i in range(len(FedEx_tours)):
-    the_tour = FedEx_tours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            FedEx_dist = FedEx_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            FedEx_dist = FedEx_dist + calc_dist_nodes(start_id, end_id) 
-    
-total_dist_Status_Quo = UPS_dist + Amazon_dist + USPS_dist + FedEx_dist
-    
-    
-#Mandatory ZEDZ
-#Diesel Meters
-UPS_nZ_dist = 0
-for i in range(len(UPS_nZtours)):
-    the_tour = UPS_nZtours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            UPS_nZ_dist = UPS_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            UPS_nZ_dist = UPS_nZ_dist + calc_dist_nodes(start_id, end_id)
-Amazon_nZ_dist = 0
-for i in range(len(Amazon_nZtours)):
-    the_tour = Amazon_nZtours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            Amazon_nZ_dist = Amazon_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            Amazon_nZ_dist = Amazon_nZ_dist + calc_dist_nodes(start_id, end_id)
-USPS_nZ_dist = 0
-for i in range(len(USPS_nZtours)):
-    the_tour = USPS_nZtours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            USPS_nZ_dist = USPS_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            USPS_nZ_dist = USPS_nZ_dist + calc_dist_nodes(start_id, end_id)
-FedEx_nZ_dist = 0
-for i in range(len(FedEx_nZtours)):
-    the_tour = FedEx_nZtours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            FedEx_nZ_dist = FedEx_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            FedEx_nZ_dist = FedEx_nZ_dist + calc_dist_nodes(start_id, end_id)
-    
-total_dist_Man_Dies = FedEx_nZ_dist + USPS_nZ_dist + Amazon_nZ_dist + UPS_nZ_dist
-
-#EV Meters
-UPS_Z_dist = 0
-for i in range(len(UPS_Ztours)):
-    the_tour = UPS_Ztours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            UPS_Z_dist = UPS_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            UPS_Z_dist = UPS_Z_dist + calc_dist_nodes(start_id, end_id)
-Amazon_Z_dist = 0
-for i in range(len(Amazon_Ztours)):
-    the_tour = Amazon_Ztours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            Amazon_Z_dist = Amazon_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            Amazon_Z_dist = Amazon_Z_dist + calc_dist_nodes(start_id, end_id)
-USPS_Z_dist = 0
-for i in range(len(USPS_Ztours)):
-    the_tour = USPS_Ztours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            USPS_Z_dist = USPS_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            USPS_Z_dist = USPS_Z_dist + calc_dist_nodes(start_id, end_id)
-FedEx_Z_dist = 0
-for i in range(len(FedEx_Ztours)):
-    the_tour = FedEx_Ztours[i]
-    for j in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            FedEx_Z_dist = FedEx_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[j-1]["Receiver_ID"]
-            end_id = the_tour.iloc[j]["Receiver_ID"]
-            FedEx_Z_dist = FedEx_Z_dist + calc_dist_nodes(start_id, end_id)
-    
-total_dist_Man_EV = UPS_Z_dist + Amazon_Z_dist + USPS_Z_dist + FedEx_Z_dist
-
-total_dist_mandatory = total_dist_Man_Dies + total_dist_Man_EV
-
-
-# In[14]:
-
-
-#Calculate total tours
-
-#Status Quo - No ZEDZ
-UPS_tours_count = len(UPS_tours)
-
-Amazon_tours_count = len(Amazon_tours)
-
-USPS_tours_count = len(USPS_tours)
-
-FedEx_tours_count = len(FedEx_tours)
-    
-total_tours_Status_Quo = UPS_tours_count + Amazon_tours_count + USPS_tours_count + FedEx_tours_count
-
-#Mandatory ZEDZ
-#Diesel tours
-UPS_nZ_tours_count = len(UPS_nZtours)
-
-Amazon_nZ_tours_count = len(Amazon_nZtours)
-
-USPS_nZ_tours_count = len(USPS_nZtours)
-
-FedEx_nZ_tours_count = len(FedEx_nZtours)
-
-total_tours_Mand_Dies = UPS_nZ_tours_count + Amazon_nZ_tours_count + USPS_nZ_tours_count + FedEx_nZ_tours_count
-
-#EV tours
-UPS_Z_tours_count = len(UPS_Ztours) 
-
-Amazon_Z_tours_count = len(Amazon_Ztours)
-
-USPS_Z_tours_count = len(USPS_Ztours)
-
-FedEx_Z_tours_count = len(FedEx_Ztours)
-
-total_tours_Mand_EV = UPS_Z_tours_count  + Amazon_Z_tours_count + USPS_Z_tours_count + FedEx_Z_tours_count
-
-total_tours_Mand = total_tours_Mand_Dies + total_tours_Mand_EV
-
-
-# In[15]:
-
-
-#Create dataframes of dist traveled
-
-#status quo
-status_quo = pd.DataFrame( columns = ["UPS_dist", "Amazon_dist", "USPS_dist", "FedEx_dist", "Total_dist" ])
-status_quo["UPS_dist"] = [UPS_dist]
-status_quo["Amazon_dist"] = [Amazon_dist]
-status_quo["USPS_dist"] = [USPS_dist]
-status_quo["FedEx_dist"] = [FedEx_dist]
-status_quo["Total_dist"] = [total_dist_Status_Quo]
-
-
-#mandatory ZEDZ
-mandatory_ZEDZ = pd.DataFrame( columns = ["UPS_nZdist", "Amazon_nZdist", "USPS_nZdist", "FedEx_nZdist", "Total_nZdist", "UPS_Zdist", "Amazon_Zdist", "USPS_Zdist", "FedEx_Zdist", "Total_Zdist", "Total_dist" ])
-mandatory_ZEDZ["UPS_nZdist"] = [UPS_nZ_dist]
-mandatory_ZEDZ["Amazon_nZdist"] = [Amazon_nZ_dist]
-mandatory_ZEDZ["USPS_nZdist"] = [USPS_nZ_dist]
-mandatory_ZEDZ["FedEx_nZdist"] = [FedEx_nZ_dist]
-mandatory_ZEDZ["Total_nZdist"] = [total_dist_Man_Dies]
-
-mandatory_ZEDZ["UPS_Zdist"] = [UPS_Z_dist]
-mandatory_ZEDZ["Amazon_Zdist"] = [Amazon_Z_dist]
-mandatory_ZEDZ["USPS_Zdist"] = [USPS_Z_dist]
-mandatory_ZEDZ["FedEx_Zdist"] = [FedEx_Z_dist]
-mandatory_ZEDZ["Total_Zdist"] = [total_dist_Man_EV]
-
-mandatory_ZEDZ["Total_dist"] = [total_dist_mandatory]
-
-#Create dataframes of tours conducted
-#status quo
-status_quo_tours = pd.DataFrame( columns = ["UPS_tours", "Amazon_tours", "USPS_tours", "FedEx_tours", "Total_tours" ])
-status_quo_tours["UPS_tours"] = [UPS_tours_count]
-status_quo_tours["Amazon_tours"] = [Amazon_tours_count]
-status_quo_tours["USPS_tours"] = [USPS_tours_count]
-status_quo_tours["FedEx_tours"] = [FedEx_tours_count]
-status_quo_tours["Total_tours"] = [total_tours_Status_Quo]
-
-#mandatory ZEDZ
-mandatory_ZEDZ_tours = pd.DataFrame( columns = ["UPS_nZ_tours", "Amazon_nZ_tours", "USPS_nZ_tours", "FedEx_nZ_tours", "Total_nZ_tours", "UPS_Z_tours", "Amazon_Z_tours", "USPS_Z_tours", "FedEx_Z_tours", "Total_Z_tours", "Total_tours" ])
-mandatory_ZEDZ_tours["UPS_nZ_tours"] = [UPS_nZ_tours_count]
-mandatory_ZEDZ_tours["Amazon_nZ_tours"] = [Amazon_nZ_tours_count]
-mandatory_ZEDZ_tours["USPS_nZ_tours"] = [USPS_nZ_tours_count]
-mandatory_ZEDZ_tours["FedEx_nZ_tours"] = [FedEx_nZ_tours_count]
-mandatory_ZEDZ_tours["Total_nZ_tours"] = [total_tours_Mand_Dies]
-
-mandatory_ZEDZ_tours["UPS_Z_tours"] = [UPS_Z_tours_count]
-mandatory_ZEDZ_tours["Amazon_Z_tours"] = [Amazon_Z_tours_count]
-mandatory_ZEDZ_tours["USPS_Z_tours"] = [USPS_Z_tours_count]
-mandatory_ZEDZ_tours["FedEx_Z_tours"] = [FedEx_Z_tours_count]
-mandatory_ZEDZ_tours["Total_Z_tours"] = [total_tours_Mand_EV]
-
-mandatory_ZEDZ_tours["Total_tours"] = [total_tours_Mand]
-
-
-# In[17]:
-
-
-status_quo.to_excel('FinalResults - status quo dist.xlsx')
-
-
-# In[18]:
-
-
-mandatory_ZEDZ.to_excel('FinalResults - mandatory ZEDZ dist.xlsx')
-
-
-# In[19]:
-
-
-status_quo_tours.to_excel('FinalResults - status quo tours.xlsx')
-
-
-# In[20]:
-
-
-mandatory_ZEDZ_tours.to_excel('FinalResults - mandatory ZEDZ tours.xlsx')
-
-
-# In[21]:
-
-
-#Generate distance per tour
-#status quo
-status_quo_vehicles = pd.DataFrame(columns = ["Company", "Vehicle", "Tour", "Distance by tour" ])
-company = []
-vehicle = []
-tour = []
-Distance_tour = []
-Distance_vehicle = []
-vehicle_number = 1
-tour_num = 0
-j = 0
-for i in range(len(UPS_tours)):
-    tour_num += 1
-    tour.append(tour_num)
-    company.append("UPS")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(UPS_tours) - 1:
-            vehicle_number += 1
-    the_tour = UPS_tours[i]
-    UPS_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            UPS_dist = UPS_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            UPS_dist = UPS_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(UPS_dist)
-j = 0
-vehicle_number += 1
-for i in range(len(Amazon_tours)):
-    tour_num += 1
-    tour.append(tour_num)
-    company.append("Amazon")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(Amazon_tours) - 1:
-            vehicle_number += 1
-    the_tour = Amazon_tours[i]
-    Amazon_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            Amazon_dist = Amazon_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            Amazon_dist = Amazon_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(Amazon_dist)
-    
-j = 0
-vehicle_number += 1
-for i in range(len(USPS_tours)):
-    tour_num += 1
-    tour.append(tour_num)
-    company.append("USPS")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(USPS_tours) - 1:
-            vehicle_number += 1
-    the_tour = USPS_tours[i]
-    USPS_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if j == 0: 
-            USPS_dist = USPS_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            USPS_dist = USPS_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(USPS_dist)
-
-j = 0
-vehicle_number += 1
-for i in range(len(FedEx_tours)):
-    tour_num += 1
-    tour.append(tour_num)
-    company.append("FedEx")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(FedEx_tours) - 1:
-            vehicle_number += 1
-    the_tour = FedEx_tours[i]
-    FedEx_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            FedEx_dist = FedEx_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            FedEx_dist = FedEx_dist + calc_dist_nodes(start_id, end_id) 
-    Distance_tour.append(FedEx_dist)
-
-status_quo_vehicles["Company"] = company
-status_quo_vehicles["Vehicle"] = vehicle
-status_quo_vehicles["Tour"] = tour
-status_quo_vehicles["Distance by tour"] = Distance_tour
-
-temp = status_quo_vehicles.groupby(["Vehicle"]).sum()
-temp = temp.rename(columns={"Distance by tour": "Distance by vehicle"})
-temp = temp.drop(["Tour"], axis = 1)
-
-status_quo_vehicles = pd.merge(status_quo_vehicles, temp, on = "Vehicle")
-
+# In[3]:
 
-#Mandatory ZEDZ
-mandatory_vehicles = pd.DataFrame(columns = ["Company", "Vehicle", "Tour", "Distance by tour", "EV" ])
-company = []
-vehicle = []
-tour = []
-Distance_tour = []
-Distance_vehicle = []
-EV = []
-vehicle_number = 1
-tour_num = 0
-j = 0
-for i in range(len(UPS_nZtours)):
-    tour_num += 1
-    tour.append(tour_num)
-    EV.append(0)
-    company.append("UPS")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(UPS_nZtours) - 1:
-            vehicle_number += 1
-    the_tour = UPS_nZtours[i]
-    UPS_nZ_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            UPS_nZ_dist = UPS_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            UPS_nZ_dist = UPS_nZ_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(UPS_nZ_dist)
-j = 0
-vehicle_number += 1
-for i in range(len(Amazon_nZtours)):
-    tour_num += 1
-    tour.append(tour_num)
-    EV.append(0)
-    company.append("Amazon")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(Amazon_nZtours) - 1:
-            vehicle_number += 1
-    the_tour = Amazon_nZtours[i]
-    Amazon_nZ_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            Amazon_nZ_dist = Amazon_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            Amazon_nZ_dist = Amazon_nZ_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(Amazon_nZ_dist)
-    
-j = 0
-vehicle_number += 1
-for i in range(len(USPS_nZtours)):
-    tour_num += 1
-    tour.append(tour_num)
-    EV.append(0)
-    company.append("USPS")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(USPS_nZtours) - 1:
-            vehicle_number += 1
-    the_tour = USPS_nZtours[i]
-    USPS_nZ_dist = 0 
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            USPS_nZ_dist = USPS_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            USPS_nZ_dist = USPS_nZ_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(USPS_nZ_dist)
-    
-j = 0
-vehicle_number += 1
-for i in range(len(FedEx_nZtours)):
-    tour_num += 1
-    tour.append(tour_num)
-    EV.append(0)
-    company.append("FedEx")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(FedEx_nZtours) - 1:
-            vehicle_number += 1
-    the_tour = FedEx_nZtours[i]
-    FedEx_nZ_dist = 0 
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            FedEx_nZ_dist = FedEx_nZ_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            FedEx_nZ_dist = FedEx_nZ_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(FedEx_nZ_dist)
-    
-j = 0
-vehicle_number += 1
-for i in range(len(UPS_Ztours)):
-    tour_num += 1
-    tour.append(tour_num)
-    company.append("UPS")
-    EV.append(1)
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(UPS_Ztours) - 1:
-            vehicle_number += 1
-    the_tour = UPS_Ztours[i]
-    UPS_Z_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            UPS_Z_dist = UPS_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            UPS_Z_dist = UPS_Z_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(UPS_Z_dist)
-    
-j = 0
-vehicle_number += 1
-for i in range(len(Amazon_Ztours)):
-    tour_num += 1
-    tour.append(tour_num)
-    EV.append(1)
-    company.append("Amazon")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(Amazon_Ztours) - 1:
-            vehicle_number += 1
-    the_tour = Amazon_Ztours[i]
-    Amazon_Z_dist = 0
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            Amazon_Z_dist = Amazon_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            Amazon_Z_dist = Amazon_Z_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(Amazon_Z_dist)
 
-j = 0
-vehicle_number += 1
-for i in range(len(USPS_Ztours)):
-    tour_num += 1
-    tour.append(tour_num)
-    company.append("USPS")
-    EV.append(1)
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(USPS_Ztours) - 1:
-            vehicle_number += 1
-    the_tour = USPS_Ztours[i]
-    USPS_Z_dist = 0 
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            USPS_Z_dist = USPS_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            USPS_Z_dist = USPS_Z_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(USPS_Z_dist)
-    
-j = 0
-vehicle_number += 1
-for i in range(len(FedEx_Ztours)):
-    tour_num += 1
-    tour.append(tour_num)
-    EV.append(1)
-    company.append("FedEx")
-    if j == 0:
-        vehicle.append(vehicle_number)
-        j = 1
-    elif j == 1:
-        j = 0
-        vehicle.append(vehicle_number)
-        if i != len(FedEx_Ztours) - 1:
-            vehicle_number += 1
-    the_tour = FedEx_Ztours[i]
-    FedEx_Z_dist = 0 
-    for h in range(the_tour[the_tour.columns[0]].count()):
-        if h == 0: 
-            FedEx_Z_dist = FedEx_Z_dist + the_tour.iloc[0]["Distance"]
-        else:
-            start_id = the_tour.iloc[h-1]["Receiver_ID"]
-            end_id = the_tour.iloc[h]["Receiver_ID"]
-            FedEx_Z_dist = FedEx_Z_dist + calc_dist_nodes(start_id, end_id)
-    Distance_tour.append(FedEx_Z_dist)
-    
-mandatory_vehicles["Company"] = company
-mandatory_vehicles["Vehicle"] = vehicle
-mandatory_vehicles["Tour"] = tour
-mandatory_vehicles["Distance by tour"] = Distance_tour
-mandatory_vehicles["EV"] = EV
+#Tours without ZEDZ ("status quo") and with the ZEDZ policy ("mandatory ZEDZ": "Z" tours are EVs that must enter the zone,
+#receiver or depot inside the ZEDZ, "nZ" tours are diesel vehicles that do not)
+scenarios = ["status quo", "mandatory ZEDZ"]
 
-temp = mandatory_vehicles.groupby(["Vehicle"]).sum()
-temp = temp.rename(columns={"Distance by tour": "Distance by vehicle"})
-temp = temp.drop(["Tour"], axis = 1)
+#Our analysis found that diesel vehicles can carry 30 shipments before having to return to the depot,
+#and EV vehicles can do 33 stops (mainly because they don't have to refuel as often)
+stops_per_vehicle = {"diesel": 30, "EV": 33}
 
-mandatory_vehicles = pd.merge(mandatory_vehicles, temp, on = "Vehicle")
+#The tours are formed greedily (nearest stop to the first stop of the tour). Setting improve_tours to True reorders the stops
+#of every tour with 2-opt / Or-opt moves afterwards (see zedz_model/improve.py), which shortens the tours without changing them
+improve_tours = False
 
-mandatory_vehicles = mandatory_vehicles.drop(["EV_y"], axis = 1)
-mandatory_vehicles = mandatory_vehicles.rename(columns = {"EV_x": "EV"})
+#Tour engine: "greedy" (the tours above) or "savings" (Clarke-Wright savings, see zedz_model/savings.py), which also keeps every
+#tour within the payload (kg) of its vehicle type; None means no payload limit
+tour_engine = "greedy"
+vehicle_payload = {"diesel": None, "EV": None}
 
 
-# In[24]:
+# In[4]:
 
 
-status_quo_vehicles.to_excel("FinalResults - status quo vehicles.xlsx")
+#Monte Carlo replication mode
+#The results come from a single random draw of the shipments. Setting replications to N repeats the shipment synthesizer,
+#tour formation and distance calculation N times with independent seeded random streams (in parallel), and reports the mean,
+#percentiles and 95% confidence interval of every distance and tour count of the tables.
+replications = 0
+replication_seed = 2022
+
+#Run profile (see zedz_model/profiling.py): every stage of the run is timed and its hot-path events (distance lookups,
+#cache hits...) counted. Set profile_report to a .json or .csv path to write the report at the end of the run;
+#profile_memory adds the peak memory of every stage (tracemalloc), profile_functions a cProfile of the run.
+profile_report = None
+profile_memory = False
+profile_functions = False
+
+#Stage cache (see zedz_model/stage_cache.py): with a seed, set stage_cache to a directory (e.g. "stage_cache") to keep the
+#shipments, tours and tables of a run and only recompute the stages whose inputs or settings changed on the next run
+stage_cache = None
+
+#Arc network (see zedz_model/network.py): None keeps every collected arc in dense matrices, which suits Santa Monica. For a
+#region of tens of thousands of nodes set arc_neighbours to e.g. 64 to keep only each node's nearest arcs (plus the depots')
+#and estimate the others from the straight-line distance
+arc_neighbours = None
+
+#Missing arcs (see zedz_model/router.py): set road_file to a street network extract (.geojson or .osm) to route the pairs the
+#depot arc files never collected instead of leaving them unreachable; the last route_rows shortest-path rows are kept
+road_file = None
+route_rows = 1024
+
+#Estimated arcs (see zedz_model/estimator.py): with None any missing arc stops the run with an error naming it. "missing" fills
+#the arcs still missing after routing with detour factors fitted on the collected arcs, "all" estimates every arc from the node
+#coordinates for a quick first screening of a scenario. Depots 9 (UPS) and 10 (Amazon Logistics) have no arc files, so the
+#inputs need a road_file or "missing". With estimates the distance tables mix measured and estimated meters: they get an
+#"Estimated_share_of_dist" column, and "FinalResults - estimated legs.xlsx" gives the number of estimated legs and their share.
+estimate_arcs = None
+
+config = make_config({
+    "seed": seed, "scenarios": scenarios, "company_names": company_names, "company_share": company_share,
+    "stops_per_vehicle": stops_per_vehicle, "improve": improve_tours, "engine": tour_engine, "payloads": vehicle_payload,
+    "replications": replications, "replication_seed": replication_seed,
+    "profile_report": profile_report, "profile_memory": profile_memory, "profile_functions": profile_functions,
+    "stage_cache": stage_cache, "arc_neighbours": arc_neighbours, "road_file": road_file, "route_rows": route_rows,
+    "estimate_arcs": estimate_arcs,
+})
 
 
-# In[25]:
+# In[5]:
 
 
-mandatory_vehicles.to_excel("FinalResults - mandatory ZEDZ vehicles.xlsx")
+#Run the model: reads the inputs (the first run compiles "Entire Nodes.xlsx" and the "depot-x_arccs.xlsx" files into the
+#binary artifact in "network_cache"), synthesizes the shipments, forms the tours of every company under both scenarios in
+#parallel, calculates the distances and tours of every scenario, company and type of vehicle, and writes the FinalResults files.
+if __name__ == "__main__":
+    results = run_model(config)
+
+    #The shipments, their stops (see zedz_model/consolidation.py), the tours as compact arrays (see zedz_model/tours.py) and the
+    #result tables, for a look at them in a notebook
+    shipment_df = results["shipments"]
+    stops = results["stops"]
+    status_quo_tour_arrays = results["tours"]["status quo"]
+    mandatory_tour_arrays = results["tours"]["mandatory ZEDZ"]
+    status_quo, status_quo_tours = results["tables"]["status quo dist"], results["tables"]["status quo tours"]
+    mandatory_ZEDZ, mandatory_ZEDZ_tours = results["tables"]["mandatory ZEDZ dist"], results["tables"]["mandatory ZEDZ tours"]
 
 
 # In[ ]:
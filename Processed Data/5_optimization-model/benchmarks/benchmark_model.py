@@ -0,0 +1,203 @@
+#Scaling benchmarks of the ZEDZ Shipment Model on synthetic cities
+#
+#Generates seeded synthetic cities (see zedz_model/synthetic.py) of increasing size and times every stage of a model run on
+#them: compiling the network, estimating the arcs the depot files lack (as a model run does, see zedz_model/estimator.py), the
+#shipment synthesizer, single arc lookups (calc_dist_nodes), tour formation per scenario on the consolidated stops (see
+#zedz_model/consolidation.py) and the distance and vehicle tables. Each stage is reported as a throughput (arcs, lookups,
+#shipments, stops or tours per second), the best of --repeat runs. The compiled tour kernels are compiled before anything is
+#timed, so no stage counts their compilation.
+#
+#With --check the run fails (exit status 1) on a regression judged by ratios measured within the run, so that it means the
+#same on any machine:
+#  - scaling: a stage's time per item (arc, lookup, shipment, stop or tour) may grow from the smallest to the largest size
+#    like nodes ** GROWTH[stage], plus --tolerance. Tour formation scans a carrier's remaining stops for every stop, so its
+#    time per stop grows with the city (exponent 1); every other stage takes about the same time per item at any size.
+#    A stage that picks up a power of the city's size (a quadratic scan where a linear one was) fails this check.
+#  - compiled kernels: when numba is installed, tour formation is timed on the NumPy path as well, and the compiled kernels
+#    (see zedz_model/kernels.py) must be at least as fast (MIN_KERNEL_SPEEDUP) and form the same tours.
+#It needs two --sizes or more and --repeat 2 or more. There is no committed baseline of absolute throughputs; to compare
+#two versions of the code on one machine, write --report files from both and compare those.
+#
+#--arc-neighbours k benchmarks a sparse arc store (see zedz_model/network.py) instead of the dense one and reports its size.
+#
+#From the 5_optimization-model directory:
+#    python -m benchmarks.benchmark_model --sizes 350 1000 5000
+#    python -m benchmarks.benchmark_model --sizes 5000 20000 --arc-neighbours 64
+#    python -m benchmarks.benchmark_model --repeat 2 --check
+#    python -m benchmarks.benchmark_model --report before.json
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from zedz_model import (EstimatedArcStore, Profiler, check_kernels, consolidate_shipments, fit_arc_estimator, kernels, parcel_weights, scenario_tables,
+                        scenario_tours, synthesize_shipments, synthetic_city, vehicle_table, zedz_flags)
+
+#Consumer node counts benchmarked by default (Santa Monica has about 350)
+SIZES = [350, 1000, 5000]
+
+#Santa Monica's parcels per consumer node and day, and depots for its number of nodes
+PARCELS_PER_NODE = 20
+DEPOTS = 16
+
+#Number of single arc lookups timed for calc_dist_nodes
+LOOKUPS = 20000
+
+#Stages whose time per item grows with the city, as the exponent of the number of nodes; every other stage is expected at 0
+GROWTH = {"tour formation/status quo": 1.0, "tour formation/mandatory ZEDZ": 1.0}
+
+#Allowed excess of a stage's growth exponent over GROWTH before it counts as a regression
+TOLERANCE = 0.5
+
+#Least speedup of the compiled tour kernels over the NumPy path, on the same stops in the same run. On large cities both are
+#bound by gathering distances from the arc store and the kernels gain little (about 1.2 at 5000 nodes), so the check is that
+#they are not slower
+MIN_KERNEL_SPEEDUP = 1.0
+
+
+#Depots of a city of the given size: Santa Monica's depots, growing with the city's width
+def default_depots(nodes):
+    return max(4, round(DEPOTS * math.sqrt(nodes / 350)))
+
+
+#Runs fn once per repeat and returns (its result, the fastest time)
+def _best_time(fn, repeat):
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+#Benchmarks one city size: returns the stages as {stage: {"items", "seconds", "throughput"}} and the hot-path counters of the
+#tour formation (summed over the repeats)
+def benchmark_size(nodes, depots, carriers, parcels_per_node, zedz_share, seed, repeat, arc_neighbours=None):
+    results = {}
+
+    def measure(stage, items, fn):
+        result, seconds = _best_time(fn, repeat)
+        results[stage] = {"items": int(items), "seconds": seconds, "throughput": items / seconds if seconds > 0 else math.inf}
+        return result
+
+    if kernels.ENABLED:
+        kernels.warm_up()
+    city = measure("generate", nodes, lambda: synthetic_city(nodes, depots, carriers, nodes * parcels_per_node, zedz_share, seed))
+    network = measure("compile network", city.arc_count(), lambda: city.arc_store(arc_neighbours))
+    #Streets served by different depots have no arc between them, which a model run estimates (estimate_arcs "missing")
+    lat = city.entire_nodes["latitude"].to_numpy()
+    lon = city.entire_nodes["longitude"].to_numpy()
+    zones = zedz_flags(lon, lat, city.zedz)
+    arc_store = measure("estimate missing arcs", len(network) ** 2, lambda: EstimatedArcStore(network, fit_arc_estimator(network, lat, lon, zones), lat, lon, zones))
+    weights = parcel_weights(city.consumer_nodes)
+    shipment_df = measure("synthesize", sum(city.parcels_per_day), lambda: synthesize_shipments(city.consumer_nodes, city.logistic_nodes, city.parcels_per_day, city.company_names, city.company_share, arc_store, rng=seed, parcel_weight=weights))
+    stops = consolidate_shipments(shipment_df)
+
+    #Single lookups between streets of the same depot file, the only pairs the network has arcs for
+    rng = np.random.default_rng(seed)
+    arcs = next(iter(city.depot_arcs.values()))
+    arcs = arcs[(arcs["origin_id"] > depots) & (arcs["destination_id"] > depots)]
+    picked = rng.integers(0, len(arcs), LOOKUPS)
+    pairs = list(zip((arcs["origin_id"].to_numpy()[picked] - depots).tolist(), (arcs["destination_id"].to_numpy()[picked] - depots).tolist()))
+    measure("calc_dist_nodes", len(pairs), lambda: [network.calc_dist_nodes(a, b) for a, b in pairs])
+
+    profiler = Profiler().start()
+    tour_arrays = {}
+    for scenario in ("status quo", "mandatory ZEDZ"):
+        tour_arrays[scenario] = measure("tour formation/" + scenario, len(stops), lambda: scenario_tours(stops, arc_store, scenario))
+    profiler.stop()
+    #The same tours on the NumPy path, the reference the compiled kernels are judged against
+    if kernels.ENABLED:
+        try:
+            kernels.ENABLED = False
+            for scenario in ("status quo", "mandatory ZEDZ"):
+                measure("tour formation/" + scenario + " (NumPy)", len(stops), lambda: scenario_tours(stops, arc_store, scenario))
+        finally:
+            kernels.ENABLED = True
+    tours = sum(len(t) for arrays in tour_arrays.values() for t in arrays.values())
+    measure("distance tables", tours, lambda: [(scenario_tables(arrays, scenario), vehicle_table(arrays, scenario)) for scenario, arrays in tour_arrays.items()])
+    #Partitions whose tours differ between the compiled kernels and the NumPy path (None: no compiled kernels)
+    kernel_mismatches = [list(key) for key in check_kernels(stops, arc_store)] if kernels.ENABLED and isinstance(arc_store.dist, np.ndarray) else None
+    return {"nodes": nodes, "depots": depots, "shipments": len(shipment_df), "stops": len(stops), "tours": tours, "stages": results, "counters": dict(profiler.counters),
+            "kernel mismatches": kernel_mismatches, "arc store bytes": arc_store.nbytes()}
+
+
+#Exponent e of the number of nodes with which a stage's time per item grows from the smallest to the largest size
+#(time per item ~ nodes ** e), as {stage: e}
+def growth(measured):
+    small, large = sorted(measured.values(), key=lambda run: run["nodes"])[:: len(measured) - 1]
+    exponents = {}
+    for stage, entry in large["stages"].items():
+        if stage in small["stages"] and not stage.endswith("(NumPy)"):
+            before = small["stages"][stage]["seconds"] / small["stages"][stage]["items"]
+            after = entry["seconds"] / entry["items"]
+            exponents[stage] = math.log(after / before) / math.log(large["nodes"] / small["nodes"])
+    return exponents
+
+
+#Speedup of the compiled tour kernels over the NumPy path per size and scenario, as {(size, scenario): speedup}
+def kernel_speedups(measured):
+    speedups = {}
+    for size, run in measured.items():
+        for stage, entry in run["stages"].items():
+            if stage.endswith(" (NumPy)"):
+                speedups[(size, stage[len("tour formation/"): -len(" (NumPy)")])] = entry["seconds"] / run["stages"][stage[: -len(" (NumPy)")]]["seconds"]
+    return speedups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the stages of the model on synthetic cities of increasing size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="numbers of consumer nodes")
+    parser.add_argument("--depots", type=int, default=None, help="depots per city (default: grows with the city)")
+    parser.add_argument("--carriers", type=int, default=4)
+    parser.add_argument("--parcels-per-node", type=float, default=PARCELS_PER_NODE)
+    parser.add_argument("--zedz-share", type=float, default=0.1, help="share of the city's area inside the ZEDZ")
+    parser.add_argument("--seed", type=int, default=2022)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage; the fastest counts")
+    parser.add_argument("--arc-neighbours", type=int, default=None, help="benchmark a sparse arc store keeping this many neighbours per node")
+    parser.add_argument("--check", action="store_true", help="fail on stages that scale worse than expected or compiled kernels that are slow or wrong")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed excess of a growth exponent")
+    parser.add_argument("--report", default=None, help="write every measurement to this JSON file")
+    args = parser.parse_args(argv)
+    #The fastest of a single run is too noisy to judge a stage of a few milliseconds by
+    if args.check and args.repeat < 2:
+        parser.error("--check needs --repeat 2 or more")
+    if args.check and len(set(args.sizes)) < 2:
+        parser.error("--check needs two --sizes or more")
+
+    measured = {}
+    for nodes in args.sizes:
+        depots = args.depots or default_depots(nodes)
+        run = benchmark_size(nodes, depots, args.carriers, args.parcels_per_node, args.zedz_share, args.seed, args.repeat, args.arc_neighbours)
+        measured[str(nodes)] = run
+        print("%d nodes, %d depots, %d shipments, %d stops, %d tours, %s, arc store %.1f MB" % (nodes, depots, run["shipments"], run["stops"], run["tours"],
+              "compiled kernels" if kernels.ENABLED else "NumPy kernels", run["arc store bytes"] / 1e6))
+        for stage, entry in run["stages"].items():
+            print("  %-38s %10.4f s %14.0f /s" % (stage, entry["seconds"], entry["throughput"]))
+
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(measured, f, indent=2)
+    if args.check:
+        exponents = growth(measured)
+        worse = [(stage, exponent) for stage, exponent in exponents.items() if exponent > GROWTH.get(stage, 0.0) + args.tolerance]
+        for stage, exponent in worse:
+            print("REGRESSION %s: time per item grows like nodes ** %.2f, expected %.2f" % (stage, exponent, GROWTH.get(stage, 0.0)))
+        slow = [(key, speedup) for key, speedup in kernel_speedups(measured).items() if speedup < MIN_KERNEL_SPEEDUP]
+        for (size, scenario), speedup in slow:
+            print("REGRESSION %s nodes, %s: the compiled kernels are %.2f times as fast as the NumPy path, expected %.1f" % (size, scenario, speedup, MIN_KERNEL_SPEEDUP))
+        mismatches = [(size, key) for size, run in measured.items() for key in run["kernel mismatches"] or []]
+        for size, (scenario, carrier, label) in mismatches:
+            print("MISMATCH %s nodes, %s %s %s: the compiled kernels form different tours" % (size, scenario, carrier, label))
+        if worse or slow or mismatches:
+            return 1
+        print("every stage scales as expected within %.2f%s" % (args.tolerance, "" if kernels.ENABLED else " (no compiled kernels to check)"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#Geocoder against a local stand-in of the Geocoding API: found and not-found addresses, retries of a busy server, and the cache
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from zedz_model.geocoder import GeocodeCache, Geocoder, geocode_nodes
+
+SUFFIX = ", Santa Monica, CA"
+
+#Coordinates the stand-in knows, by the address as sent
+KNOWN = {
+    "1685 Main St" + SUFFIX: (34.0114, -118.4913),
+    "2600 Ocean Park Blvd" + SUFFIX: (34.0193, -118.4561),
+    "1685 Main St, Pasadena, CA": (34.1478, -118.1445),
+}
+
+
+#Answers like the Geocoding API; an address is answered OVER_QUERY_LIMIT the first busy[address] times it is asked for
+def _responder(busy=None):
+    busy = dict(busy or {})
+
+    def respond(params):
+        address = params["address"]
+        if busy.get(address, 0) > 0:
+            busy[address] -= 1
+            return 200, {"status": "OVER_QUERY_LIMIT", "results": []}
+        if address not in KNOWN:
+            return 200, {"status": "ZERO_RESULTS", "results": []}
+        lat, lng = KNOWN[address]
+        return 200, {"status": "OK", "results": [{"geometry": {"location": {"lat": lat, "lng": lng}}}]}
+    return respond
+
+
+def _geocoder(server, **options):
+    return Geocoder(base_url=server.url, requests_per_second=1000, backoff=0.01, timeout=5, **options)
+
+
+def test_found_and_not_found(serve):
+    server = serve(_responder())
+    geocoder = _geocoder(server, suffix=SUFFIX)
+    lat, lon = geocoder.geocode(["1685 Main St", "  1685  MAIN st ", "2600 Ocean Park Blvd", "1 Nowhere Lane"])
+    np.testing.assert_array_equal(lat[:3], [34.0114, 34.0114, 34.0193])
+    np.testing.assert_array_equal(lon[:3], [-118.4913, -118.4913, -118.4561])
+    assert math.isnan(lat[3]) and math.isnan(lon[3])
+    #The two spellings of Main St are asked for once, as first written, with the suffix
+    assert sorted(params["address"] for params in server.requests) == ["1 Nowhere Lane" + SUFFIX, "1685 Main St" + SUFFIX, "2600 Ocean Park Blvd" + SUFFIX]
+
+
+def test_busy_server_is_retried(serve):
+    server = serve(_responder({"1685 Main St" + SUFFIX: 2}))
+    geocoder = _geocoder(server, suffix=SUFFIX)
+    lat, _ = geocoder.geocode(["1685 Main St"])
+    assert lat[0] == 34.0114
+    assert geocoder.requests == 1 and len(server.requests) == 3
+
+
+def test_cache_hits(serve, tmp_path):
+    server = serve(_responder())
+    path = str(tmp_path / "geocode.sqlite")
+    first = _geocoder(server, suffix=SUFFIX, cache=path)
+    expected = first.geocode(["1685 Main St", "1 Nowhere Lane"])
+    first.cache.close()
+
+    #A new geocoder on the same cache asks for nothing, not even the address that was not found
+    second = _geocoder(server, suffix=SUFFIX, cache=path)
+    cached = second.geocode(["1685 main st", "1 Nowhere Lane"])
+    assert second.requests == 0 and len(server.requests) == 2
+    np.testing.assert_array_equal(cached[0], expected[0])
+    np.testing.assert_array_equal(cached[1], expected[1])
+
+    #The same street in another city is another address
+    pasadena = _geocoder(server, suffix=", Pasadena, CA", cache=second.cache)
+    lat, _ = pasadena.geocode(["1685 Main St"])
+    assert lat[0] == 34.1478 and pasadena.requests == 1
+
+
+def test_not_found_can_be_retried(serve, tmp_path):
+    server = serve(_responder())
+    cache = GeocodeCache(str(tmp_path / "geocode.sqlite"))
+    _geocoder(server, suffix=SUFFIX, cache=cache).geocode(["1 Nowhere Lane"])
+    assert len(cache) == 1
+
+    retrying = _geocoder(server, suffix=SUFFIX, cache=cache, cache_not_found=False)
+    retrying.geocode(["1 Nowhere Lane", "1 Elsewhere Road"])
+    assert retrying.requests == 2
+    #Not found again; the address cached before stays, the new one is not cached
+    assert set(cache.get_many([retrying.key("1 Nowhere Lane"), retrying.key("1 Elsewhere Road")])) == {retrying.key("1 Nowhere Lane")}
+
+
+def test_geocode_nodes(serve):
+    server = serve(_responder())
+    nodes = pd.DataFrame({"depot_address": ["1685 Main St", "2600 Ocean Park Blvd"], "depot_latitude": np.nan, "depot_longitude": np.nan})
+    geocoded = geocode_nodes(nodes, _geocoder(server, suffix=SUFFIX))
+    assert geocoded["depot_latitude"].tolist() == [34.0114, 34.0193]
+    assert nodes["depot_latitude"].isna().all()
@@ -0,0 +1,99 @@
+#Local search of improve.py: the O(1) move deltas read from prefix sums against recomputing the length of every moved path, on
+#asymmetric distances
+
+import numpy as np
+import pytest
+
+from zedz_model.improve import OR_OPT_LENGTH, _best_or_opt, _best_two_opt, improve_order, improve_path
+
+
+#Length of an open path from the depot: the depot leg to its first stop and the arcs between its stops
+def _length(dist, start, path):
+    return start[path[0]] + sum(dist[a, b] for a, b in zip(path[:-1], path[1:]))
+
+
+#Asymmetric costs between m stops and from the depot to each
+def _instance(m, seed):
+    rng = np.random.default_rng(seed)
+    dist = rng.uniform(10, 1000, (m, m))
+    np.fill_diagonal(dist, 0)
+    return dist, rng.uniform(10, 1000, m)
+
+
+#The move arrays improve_path() reads for the identity path
+def _arrays(dist, start):
+    m = len(start)
+    P = np.vstack([start, dist[:-1]])
+    Q = np.vstack([dist[:, 1:].T, np.zeros(m)])
+    F = np.concatenate([[0.0], np.cumsum(np.diag(dist, 1))])
+    R = np.concatenate([[0.0], np.cumsum(np.diag(dist, -1))])
+    return P, Q, F, R
+
+
+def _reversed(path, i, j):
+    return np.concatenate([path[:i], path[i:j + 1][::-1], path[j + 1:]])
+
+
+def _moved(path, i, L, g):
+    rest = np.concatenate([path[:i], path[i + L:]])
+    position = g if g < i else g - L
+    return np.concatenate([rest[:position], path[i:i + L], rest[position:]])
+
+
+@pytest.mark.parametrize("m", [3, 4, 7, 12])
+@pytest.mark.parametrize("seed", range(5))
+def test_two_opt_delta_against_recomputation(m, seed):
+    dist, start = _instance(m, seed)
+    path = np.arange(m)
+    base = _length(dist, start, path)
+    delta, i, j = _best_two_opt(*_arrays(dist, start))
+    changes = {(a, b): _length(dist, start, _reversed(path, a, b)) - base for a in range(m) for b in range(a + 1, m)}
+    assert delta == pytest.approx(min(changes.values()))
+    assert delta == pytest.approx(changes[(i, j)])
+
+
+@pytest.mark.parametrize("m", [3, 4, 7, 12])
+@pytest.mark.parametrize("seed", range(5))
+def test_or_opt_delta_against_recomputation(m, seed):
+    dist, start = _instance(m, seed)
+    path = np.arange(m)
+    base = _length(dist, start, path)
+    P, Q, _, _ = _arrays(dist, start)
+    for L in range(1, min(OR_OPT_LENGTH, m - 1) + 1):
+        delta, i, g = _best_or_opt(dist, start, P, Q, L)
+        #Gaps i..i + L put the run back where it was
+        changes = {(a, b): _length(dist, start, _moved(path, a, L, b)) - base for a in range(m - L + 1) for b in range(m + 1) if not a <= b <= a + L}
+        assert delta == pytest.approx(min(changes.values()))
+        assert delta == pytest.approx(changes[(i, g)])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_improved_path_is_a_local_optimum(seed):
+    dist, start = _instance(10, seed)
+    path = improve_path(dist, start)
+    assert sorted(path.tolist()) == list(range(10))
+    length = _length(dist, start, path)
+    assert length <= _length(dist, start, np.arange(10))
+    #No single move of either kind shortens the result
+    for a in range(10):
+        for b in range(a + 1, 10):
+            assert _length(dist, start, _reversed(path, a, b)) >= length - 1e-6
+        for L in range(1, OR_OPT_LENGTH + 1):
+            for b in range(11):
+                if a + L <= 10 and not a <= b <= a + L:
+                    assert _length(dist, start, _moved(path, a, L, b)) >= length - 1e-6
+
+
+def test_improve_order_keeps_every_tour_and_avoids_missing_arcs():
+    dist, depot_legs = _instance(8, 0)
+    #Two tours over stops 0..7; the arc 0 -> 1 is missing and 2 -> 3 is over max_leg
+    dist[0, 1], dist[2, 3] = np.nan, 5000
+    order, offsets = np.arange(8), np.array([0, 4, 8])
+    improved = improve_order(dist, np.arange(8), depot_legs, order, offsets, max_leg=2000)
+    assert sorted(improved[:4].tolist()) == [0, 1, 2, 3] and sorted(improved[4:].tolist()) == [4, 5, 6, 7]
+    tour = improved[:4].tolist()
+    assert (0, 1) not in zip(tour, tour[1:]) and (2, 3) not in zip(tour, tour[1:])
+
+    depot_legs[5] = np.nan
+    with pytest.raises(IndexError, match="no depot leg for 1 of 8 stops"):
+        improve_order(dist, np.arange(8), depot_legs, order, offsets, max_leg=2000)
@@ -0,0 +1,99 @@
+#The compiled greedy and leg kernels (kernels.py) against the NumPy path of tours.py, on a synthetic city: both have to give
+#the same tours, stop for stop. A quarter of the arcs between streets are dropped (NaN, as arcs no depot file collected), so
+#the unreachable-candidate path is exercised as well.
+
+import numpy as np
+import pytest
+
+from zedz_model import kernels, tours
+from zedz_model.consolidation import consolidate_shipments
+from zedz_model.network import ArcStore
+from zedz_model.synthesizer import synthesize_shipments
+from zedz_model.synthetic import synthetic_city
+
+
+@pytest.fixture(scope="module")
+def city():
+    return synthetic_city(nodes=150, depots=6, parcels_per_day=2000, seed=3)
+
+
+@pytest.fixture(scope="module")
+def arc_store(city):
+    store = city.arc_store()
+    streets = np.flatnonzero(store.street_ids >= 0)
+    dist = np.array(store.dist)
+    dropped = np.random.default_rng(1).random((len(streets), len(streets))) < 0.25
+    dist[streets[:, None], streets[None, :]] = np.where(dropped, np.nan, dist[streets[:, None], streets[None, :]])
+    return ArcStore(store.node_ids, store.street_ids, store.depot_ids, dist, np.array(store.dur))
+
+
+#Every street of the city in a shuffled order, as arc store indices
+@pytest.fixture(scope="module")
+def nodes(city, arc_store):
+    street_ids = np.random.default_rng(5).permutation(city.consumer_nodes["street_id"].to_numpy())
+    return arc_store.street_index(street_ids)
+
+
+@pytest.fixture(scope="module")
+def shipments(city, arc_store):
+    return synthesize_shipments(city.consumer_nodes, city.logistic_nodes, city.parcels_per_day, city.company_names, city.company_share, arc_store=arc_store, rng=11)
+
+
+def test_city_has_missing_arcs(arc_store, nodes):
+    assert np.isnan(arc_store.dist[nodes[:, None], nodes[None, :]]).any()
+
+
+@pytest.mark.parametrize("nearest_to", ["first", "last"])
+@pytest.mark.parametrize("capacity", [1, 7, 30, 1000])
+@pytest.mark.parametrize("candidates", [None, 8])
+def test_greedy_order_matches_numpy_path(arc_store, nodes, capacity, nearest_to, candidates):
+    neighbours = arc_store.neighbours(candidates) if candidates else None
+    order, offsets = tours._greedy_order(nodes, arc_store.dist, capacity, nearest_to, neighbours)
+    compiled_order, compiled_offsets = kernels.greedy_order(nodes, arc_store.dist, capacity, nearest_to, tours.MAX_LEG)
+    np.testing.assert_array_equal(compiled_order, order)
+    np.testing.assert_array_equal(compiled_offsets, offsets)
+    assert np.diff(offsets).max() <= capacity
+
+
+#A short MAX_LEG closes tours early: no candidate is reachable
+@pytest.mark.parametrize("nearest_to", ["first", "last"])
+def test_greedy_order_matches_numpy_path_with_short_max_leg(monkeypatch, arc_store, nodes, nearest_to):
+    max_leg = float(np.nanpercentile(arc_store.dist[nodes[:, None], nodes[None, :]], 10))
+    monkeypatch.setattr(tours, "MAX_LEG", max_leg)
+    order, offsets = tours._greedy_order(nodes, arc_store.dist, 30, nearest_to, arc_store.neighbours(8))
+    compiled_order, compiled_offsets = kernels.greedy_order(nodes, arc_store.dist, 30, nearest_to, max_leg)
+    np.testing.assert_array_equal(compiled_order, order)
+    np.testing.assert_array_equal(compiled_offsets, offsets)
+    #Every stop after the first of a tour is closer than max_leg to the stop it was measured from
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        tour = nodes[order[start:end]]
+        anchors = np.full(len(tour) - 1, tour[0]) if nearest_to == "first" else tour[:-1]
+        assert (arc_store.dist[anchors, tour[1:]] < max_leg).all()
+    assert len(offsets) - 1 > len(nodes) / 30
+
+
+def test_tour_legs_match_numpy_path(arc_store, nodes):
+    order, offsets = tours._greedy_order(nodes, arc_store.dist, 30, "first")
+    ordered_nodes = nodes[order]
+    first_legs = np.arange(len(offsets) - 1, dtype=np.float64)
+    expected = np.empty(len(order))
+    expected[1:] = arc_store.dist[ordered_nodes[:-1], ordered_nodes[1:]]
+    expected[offsets[:-1]] = first_legs
+    np.testing.assert_array_equal(kernels.tour_legs(ordered_nodes, offsets, arc_store.dist, first_legs), expected)
+
+
+#Tours of every carrier formed over parcels and over stops (several parcels each), with the kernels and without
+@pytest.mark.parametrize("consolidated", [False, True])
+@pytest.mark.parametrize("nearest_to", ["first", "last"])
+def test_form_tours_matches_numpy_path(monkeypatch, arc_store, shipments, consolidated, nearest_to):
+    table = consolidate_shipments(shipments) if consolidated else shipments
+    for carrier in tours.CARRIERS:
+        rows = np.flatnonzero(table["Sender"].to_numpy() == carrier)
+        monkeypatch.setattr(kernels, "ENABLED", True)
+        compiled = tours.form_tours(table, rows, arc_store, 30, nearest_to)
+        monkeypatch.setattr(kernels, "ENABLED", False)
+        reference = tours.form_tours(table, rows, arc_store, 30, nearest_to)
+        for field in ("rows", "nodes", "legs", "offsets", "parcels"):
+            np.testing.assert_array_equal(getattr(compiled, field), getattr(reference, field))
+        #Every parcel of the carrier is delivered once, whether the rows are parcels or stops
+        assert compiled.parcels.sum() == np.sum(shipments["Sender"].to_numpy() == carrier)
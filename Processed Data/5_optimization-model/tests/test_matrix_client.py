@@ -0,0 +1,141 @@
+#DistanceMatrixClient against a local stand-in of the Distance Matrix API: request blocks within the server's limits, retries
+#with backoff, and the pair cache
+
+import asyncio
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from zedz_model.matrix_client import DistanceMatrixClient, PairCache, RequestFailed
+
+LAT = 34.0 + 0.003 * np.arange(9)
+LON = -118.5 + 0.002 * (np.arange(9) % 4)
+
+#The stand-in finds no route from the first point to the last one
+NO_ROUTE = ((round(LAT[0], 5), round(LON[0], 5)), (round(LAT[-1], 5), round(LON[-1], 5)))
+
+
+def _point(text):
+    lat, lon = text.split(",")
+    return float(lat), float(lon)
+
+
+#Distance (meters) the stand-in answers for a pair; walking routes are longer
+def _distance(origin, destination, mode="driving"):
+    meters = round(abs(origin[0] - destination[0]) * 111000 + abs(origin[1] - destination[1]) * 92000)
+    return meters * (2 if mode == "walking" else 1)
+
+
+def _matrix_response(params):
+    origins = [_point(text) for text in params["origins"].split("|")]
+    destinations = [_point(text) for text in params["destinations"].split("|")]
+    rows = []
+    for origin in origins:
+        elements = []
+        for destination in destinations:
+            if (origin, destination) == NO_ROUTE:
+                elements.append({"status": "ZERO_RESULTS"})
+            else:
+                meters = _distance(origin, destination, params.get("mode"))
+                elements.append({"status": "OK", "distance": {"value": meters}, "duration": {"value": meters // 10}})
+        rows.append({"elements": elements})
+    return 200, {"status": "OK", "rows": rows}
+
+
+def _expected(mode="driving"):
+    points = [(round(a, 5), round(b, 5)) for a, b in zip(LAT, LON)]
+    dist = np.array([[_distance(a, b, mode) for b in points] for a in points], dtype=np.float64)
+    dist[0, -1] = np.nan
+    return dist
+
+
+def _client(server, **options):
+    return DistanceMatrixClient(base_url=server.url, requests_per_second=1000, backoff=0.01, timeout=5, **options)
+
+
+def test_blocks_stay_within_the_server_limits(serve):
+    server = serve(_matrix_response)
+    client = _client(server, max_elements=12, max_origins=4, max_destinations=5)
+    dist, dur = asyncio.run(client.matrix(LAT, LON))
+    np.testing.assert_array_equal(dist, _expected())
+    assert np.isnan(dur[0, -1]) and dur[1, 0] == _expected()[1, 0] // 10
+
+    sizes = [(len(params["origins"].split("|")), len(params["destinations"].split("|"))) for params in server.requests]
+    assert all(o <= 4 and d <= 5 and o * d <= 12 for o, d in sizes)
+    assert len(server.requests) == client.requests > 1
+    #Every ordered pair of distinct points is asked for exactly once
+    asked = [(o, d) for params in server.requests for o, d in itertools.product(params["origins"].split("|"), params["destinations"].split("|")) if o != d]
+    assert len(asked) == len(set(asked)) == len(LAT) * (len(LAT) - 1)
+
+
+def test_symmetric_asks_for_one_direction(serve):
+    server = serve(_matrix_response)
+    client = _client(server, symmetric=True)
+    dist, _ = asyncio.run(client.matrix(LAT, LON))
+    #Blocks are rectangles over the upper triangle, so some pairs are asked in both directions, but far from all
+    asked = {(o, d) for params in server.requests for o, d in itertools.product(params["origins"].split("|"), params["destinations"].split("|")) if o != d}
+    assert len(asked) < len(LAT) * (len(LAT) - 1)
+    upper = np.triu(_expected(), 1)
+    np.testing.assert_array_equal(dist, upper + upper.T)
+
+
+def test_busy_server_is_retried_with_backoff(serve):
+    failures = iter([(200, {"status": "OVER_QUERY_LIMIT"}), (503, {}), (429, {})])
+    server = serve(lambda params: next(failures, None) or _matrix_response(params))
+    client = _client(server, max_elements=100, max_origins=25, max_destinations=25, concurrency=1)
+    dist, _ = asyncio.run(client.matrix(LAT, LON))
+    np.testing.assert_array_equal(dist, _expected())
+    #One block, answered on its fourth attempt
+    assert client.requests == 1 and len(server.requests) == 4
+
+
+def test_retries_run_out(serve):
+    server = serve(lambda params: (200, {"status": "OVER_QUERY_LIMIT"}))
+    client = _client(server, retries=2)
+    with pytest.raises(RequestFailed, match="3 attempts: OVER_QUERY_LIMIT"):
+        asyncio.run(client.matrix(LAT[:2], LON[:2]))
+
+
+def test_request_errors_are_not_retried(serve):
+    server = serve(lambda params: (200, {"status": "REQUEST_DENIED"}))
+    client = _client(server)
+    with pytest.raises(RequestFailed, match="1 attempts: REQUEST_DENIED"):
+        asyncio.run(client.matrix(LAT[:2], LON[:2]))
+    assert len(server.requests) == 1
+
+
+def test_cache_round_trip(serve, tmp_path):
+    server = serve(_matrix_response)
+    path = str(tmp_path / "pairs.sqlite")
+    first = _client(server, cache=path)
+    dist, dur = asyncio.run(first.matrix(LAT, LON))
+    first.cache.close()
+    requests = len(server.requests)
+
+    #A new client on the same cache file asks for nothing, and gets the same matrices back (no route included)
+    second = _client(server, cache=path)
+    cached_dist, cached_dur = asyncio.run(second.matrix(LAT, LON))
+    assert second.requests == 0 and len(server.requests) == requests
+    np.testing.assert_array_equal(cached_dist, dist)
+    np.testing.assert_array_equal(cached_dur, dur)
+
+    #Another travel mode is another cache entry
+    walking = _client(server, cache=second.cache, mode="walking")
+    walking_dist, _ = asyncio.run(walking.matrix(LAT, LON))
+    assert walking.requests > 0
+    np.testing.assert_array_equal(walking_dist, _expected("walking"))
+    np.testing.assert_array_equal(asyncio.run(second.matrix(LAT, LON))[0], dist)
+
+
+def test_pair_cache_get_many(tmp_path):
+    cache = PairCache(str(tmp_path / "pairs.sqlite"))
+    a, b, c = (34.0, -118.5), (34.1, -118.4), (34.2, -118.3)
+    cache.put_many({(a, b): (100.0, 10.0), (b, a): (math.nan, math.nan)})
+    cache.put_many({(a, c): (300.0, 30.0)}, mode="walking")
+    found = cache.get_many([(a, b), (b, a), (a, c), (c, a)])
+    assert found[(a, b)] == (100.0, 10.0) and all(math.isnan(value) for value in found[(b, a)])
+    assert set(found) == {(a, b), (b, a)}
+    assert cache.get_many([(a, c)], mode="walking") == {(a, c): (300.0, 30.0)}
+    assert len(cache) == 3
@@ -0,0 +1,38 @@
+#The compiled arc network: depot arc files written and read in one format, and the memory-mapped artifact against the store
+#built in memory
+
+import numpy as np
+import pandas as pd
+
+from zedz_model.network import ARC_COLUMNS, load_network, read_arc_file, write_arc_file
+from zedz_model.synthetic import synthetic_city
+
+
+def test_arc_files_have_the_arc_columns_only(tmp_path):
+    arcs = pd.DataFrame({"Distance in meter": [0, 519], "duration in seconds": [0, 60], "origin_id": [2, 2], "destination_id": [2, 22]}, index=[5, 9])
+    write_arc_file(arcs, tmp_path / "depot-2_arcs.xlsx")
+    assert pd.read_excel(tmp_path / "depot-2_arcs.xlsx").columns.tolist() == ARC_COLUMNS
+    pd.testing.assert_frame_equal(read_arc_file(tmp_path / "depot-2_arcs.xlsx"), arcs.reset_index(drop=True))
+
+
+#The shipped files carry their old index ("Unnamed: 0") and the coordinates of both ends as well
+def test_shipped_layout_is_read_by_column(tmp_path):
+    arcs = pd.DataFrame({"latitude_x": [34.03, 34.03], "Distance in meter": [0, 519], "duration in seconds": [0, 60], "origin_id": [2, 2],
+                         "destination_id": [2, 22], "spot_y": ["Depot-2", "Street-22"]})
+    arcs.to_excel(tmp_path / "depot-2_arcs.xlsx")
+    assert pd.read_excel(tmp_path / "depot-2_arcs.xlsx").columns[0] == "Unnamed: 0"
+    pd.testing.assert_frame_equal(read_arc_file(tmp_path / "depot-2_arcs.xlsx"), arcs[ARC_COLUMNS])
+
+
+def test_written_city_compiles_to_the_same_store(tmp_path):
+    city = synthetic_city(nodes=40, depots=4, parcels_per_day=300, seed=1)
+    city.write(tmp_path)
+    expected = city.arc_store()
+    store = load_network(str(tmp_path))
+    np.testing.assert_array_equal(store.dist, expected.dist)
+    np.testing.assert_array_equal(store.dur, expected.dur)
+    np.testing.assert_array_equal(store.street_ids, expected.street_ids)
+    #The second load maps the artifact instead of compiling again
+    again = load_network(str(tmp_path))
+    assert isinstance(again.dist, np.memmap)
+    np.testing.assert_array_equal(again.dist, expected.dist)
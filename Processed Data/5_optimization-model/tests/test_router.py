@@ -0,0 +1,80 @@
+#The offline router: snapping through the vertex grid against a brute-force nearest vertex, and the shortest-path search on a
+#small street grid
+
+import math
+
+import numpy as np
+import pytest
+
+from zedz_model.router import RoadGraph, _shortest_paths, haversine, route_matrix
+
+
+def _graph(lat, lon, u=(), v=(), time=None):
+    u, v = np.asarray(u, dtype=np.int64), np.asarray(v, dtype=np.int64)
+    length = haversine(lat[u], lon[u], lat[v], lon[v])
+    return RoadGraph.from_edges(lat, lon, u, v, length, length / 10 if time is None else np.asarray(time, dtype=np.float64))
+
+
+def _brute_snap(graph, lat, lon):
+    scale = math.cos(math.radians(float(np.mean(graph.lat))))
+    x, y = graph.lon * scale, graph.lat
+    return np.array([np.argmin((x - b * scale) ** 2 + (y - a) ** 2) for a, b in zip(lat, lon)])
+
+
+#A side x side street grid, about 100 m between crossings, every street in both directions
+def _street_grid(side):
+    row, column = np.divmod(np.arange(side * side), side)
+    lat, lon = 34.0 + row * 0.0009, -118.5 + column * 0.0011
+    right, up = np.flatnonzero(column < side - 1), np.flatnonzero(row < side - 1)
+    u = np.concatenate([right, right + 1, up, up + side])
+    v = np.concatenate([right + 1, right, up + side, up])
+    return _graph(lat, lon, u, v)
+
+
+@pytest.mark.parametrize("vertices", [1, 2, 50, 5000])
+def test_snap_matches_brute_force(vertices):
+    rng = np.random.default_rng(vertices)
+    lat, lon = 34.0 + rng.random(vertices) * 0.05, -118.5 + rng.random(vertices) * 0.05
+    #Repeated vertices, so some points tie
+    lat[: vertices // 3], lon[: vertices // 3] = np.round(lat[: vertices // 3], 3), np.round(lon[: vertices // 3], 3)
+    graph = _graph(lat, lon)
+    #Points inside the extract, around it and far away from it
+    points_lat = np.concatenate([33.98 + rng.random(300) * 0.09, [30.0, 40.0]])
+    points_lon = np.concatenate([-118.52 + rng.random(300) * 0.09, [-118.5, -100.0]])
+    vertex, offset = graph.snap(points_lat, points_lon)
+    np.testing.assert_array_equal(vertex, _brute_snap(graph, points_lat, points_lon))
+    np.testing.assert_allclose(offset, haversine(points_lat, points_lon, lat[vertex], lon[vertex]))
+
+
+def test_snap_on_a_straight_street():
+    lat, lon = np.full(40, 34.0), np.linspace(-118.5, -118.45, 40)
+    graph = _graph(lat, lon)
+    rng = np.random.default_rng(0)
+    points_lat, points_lon = 33.99 + rng.random(100) * 0.02, -118.52 + rng.random(100) * 0.09
+    np.testing.assert_array_equal(graph.snap(points_lat, points_lon)[0], _brute_snap(graph, points_lat, points_lon))
+
+
+def test_shortest_paths_take_the_fastest_route():
+    #0 -> 1 -> 3 is shorter, 0 -> 2 -> 3 is faster; 3 -> 0 is one-way and 4 is unreachable
+    lat = np.array([34.0, 34.001, 33.999, 34.0, 34.01])
+    lon = np.array([-118.5, -118.499, -118.499, -118.498, -118.49])
+    graph = _graph(lat, lon, [0, 1, 0, 2, 3], [1, 3, 2, 3, 0], time=[50, 50, 10, 10, 1])
+    adjacency = (graph.indptr.tolist(), graph.indices.tolist(), graph.time.tolist(), graph.length.tolist())
+    times, lengths = _shortest_paths(adjacency, 0, [3, 4, 0])
+    assert times.tolist() == [20.0, math.inf, 0.0]
+    assert lengths[0] == pytest.approx(haversine(lat[0], lon[0], lat[2], lon[2]) + haversine(lat[2], lon[2], lat[3], lon[3]))
+    assert _shortest_paths(adjacency, 3, [0])[0].tolist() == [1.0]
+
+
+def test_route_matrix_on_a_street_grid():
+    graph = _street_grid(12)
+    rng = np.random.default_rng(2)
+    corners = rng.choice(len(graph), 10, replace=False)
+    dist, dur = route_matrix(graph, graph.lat[corners], graph.lon[corners], processes=1)
+    #Between crossings of a grid the shortest route is the Manhattan distance
+    row, column = np.divmod(corners, 12)
+    blocks_up = np.abs(row[:, None] - row[None, :])
+    blocks_across = np.abs(column[:, None] - column[None, :])
+    expected = blocks_up * haversine(34.0, -118.5, 34.0009, -118.5) + blocks_across * haversine(34.0, -118.5, 34.0, -118.4989)
+    np.testing.assert_allclose(dist, expected, rtol=1e-3)
+    np.testing.assert_allclose(dur, dist / 10, rtol=1e-9)
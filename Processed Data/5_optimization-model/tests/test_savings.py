@@ -0,0 +1,66 @@
+#Clarke-Wright savings of savings.py on instances small enough to follow every merge by hand
+
+import numpy as np
+import pytest
+
+from zedz_model.savings import savings_order
+
+#Four stops 10 m from the depot. Linking 0 -> 1 saves 9, 1 -> 2 saves 8, 2 -> 3 saves 7 and 3 -> 0 saves 9.5; every other
+#link costs more than the depot leg it saves
+DEPOT_LEGS = np.full(4, 10.0)
+
+
+def _dist():
+    dist = np.full((4, 4), 50.0)
+    np.fill_diagonal(dist, 0)
+    dist[0, 1], dist[1, 2], dist[2, 3], dist[3, 0] = 1, 2, 3, 0.5
+    return dist
+
+
+def _tours(order, offsets):
+    return [order[a:b].tolist() for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def test_merges_in_order_of_savings():
+    #3 -> 0, 0 -> 1 and 1 -> 2 are joined; 2 -> 3 would close the path into a cycle
+    assert _tours(*savings_order(np.arange(4), _dist(), DEPOT_LEGS, 10, 1000)) == [[3, 0, 1, 2]]
+
+
+def test_stop_capacity():
+    #3 -> 0 first, then 0 -> 1 would make three stops; 1 -> 2 joins the two left over
+    assert _tours(*savings_order(np.arange(4), _dist(), DEPOT_LEGS, 2, 1000)) == [[3, 0], [1, 2]]
+
+
+def test_payload():
+    #Stop 0 and 3 together are too heavy, so 0 -> 1 (saving 9) is the first link taken
+    weights = np.array([6.0, 1.0, 1.0, 5.0])
+    assert _tours(*savings_order(np.arange(4), _dist(), DEPOT_LEGS, 10, 1000, weights, 10)) == [[0, 1, 2], [3]]
+
+
+def test_missing_and_long_arcs_are_never_used():
+    #With 3 -> 0 missing and arcs of 2 m or more too long, only 0 -> 1 is left to link
+    dist = _dist()
+    dist[3, 0] = np.nan
+    assert _tours(*savings_order(np.arange(4), dist, DEPOT_LEGS, 10, 2)) == [[0, 1], [2], [3]]
+
+
+def test_missing_depot_leg():
+    with pytest.raises(IndexError, match="no depot leg for 1 of 4 stops"):
+        savings_order(np.arange(4), _dist(), np.array([10.0, np.nan, 10.0, 10.0]), 10, 1000)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_never_longer_than_a_tour_per_stop(seed):
+    rng = np.random.default_rng(seed)
+    n = 9
+    dist = rng.uniform(10, 500, (n, n))
+    np.fill_diagonal(dist, 0)
+    depot_legs = rng.uniform(100, 500, n)
+    order, offsets = savings_order(np.arange(n), dist, depot_legs, 4, 1000)
+    tours = _tours(order, offsets)
+    assert sorted(order.tolist()) == list(range(n)) and max(len(tour) for tour in tours) <= 4
+    #Every link taken saves distance against serving its stop from the depot
+    links = [(a, b) for tour in tours for a, b in zip(tour[:-1], tour[1:])]
+    assert all(dist[a, b] < depot_legs[b] for a, b in links)
+    length = sum(depot_legs[tour[0]] + sum(dist[a, b] for a, b in zip(tour[:-1], tour[1:])) for tour in tours)
+    assert length < depot_legs.sum() and len(tours) < n
@@ -0,0 +1,41 @@
+#ScenarioEngine: the model's own variant reproduces the tables of run_scenarios(), and partitions a variant leaves untouched
+#come from the cache
+
+import pytest
+
+from zedz_model import ScenarioEngine, consolidate_shipments, run_scenarios, scenario_tables, synthesize_shipments, synthetic_city
+
+
+@pytest.fixture(scope="module")
+def city_stops():
+    city = synthetic_city(nodes=120, depots=6, parcels_per_day=2400, zedz_share=0.2, seed=5)
+    store = city.arc_store()
+    shipments = synthesize_shipments(city.consumer_nodes, city.logistic_nodes, city.parcels_per_day, city.company_names, city.company_share, store, rng=1)
+    return city, store, consolidate_shipments(shipments)
+
+
+def test_model_variant_matches_run_scenarios(city_stops):
+    _, store, stops = city_stops
+    expected = run_scenarios(stops, store, processes=1)
+    engine = ScenarioEngine(stops, store)
+    for scenario in ("status quo", "mandatory ZEDZ"):
+        for table, engine_table in zip(scenario_tables(expected[scenario], scenario), scenario_tables(engine.evaluate(scenario), scenario)):
+            assert table.equals(engine_table)
+
+
+def test_unchanged_partitions_are_cached(city_stops):
+    city, store, stops = city_stops
+    engine = ScenarioEngine(stops, store)
+    engine.evaluate()
+    formed = engine.misses
+    #The same zone again forms nothing
+    engine.evaluate()
+    assert engine.misses == formed and engine.hits == formed
+    #Moving one more depot into the zone only re-forms the two partitions of its carrier
+    depots = city.logistic_nodes
+    inside = depots["depot_id"][depots["ZEDZ(inside =1)"] == 1].tolist()
+    wider = inside + depots["depot_id"][depots["ZEDZ(inside =1)"] == 0].head(1).tolist()
+    engine.evaluate(zedz_depots=wider)
+    assert engine.misses - formed == 2
+    table = engine.sweep([{"name": "model"}, {"name": "wider", "zedz_depots": wider}])
+    assert table.index.tolist() == ["model", "wider"] and engine.misses - formed == 2
@@ -0,0 +1,56 @@
+#The stage cache: dataframes, tables and tours come back from disk as they were stored, missing text values included, and
+#fetch computes an output once per key
+
+import numpy as np
+import pandas as pd
+
+from zedz_model.stage_cache import StageCache
+from zedz_model.tours import Tours
+
+
+def _frame():
+    return pd.DataFrame({"Carrier": ["UPS", np.nan, "FedEx", None], "Parcels": [3, 1, 4, 1], "Distance": [519.0, np.nan, 12.5, 0.0]},
+                        index=pd.Index(["a", "b", np.nan, "d"], name="stop"))
+
+
+def test_frame_round_trip_keeps_missing_text(tmp_path):
+    cache = StageCache(str(tmp_path))
+    cache.put("shipments", "k", _frame())
+    frame = cache.get("shipments", "k")
+    pd.testing.assert_frame_equal(frame, _frame(), check_dtype=False, check_index_type=False)
+    assert frame["Carrier"].isna().tolist() == [False, True, False, True]
+    assert frame.index.isna().tolist() == [False, False, True, False]
+    assert "nan" not in frame["Carrier"].tolist()
+
+
+def test_tables_round_trip(tmp_path):
+    cache = StageCache(str(tmp_path))
+    tables = {"status quo dist": _frame(), "status quo vehicles": pd.DataFrame({"Vehicles": [2, 3]}, index=["UPS", "DHL"])}
+    cache.put("tables", "k", tables)
+    loaded = cache.get("tables", "k")
+    assert list(loaded) == list(tables)
+    pd.testing.assert_frame_equal(loaded["status quo vehicles"], tables["status quo vehicles"])
+    assert loaded["status quo dist"]["Carrier"].isna().sum() == 2
+
+
+def test_tours_round_trip(tmp_path):
+    cache = StageCache(str(tmp_path))
+    tours = Tours(np.array([4, 0, 2]), np.array([7, 3, 9]), np.array([120.0, np.nan, 80.0]), np.array([0, 2, 3]), "UPS", "van", np.array([2, 1, 5]))
+    cache.put("tours", "k", {"status quo": {("UPS", "all"): tours}})
+    loaded = cache.get("tours", "k")["status quo"][("UPS", "all")]
+    for field in ("rows", "nodes", "legs", "offsets", "parcels"):
+        np.testing.assert_array_equal(getattr(loaded, field), getattr(tours, field))
+    assert (loaded.carrier, loaded.vehicle) == ("UPS", "van")
+
+
+def test_fetch_computes_once_per_key(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or _frame()
+    key = cache.key("shipments", _frame(), seed=1)
+    assert key == cache.key("shipments", _frame(), seed=1) != cache.key("shipments", _frame(), seed=2)
+    cache.fetch("shipments", key, compute)
+    cache.fetch("shipments", key, compute)
+    #Without a key (no seed) nothing is cached
+    cache.fetch("shipments", None, compute)
+    assert len(calls) == 2 and (cache.hits, cache.misses) == (1, 1)
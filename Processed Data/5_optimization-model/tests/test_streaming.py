@@ -0,0 +1,42 @@
+#The depot-by-depot pipeline: the same parcels as synthesize_shipments() from the same seed, and tours that never mix two
+#depots
+
+import numpy as np
+import pandas as pd
+
+from zedz_model import depot_shipments, streamed_scenario_tours, synthesize_shipments, synthetic_city
+
+
+def _city():
+    city = synthetic_city(nodes=120, depots=6, parcels_per_day=2400, zedz_share=0.2, seed=5)
+    return city, city.arc_store()
+
+
+def _inputs(city):
+    return city.consumer_nodes, city.logistic_nodes, city.parcels_per_day, city.company_names, city.company_share
+
+
+def test_same_parcels_as_synthesize_shipments():
+    city, store = _city()
+    expected = synthesize_shipments(*_inputs(city), store, rng=1)
+    streamed = pd.concat([shipments.assign(Sender_ID=depot_id) for depot_id, _, shipments in depot_shipments(*_inputs(city), store, rng=1)])
+    columns = ["Receiver_ID", "Sender_ID", "Receiver_ZEDZ", "Sender_ZEDZ"]
+    counts = lambda df: df.groupby(columns).size()
+    pd.testing.assert_series_equal(counts(streamed), counts(expected), check_index_type=False)
+    np.testing.assert_allclose(np.sort(streamed["Distance"].to_numpy()), np.sort(expected["Distance"].to_numpy()), rtol=1e-6)
+
+
+def test_tours_stay_within_one_depot():
+    city, store = _city()
+    streamed = streamed_scenario_tours(*_inputs(city), store, rng=1)
+    #Depot of every (carrier, consumer node row)
+    depot_of = {}
+    for depot_id, carrier, shipments in depot_shipments(*_inputs(city), store, rng=1):
+        depot_of.update({(carrier, node): depot_id for node in shipments["Node"].tolist()})
+    parcels = 0
+    for tour_arrays in streamed.values():
+        for (carrier, _), tours in tour_arrays.items():
+            parcels += tours.parcels.sum()
+            for t in range(len(tours)):
+                assert len({depot_of[(carrier, node)] for node in tours.rows[tours.offsets[t]: tours.offsets[t + 1]].tolist()}) == 1
+    assert parcels == 2 * sum(city.parcels_per_day)
@@ -0,0 +1,62 @@
+#ZEDZ flags: the shipped "ZEDZ(inside =1)" column is kept as the source of truth, the polygon only flags points without one
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from zedz_model.model import ModelInputs
+from zedz_model.zones import PolygonSet, classify_nodes, zedz_flags
+
+MODEL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Shipped streets the ZEDZ polygon classifies differently from the shipped column: the column has 125, 240, 264 and 346
+#outside and 328 inside
+DISAGREE = [125, 240, 264, 328, 346]
+
+
+def _consumer_nodes():
+    return pd.read_csv(os.path.join(MODEL_DIR, "consumer_nodes edited.csv"))
+
+
+def test_polygon_against_the_shipped_column():
+    nodes = _consumer_nodes()
+    flags = zedz_flags(nodes["longitude"], nodes["latitude"])
+    assert nodes["street_id"][flags != nodes["ZEDZ(inside =1)"]].tolist() == DISAGREE
+    assert nodes["ZEDZ(inside =1)"].sum() == 75
+
+
+def test_shipped_flags_are_kept():
+    nodes = _consumer_nodes()
+    np.testing.assert_array_equal(classify_nodes(nodes)["ZEDZ(inside =1)"], nodes["ZEDZ(inside =1)"])
+    depots = pd.read_csv(os.path.join(MODEL_DIR, "depot_nodes edited.csv"))
+    np.testing.assert_array_equal(classify_nodes(depots)["ZEDZ(inside =1)"], depots["ZEDZ(inside =1)"])
+
+
+def test_new_points_are_tested_against_the_polygon():
+    nodes = _consumer_nodes().head(3).copy()
+    nodes["ZEDZ(inside =1)"] = [1, np.nan, np.nan]
+    #A point in the middle of the zone and one far outside it
+    nodes[["latitude", "longitude"]] = [[33.9, -118.3], [34.008, -118.489], [33.9, -118.3]]
+    assert classify_nodes(nodes)["ZEDZ(inside =1)"].tolist() == [1, 1, 0]
+    #Another boundary classifies every row against it
+    square = [(-118.31, 33.89), (-118.29, 33.89), (-118.29, 33.91), (-118.31, 33.91)]
+    assert classify_nodes(nodes, square)["ZEDZ(inside =1)"].tolist() == [1, 0, 1]
+
+
+def test_model_node_zones_follow_the_shipped_tables():
+    inputs = ModelInputs(MODEL_DIR)
+    zones = pd.Series(inputs.node_zones, index=inputs.entire_nodes["ID"])
+    streets = inputs.entire_nodes["street_id"] != "-"
+    expected = _consumer_nodes().set_index("street_id")["ZEDZ(inside =1)"]
+    np.testing.assert_array_equal(zones[streets.to_numpy()], expected[inputs.entire_nodes["street_id"][streets].astype(int)])
+    depots = pd.read_csv(os.path.join(MODEL_DIR, "depot_nodes edited.csv")).drop_duplicates("depot_id").set_index("depot_id")["ZEDZ(inside =1)"]
+    np.testing.assert_array_equal(zones[(~streets).to_numpy()], depots[inputs.entire_nodes["depot_id"][~streets].astype(int)])
+
+
+def test_polygon_set_even_odd():
+    #A square with a notch cut into its top edge
+    notched = PolygonSet([[(0, 0), (4, 0), (4, 4), (3, 4), (2, 1), (1, 4), (0, 4)]], ["notched"])
+    inside = notched.contains([0.5, 2, 2, 5, 3.5], [3, 0.5, 3, 2, 3.9])[:, 0]
+    assert inside.tolist() == [True, True, False, False, True]
+    assert notched.first_containing([2, 5], [0.5, 2], missing="none").tolist() == ["notched", "none"]
@@ -0,0 +1,49 @@
+#ZEDZ Shipment Model helpers
+#See zedz_model/model.py for the entry points of a full model run, and "ZEDZ Shipment Model Final.py" for its settings.
+#
+#The names below are imported from their modules on first use, so importing the package costs nothing and a process only
+#loads the modules (and their dependencies: pandas, asyncio, sqlite...) it actually uses.
+
+import importlib
+
+_EXPORTS = {
+    "profiling": ["Profiler"],
+    "network": ["ArcStore", "SparseArcStore", "build_arc_store", "build_sparse_arc_store", "compile_network", "load_network", "network_sources", "read_arc_file", "write_arc_file"],
+    "synthesizer": ["SHIPMENT_COLUMNS", "parcel_weights", "synthesize_shipments"],
+    "consolidation": ["STOP_KEY", "consolidate_shipments"],
+    "improve": ["improve_order", "improve_path"],
+    "savings": ["savings_order"],
+    "kernels": ["check_kernels"],
+    "tours": ["CARRIERS", "SCENARIOS", "VEHICLE_CAPACITY", "Tours", "concat_tours", "form_tours", "scenario_partitions", "scenario_tours", "tours_to_frames"],
+    "runner": ["default_context", "run_scenarios"],
+    "aggregate": ["check_legs", "scenario_tables", "tour_totals", "vehicle_table"],
+    "montecarlo": ["run_replications", "summarize_replications"],
+    "scenarios": ["ScenarioEngine"],
+    "streaming": ["depot_shipments", "stream_depot_tours", "streamed_scenario_tours"],
+    "estimator": ["DetourEstimator", "EstimatedArcStore", "error_table", "estimated_arc_store", "estimated_legs", "fit_arc_estimator"],
+    "router": ["RoadGraph", "RouteRows", "RoutedArcStore", "arc_table", "load_road_graph", "route_matrix"],
+    "matrix_client": ["DistanceMatrixClient", "PairCache"],
+    "zones": ["ZEDZ_POLYGON", "PolygonSet", "classify_nodes", "load_polygons", "notebook_tracts", "zedz_flags", "zone_variants"],
+    "geocoder": ["GeocodeCache", "Geocoder", "geocode_nodes"],
+    "synthetic": ["SyntheticCity", "synthetic_city"],
+    "stage_cache": ["STAGE_VERSIONS", "StageCache"],
+    "model": ["DEFAULT_CONFIG", "ModelInputs", "aggregate_tables", "export_tables", "form_scenario_tours", "load_config", "make_config", "model_inputs", "replicate", "run_model", "stage_keys", "synthesize"],
+}
+
+#Module of every exported name
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULE_OF)
+
+
+def __getattr__(name):
+    if name not in _MODULE_OF:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + _MODULE_OF[name], __name__), name)
+    #Kept, so the next access is a plain attribute lookup
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
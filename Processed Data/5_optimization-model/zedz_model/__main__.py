@@ -0,0 +1,35 @@
+#Command line of a full model run, from the directory holding the inputs:
+#    python -m zedz_model --config model.toml
+#The config file (TOML or JSON) holds any of the settings of model.DEFAULT_CONFIG; the options below override it.
+
+import argparse
+
+from .model import load_config, make_config, run_model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m zedz_model", description="Run the ZEDZ Shipment Model and write the FinalResults files")
+    parser.add_argument("--config", default=None, help="TOML or JSON file of model settings")
+    parser.add_argument("--directory", default=None, help="directory of the input files")
+    parser.add_argument("--output-dir", default=None, help="where the FinalResults files are written")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the shipment draws")
+    parser.add_argument("--replications", type=int, default=None, help="Monte Carlo replicates (0: off)")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (1: no pool)")
+    parser.add_argument("--profile-report", default=None, help="write the run profile to this .json or .csv file")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config) if args.config else make_config()
+    for setting in ("directory", "output_dir", "seed", "replications", "processes", "profile_report"):
+        if getattr(args, setting) is not None:
+            config[setting] = getattr(args, setting)
+    result = run_model(config)
+    for path in result["files"]:
+        print(path)
+    if "estimated legs" in result["tables"]:
+        for scenario, row in result["tables"]["estimated legs"].iterrows():
+            print("%s: %d of %d legs estimated, %.1f%% of the distance" % (scenario, row["estimated legs"], row["legs"], 100 * row["estimated share of distance"]))
+    print("%d shipments, %.1f s" % (len(result["shipments"]), result["profiler"].seconds))
+
+
+if __name__ == "__main__":
+    main()
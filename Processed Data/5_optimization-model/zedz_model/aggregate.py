@@ -0,0 +1,96 @@
+#Result tables of the ZEDZ Shipment Model
+#
+#Builds the one-row distance and tour-count tables written to "FinalResults - * dist.xlsx" / "FinalResults - * tours.xlsx", and
+#the per-tour / per-vehicle tables written to "FinalResults - * vehicles.xlsx", straight from the per-leg distances the tour
+#engine records, so no tour is walked leg by leg again.
+
+import numpy as np
+import pandas as pd
+
+from .tours import CARRIERS, SCENARIOS
+
+
+#Column names of a partition's distance and tour count, e.g. "UPS_dist" / "UPS_tours" for the status quo,
+#"UPS_nZdist" / "UPS_nZ_tours" for the diesel partition of the mandatory ZEDZ
+def _dist_column(prefix, label):
+    return "%s_%sdist" % (prefix, label)
+
+
+def _tours_column(prefix, label):
+    return "%s_%s_tours" % (prefix, label) if label else "%s_tours" % prefix
+
+
+#Raises ValueError when tours have unreachable legs (NaN: arcs that were never collected), naming every (carrier, partition
+#label) with its number of such legs, so no table is written with NaN (or NaN summed to 0.0) distances
+def check_legs(tour_arrays):
+    unreachable = {key: int(np.isnan(tours.legs).sum()) for key, tours in tour_arrays.items()}
+    unreachable = {key: n for key, n in unreachable.items() if n}
+    if unreachable:
+        listed = ", ".join("%s%s: %d" % (carrier, " " + label if label else "", n) for (carrier, label), n in unreachable.items())
+        raise ValueError("tours with unreachable legs (%s); their distances are unknown. Route the missing arcs (road_file) or estimate "
+                         "them (estimate_arcs = \"missing\")" % listed)
+
+
+#Total driving distance and number of tours per (carrier, partition label) of one scenario's tours (see check_legs())
+def tour_totals(tour_arrays):
+    check_legs(tour_arrays)
+    return {key: (float(np.sum(tours.legs)), len(tours)) for key, tours in tour_arrays.items()}
+
+
+#One-row tables of the distance driven and the tours conducted by each company (and in total) under a scenario,
+#with the columns of the "FinalResults" tables
+def scenario_tables(tour_arrays, scenario, carriers=CARRIERS):
+    totals = tour_totals(tour_arrays)
+    labels = [label for label, _, _ in SCENARIOS[scenario]]
+    dist = {}
+    tours = {}
+    for label in labels:
+        for carrier, prefix in carriers.items():
+            dist[_dist_column(prefix, label)], tours[_tours_column(prefix, label)] = totals[(carrier, label)]
+        dist[_dist_column("Total", label)] = sum(totals[(carrier, label)][0] for carrier in carriers)
+        tours[_tours_column("Total", label)] = sum(totals[(carrier, label)][1] for carrier in carriers)
+    #Scenarios with several partitions also get an overall total
+    if len(labels) > 1:
+        dist["Total_dist"] = sum(dist[_dist_column("Total", label)] for label in labels)
+        tours["Total_tours"] = sum(tours[_tours_column("Total", label)] for label in labels)
+    return pd.DataFrame([dist]), pd.DataFrame([tours])
+
+
+#Distance driven by tour and by vehicle under a scenario, with the columns of the "FinalResults - * vehicles.xlsx" tables.
+#Tours are listed partition by partition (diesel before EV) and company by company. Each vehicle makes two consecutive tours
+#of its company and every company starts with a new vehicle; scenarios with several partitions get an "EV" column.
+#Tours with unreachable legs raise ValueError (see check_legs()).
+def vehicle_table(tour_arrays, scenario, carriers=CARRIERS):
+    check_legs(tour_arrays)
+    partitions = SCENARIOS[scenario]
+    company = []
+    vehicle = []
+    distance = []
+    parcels = []
+    ev = []
+    vehicle_number = 1
+    for label, _, vehicle_class in partitions:
+        for carrier, prefix in carriers.items():
+            tours = tour_arrays[(carrier, label)]
+            n = len(tours)
+            company.append(np.full(n, prefix, dtype=object))
+            vehicle.append(vehicle_number + np.arange(n) // 2)
+            distance.append(tours.distances())
+            parcels.append(None if tours.parcels is None else tours.tour_parcels())
+            ev.append(np.full(n, int(vehicle_class == "EV")))
+            #A company with no tours still uses up a vehicle number, as the numbering always has
+            vehicle_number += max((n + 1) // 2, 1)
+
+    vehicles = pd.DataFrame({
+        "Company": np.concatenate(company),
+        "Vehicle": np.concatenate(vehicle),
+    })
+    vehicles["Tour"] = np.arange(1, len(vehicles) + 1)
+    vehicles["Distance by tour"] = np.concatenate(distance)
+    #Parcels delivered on every tour, where the tours know them
+    if all(tour_parcels is not None for tour_parcels in parcels):
+        vehicles["Parcels by tour"] = np.concatenate(parcels)
+    if len(partitions) > 1:
+        vehicles["EV"] = np.concatenate(ev)
+    vehicles["Distance by vehicle"] = vehicles.groupby("Vehicle")["Distance by tour"].transform("sum")
+    return vehicles
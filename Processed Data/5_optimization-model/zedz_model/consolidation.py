@@ -0,0 +1,31 @@
+#Parcel-to-stop consolidation
+#
+#The shipment synthesizer emits one row per parcel, so a receiver with 20 parcels a day is 20 rows, of which the tour engine only
+#ever visits the first (the others are dropped once their receiver is served). consolidate_shipments() collapses the parcels
+#into one stop per (carrier, depot, receiver) with the number of parcels ("Quantity") and their total weight ("Weight"), so tour
+#formation works on as many rows as there are stops and every parcel stays accounted for in the tours (see Tours.parcels).
+#
+#Stops are listed in the order of their first parcel, so the tours formed from stops are the ones formed from the parcels.
+
+import numpy as np
+
+#Columns identifying a stop, where the shipment table has them (the per-depot tables of streaming.py only have Receiver_ID)
+STOP_KEY = ["Sender", "Sender_ID", "Receiver_ID"]
+
+
+#One row per (carrier, depot, receiver) stop, with the columns of its first parcel plus "Quantity" (parcels) and, when the
+#shipments have a "Weight" column, their total "Weight". Tables that are already consolidated add up their quantities.
+#With return_inverse the stop of every shipment row is returned as well.
+def consolidate_shipments(shipment_df, return_inverse=False):
+    key = [column for column in STOP_KEY if column in shipment_df.columns]
+    stop_of = shipment_df.groupby(key, sort=False).ngroup().to_numpy()
+    _, first = np.unique(stop_of, return_index=True)
+
+    stops = shipment_df.iloc[first].reset_index(drop=True)
+    quantity = shipment_df["Quantity"].to_numpy(dtype=np.float64) if "Quantity" in shipment_df.columns else None
+    stops["Quantity"] = np.bincount(stop_of, quantity, minlength=len(first)).astype(np.int64)
+    if "Weight" in shipment_df.columns:
+        stops["Weight"] = np.bincount(stop_of, shipment_df["Weight"].to_numpy(dtype=np.float64), minlength=len(first))
+    if return_inverse:
+        return stops, stop_of
+    return stops
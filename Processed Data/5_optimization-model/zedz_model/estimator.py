@@ -0,0 +1,328 @@
+#Learned detour-factor estimator of driving distances and durations
+#
+#Arcs for a new node or depot take a router call per pair (arcs_creation.ipynb, router.py), while the arc store of the model
+#already holds thousands of measured pairs whose ends have coordinates. DetourEstimator is fitted on those pairs: for every band
+#of straight-line distance and every (origin zone, destination zone) pair, e.g. inside / outside the ZEDZ, it keeps the median
+#detour factor (driving distance / straight line) and the median speed (driving distance / duration). A cell with fewer than
+#min_pairs pairs takes the factors of its band, and a band with too few pairs the overall ones, so a prediction is a single
+#vectorized table lookup.
+#
+#fit_arc_estimator() fits it on the arcs of an arc store and measures its errors on held-out pairs first (error_table()).
+#EstimatedArcStore fills the arcs an arc store is missing with its estimates, and estimated_arc_store() builds a whole store
+#from coordinates alone, for a first screening of scenarios with new nodes or depots before their arcs are collected.
+#estimated_legs() counts the legs of formed tours that were estimated, so results built on estimates say how much they are.
+#
+#Command line, from the 5_optimization-model directory:
+#    python -m zedz_model.estimator --output detour_estimator.json
+#prints the error table of an estimator fitted on the model's network and writes the estimator to detour_estimator.json.
+
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .network import ArcStore, _id_column, load_network
+from .profiling import count
+from .router import haversine
+from .zones import zedz_flags
+
+#Lower edges (meters of straight-line distance) of the distance bands; the last band is open-ended
+BANDS = [0, 250, 500, 1000, 2000, 4000, 8000]
+
+#Fewest pairs a (band, zone pair) cell is fitted on
+MIN_PAIRS = 30
+
+#Pairs sampled from an arc store to fit an estimator on
+MAX_PAIRS = 200000
+
+#Pairs closer than this (meters, straight line) are left out of the fit: their ratio says nothing about a detour
+MIN_STRAIGHT = 1.0
+
+
+class DetourEstimator:
+    #bands: lower edges of the distance bands; zones: number of zone labels (zone pair of an arc: origin zone * zones + destination
+    #zone); detour, speed: factors of every band and zone pair, shape (bands, zones * zones); errors: see error_table()
+    def __init__(self, bands, zones, detour, speed, errors=None):
+        self.bands = np.asarray(bands, dtype=np.float64)
+        self.zones = int(zones)
+        self.detour = np.asarray(detour, dtype=np.float64)
+        self.speed = np.asarray(speed, dtype=np.float64)
+        self.errors = errors
+
+    #Fits the factors on pairs of straight-line distance straight, driving distance dist and duration dur (zone_pair: see above)
+    @classmethod
+    def fit(cls, straight, dist, dur, zone_pair=None, zones=1, bands=BANDS, min_pairs=MIN_PAIRS):
+        straight = np.asarray(straight, dtype=np.float64)
+        dist = np.asarray(dist, dtype=np.float64)
+        dur = np.asarray(dur, dtype=np.float64)
+        zone_pair = np.zeros(len(straight), dtype=np.int64) if zone_pair is None else np.asarray(zone_pair, dtype=np.int64)
+        used = (straight >= MIN_STRAIGHT) & np.isfinite(dist) & (dist > 0)
+        timed = used & np.isfinite(dur) & (dur > 0)
+        ratio = np.divide(dist, straight, out=np.full(len(dist), np.nan), where=used)
+        speed = np.divide(dist, dur, out=np.full(len(dist), np.nan), where=timed)
+        band = np.searchsorted(bands, straight, side="right") - 1
+
+        #Median of values over the pairs of a mask, or fallback when there are too few of them
+        def median(values, mask, fallback):
+            values = values[mask & np.isfinite(values)]
+            return float(np.median(values)) if len(values) >= min_pairs else fallback
+
+        overall = median(ratio, used, 1.0), median(speed, timed, 1.0)
+        detour = np.empty((len(bands), zones * zones))
+        speeds = np.empty((len(bands), zones * zones))
+        for b in range(len(bands)):
+            in_band = band == b
+            band_detour, band_speed = median(ratio, in_band, overall[0]), median(speed, in_band, overall[1])
+            for z in range(zones * zones):
+                detour[b, z] = median(ratio, in_band & (zone_pair == z), band_detour)
+                speeds[b, z] = median(speed, in_band & (zone_pair == z), band_speed)
+        return cls(bands, zones, detour, speeds)
+
+    #Detour factor and speed of every pair
+    def factors(self, straight, zone_pair=0):
+        band = np.maximum(np.searchsorted(self.bands, straight, side="right") - 1, 0)
+        return self.detour[band, zone_pair], self.speed[band, zone_pair]
+
+    #Estimated driving distance and duration of pairs of straight-line distance straight
+    def predict(self, straight, zone_pair=0):
+        detour, speed = self.factors(straight, zone_pair)
+        dist = np.asarray(straight, dtype=np.float64) * detour
+        count("estimated arcs", np.size(dist))
+        return dist, dist / speed
+
+    #Estimated driving distance and duration between points (zones: zone label of each end)
+    def predict_points(self, lat1, lon1, lat2, lon2, zone1=0, zone2=0):
+        return self.predict(haversine(lat1, lon1, lat2, lon2), np.asarray(zone1) * self.zones + np.asarray(zone2))
+
+    def to_dict(self):
+        return {"bands": self.bands.tolist(), "zones": self.zones, "detour": self.detour.tolist(), "speed": self.speed.tolist()}
+
+    @classmethod
+    def from_dict(cls, fitted):
+        return cls(fitted["bands"], fitted["zones"], fitted["detour"], fitted["speed"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+#Error statistics of estimates against measured values: mean absolute error, absolute percentage errors (mean, median, 90th
+#percentile) and the bias (mean signed percentage error)
+def error_stats(estimated, actual):
+    error = estimated - actual
+    percent = 100 * error / actual
+    return {"mean abs error": float(np.mean(np.abs(error))), "mean abs % error": float(np.mean(np.abs(percent))),
+            "median abs % error": float(np.median(np.abs(percent))), "p90 abs % error": float(np.percentile(np.abs(percent), 90)),
+            "bias %": float(np.mean(percent))}
+
+
+#Errors of the estimator's distances and durations on the given pairs, one row per distance band plus a row "all"
+def error_table(estimator, straight, dist, dur, zone_pair=0):
+    straight = np.asarray(straight, dtype=np.float64)
+    zone_pair = np.broadcast_to(zone_pair, straight.shape)
+    estimated_dist, estimated_dur = estimator.predict(straight, zone_pair)
+    band = np.maximum(np.searchsorted(estimator.bands, straight, side="right") - 1, 0)
+    labels = ["%g-%g m" % (low, high) for low, high in zip(estimator.bands[:-1], estimator.bands[1:])] + [">%g m" % estimator.bands[-1]]
+    rows = {}
+    for label, pairs in list(zip(labels, (band == b for b in range(len(labels))))) + [("all", np.ones(len(straight), dtype=bool))]:
+        timed = pairs & (dur > 0)
+        if not pairs.any():
+            continue
+        row = {"pairs": int(pairs.sum())}
+        row.update({"distance " + name: value for name, value in error_stats(estimated_dist[pairs], dist[pairs]).items()})
+        if timed.any():
+            row.update({"duration " + name: value for name, value in error_stats(estimated_dur[timed], dur[timed]).items()})
+        rows[label] = row
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+#Measured pairs of an arc store (dense or sparse) as (origin, destination, distance, duration) index and value arrays,
+#at most max_pairs of them (sampled with rng)
+def _arc_pairs(arc_store, max_pairs, rng):
+    if arc_store.sparse:
+        origin = np.repeat(np.arange(len(arc_store)), np.diff(arc_store.indptr))
+        destination = np.asarray(arc_store.indices, dtype=np.int64)
+    else:
+        origin, destination = np.nonzero(~np.isnan(np.asarray(arc_store.dist)))
+    if len(origin) > max_pairs:
+        picked = np.sort(rng.choice(len(origin), max_pairs, replace=False))
+        origin, destination = origin[picked], destination[picked]
+    return origin, destination, arc_store.dist[origin, destination], arc_store.dur[origin, destination]
+
+
+#Fits a DetourEstimator on the measured arcs of arc_store, whose nodes are at lat / lon (in the store's index order) with zone
+#labels node_zones (None: the ZEDZ flag of every node). The errors on a random holdout share of the pairs are measured with an
+#estimator fitted on the other pairs and kept in the errors of the returned estimator, which is fitted on every pair.
+def fit_arc_estimator(arc_store, lat, lon, node_zones=None, bands=BANDS, min_pairs=MIN_PAIRS, holdout=0.2, max_pairs=MAX_PAIRS, seed=0):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if node_zones is None:
+        node_zones = zedz_flags(lon, lat)
+    node_zones = np.asarray(node_zones, dtype=np.int64)
+    zones = int(node_zones.max()) + 1 if len(node_zones) else 1
+
+    rng = np.random.default_rng(seed)
+    origin, destination, dist, dur = _arc_pairs(arc_store, max_pairs, rng)
+    straight = haversine(lat[origin], lon[origin], lat[destination], lon[destination])
+    zone_pair = node_zones[origin] * zones + node_zones[destination]
+    used = (straight >= MIN_STRAIGHT) & np.isfinite(dist) & (dist > 0)
+    straight, dist, dur, zone_pair = straight[used], dist[used], dur[used], zone_pair[used]
+
+    errors = None
+    if holdout > 0:
+        test = rng.random(len(straight)) < holdout
+        trained = DetourEstimator.fit(straight[~test], dist[~test], dur[~test], zone_pair[~test], zones, bands, min_pairs)
+        errors = error_table(trained, straight[test], dist[test], dur[test], zone_pair[test])
+    estimator = DetourEstimator.fit(straight, dist, dur, zone_pair, zones, bands, min_pairs)
+    estimator.errors = errors
+    return estimator
+
+
+#Zone label of every node for an estimator: node_zones, or the ZEDZ flags when it has zones and node_zones is None
+def _node_zones(estimator, lat, lon, node_zones):
+    if node_zones is None:
+        return zedz_flags(lon, lat).astype(np.int64) if estimator.zones > 1 else np.zeros(len(lat), dtype=np.int64)
+    return np.asarray(node_zones, dtype=np.int64)
+
+
+#Arc matrix of an EstimatedArcStore: the matrix of the store it wraps, with the arcs missing there (NaN) estimated
+#(field 0: distance, 1: duration)
+class EstimatedMatrix:
+    def __init__(self, matrix, store, field):
+        self.matrix = matrix
+        self.store = store
+        self.field = field
+        self.shape = (len(store.lat), len(store.lat))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        values = np.array(self.matrix[key], dtype=np.float64)
+        missing = np.isnan(values)
+        if missing.any():
+            a, b = np.broadcast_arrays(*(np.asarray(index, dtype=np.int64) for index in key))
+            values[missing] = self.store.estimate(a[missing], b[missing])[self.field]
+        return values[()]
+
+
+#An arc store whose arcs missing from arc_store are estimated by estimator (nodes at lat / lon with zone labels node_zones).
+#node_zones None: the ZEDZ flag of every node, as fit_arc_estimator() labels them.
+#Over dense matrices every missing arc is estimated once, into dense copies, so the compiled kernels and the neighbour lists
+#apply as to any dense store. Over sparse or routed stores arcs are estimated on lookup; estimates can then be shorter than the
+#arcs in the neighbour lists of arc_store, so the store has none: the greedy engine scans every remaining stop.
+class EstimatedArcStore(ArcStore):
+    def __init__(self, arc_store, estimator, lat, lon, node_zones=None):
+        self.arc_store = arc_store
+        self.estimator = estimator
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.node_zones = _node_zones(estimator, self.lat, self.lon, node_zones)
+        self.dense = isinstance(arc_store.dist, np.ndarray) and isinstance(arc_store.dur, np.ndarray)
+        if self.dense:
+            dist, dur = self._filled()
+        else:
+            dist, dur = EstimatedMatrix(arc_store.dist, self, 0), EstimatedMatrix(arc_store.dur, self, 1)
+        super().__init__(arc_store.node_ids, arc_store.street_ids, arc_store.depot_ids, dist, dur)
+
+    #Dense copies of the matrices of arc_store with every missing arc estimated
+    def _filled(self):
+        dist = np.array(self.arc_store.dist, dtype=np.float64)
+        dur = np.array(self.arc_store.dur, dtype=np.float64)
+        a, b = np.nonzero(np.isnan(dist) | np.isnan(dur))
+        estimated_dist, estimated_dur = self.estimate(a, b)
+        dist[a, b] = np.where(np.isnan(dist[a, b]), estimated_dist, dist[a, b])
+        dur[a, b] = np.where(np.isnan(dur[a, b]), estimated_dur, dur[a, b])
+        return dist, dur
+
+    #Estimated (distance, duration) of the arcs a -> b
+    def estimate(self, a, b):
+        return self.estimator.predict_points(self.lat[a], self.lon[a], self.lat[b], self.lon[b], self.node_zones[a], self.node_zones[b])
+
+    def neighbours(self, k):
+        return super().neighbours(k) if self.dense else None
+
+    def fingerprint(self):
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(self.arc_store.fingerprint().encode())
+            digest.update(json.dumps(self.estimator.to_dict()).encode())
+            for array in (self.lat, self.lon, self.node_zones):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def nbytes(self):
+        filled = self.dist.nbytes + self.dur.nbytes if self.dense else 0
+        return self.arc_store.nbytes() + filled + self.lat.nbytes + self.lon.nbytes + self.node_zones.nbytes
+
+
+#A dense ArcStore of estimated arcs between every pair of nodes of entire_nodes ("Entire Nodes.xlsx" or a table with its ID,
+#street_id, depot_id, latitude and longitude columns), e.g. with new nodes or depots that have no arcs yet. node_zones: zone label
+#of every node (None: the ZEDZ flag).
+def estimated_arc_store(entire_nodes, estimator, node_zones=None):
+    lat = entire_nodes["latitude"].to_numpy(dtype=np.float64)
+    lon = entire_nodes["longitude"].to_numpy(dtype=np.float64)
+    node_zones = _node_zones(estimator, lat, lon, node_zones)
+    dist, dur = estimator.predict_points(lat[:, None], lon[:, None], lat[None, :], lon[None, :], node_zones[:, None], node_zones[None, :])
+    return ArcStore(entire_nodes["ID"].to_numpy(dtype=np.int64), _id_column(entire_nodes["street_id"]), _id_column(entire_nodes["depot_id"]), dist, dur)
+
+
+#Legs of the tours of every scenario ({scenario: {(carrier, partition label): Tours}}, formed from the rows of stops) that were
+#estimated: the legs whose arc collected (the store the estimates filled in, e.g. EstimatedArcStore.arc_store; None: every leg
+#was estimated) does not have. One row per scenario with the number of legs, of estimated legs, and the distance of the
+#estimated legs with its share of the scenario's distance.
+def estimated_legs(all_tour_arrays, stops, collected=None):
+    sender_ids = stops["Sender_ID"].to_numpy()
+    receiver_ids = stops["Receiver_ID"].to_numpy()
+    rows = {}
+    for scenario, tour_arrays in all_tour_arrays.items():
+        legs = estimated = 0
+        distance = estimated_distance = 0.0
+        for tours in tour_arrays.values():
+            if collected is None:
+                is_estimated = np.ones(len(tours.legs), dtype=bool)
+            else:
+                is_estimated = np.zeros(len(tours.legs), dtype=bool)
+                is_estimated[1:] = np.isnan(collected.dist[tours.nodes[:-1], tours.nodes[1:]])
+                first = tours.rows[tours.offsets[:-1]]
+                is_estimated[tours.offsets[:-1]] = np.isnan(collected.depot_to_street(sender_ids[first], receiver_ids[first]))
+            legs += len(tours.legs)
+            estimated += int(is_estimated.sum())
+            distance += float(np.sum(tours.legs))
+            estimated_distance += float(np.sum(tours.legs[is_estimated]))
+        rows[scenario] = {"legs": legs, "estimated legs": estimated, "estimated distance": estimated_distance,
+                          "estimated share of distance": estimated_distance / distance if distance > 0 else 0.0}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m zedz_model.estimator", description="Fit a detour-factor estimator of driving distances on the model's arcs")
+    parser.add_argument("--directory", default=".", help="directory of the input files")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of the pairs held out to measure the errors")
+    parser.add_argument("--min-pairs", type=int, default=MIN_PAIRS, help="fewest pairs a (band, zone pair) cell is fitted on")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="write the fitted estimator to this JSON file")
+    args = parser.parse_args(argv)
+
+    arc_store = load_network(args.directory)
+    entire_nodes = pd.read_excel(os.path.join(args.directory, "Entire Nodes.xlsx"))
+    estimator = fit_arc_estimator(arc_store, entire_nodes["latitude"], entire_nodes["longitude"], min_pairs=args.min_pairs, holdout=args.holdout, seed=args.seed)
+    if estimator.errors is not None:
+        with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.2f}".format):
+            print(estimator.errors)
+    if args.output is not None:
+        estimator.save(args.output)
+        print(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#Concurrent, cached geocoding of node addresses
+#
+#zip-to-latlong.ipynb geocoded address.csv and depot_address.csv with one blocking request per address and only printed the
+#results. Geocoder normalizes and deduplicates the addresses, serves every address it has seen before from a persistent sqlite
+#cache, and resolves the rest concurrently under a rate limit with the same retry and backoff as the distance-matrix client.
+#Addresses the service cannot find (ZERO_RESULTS) are cached as not found and not asked for again, unless the geocoder is made
+#with cache_not_found=False: it then neither stores them nor trusts the ones stored, and asks for them on every run. geocode_nodes() writes the
+#coordinates straight into a node table ("consumer_nodes edited.csv" or "depot_nodes edited.csv" style).
+#
+#base_url points the geocoder at any server answering like the Google Geocoding API, e.g. a local fake endpoint for testing.
+#Command line, from the 5_optimization-model directory (the API key is read from GOOGLE_MAPS_API_KEY):
+#    python -m zedz_model.geocoder "consumer_nodes edited.csv" --output "consumer_nodes geocoded.csv"
+
+import argparse
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import urllib.parse
+
+import numpy as np
+import pandas as pd
+
+from .matrix_client import RateLimiter, fetch_json
+from .profiling import count
+
+GOOGLE_GEOCODING_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+#Results written to the cache at a time while geocoding, so an interrupted run loses at most this many
+CACHE_BATCH = 100
+
+
+#Normalized address: case and spacing do not matter
+def normalize_address(address):
+    return re.sub(r"\s+", " ", str(address)).strip().casefold()
+
+
+#Persistent cache of the coordinates of addresses by cache key (see Geocoder.key()); addresses that could not be found are stored
+#with NULL coordinates
+class GeocodeCache:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS addresses (address TEXT PRIMARY KEY, latitude REAL, longitude REAL)")
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    #{address: (latitude, longitude)} of the cached addresses among the given ones, NaN for addresses that were not found.
+    #The addresses are looked up in one query, joined from a temporary table of the wanted ones.
+    def get_many(self, addresses):
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (address TEXT)")
+        self.connection.execute("DELETE FROM wanted")
+        self.connection.executemany("INSERT INTO wanted VALUES (?)", [(address,) for address in addresses])
+        rows = self.connection.execute("SELECT addresses.address, latitude, longitude FROM wanted JOIN addresses ON addresses.address = wanted.address").fetchall()
+        self.connection.execute("DELETE FROM wanted")
+        self.connection.commit()
+        return {address: (math.nan, math.nan) if lat is None else (lat, lon) for address, lat, lon in rows}
+
+    #Stores {address: (latitude, longitude)}, NaN for addresses that were not found
+    def put_many(self, locations):
+        self.connection.executemany("INSERT OR REPLACE INTO addresses VALUES (?, ?, ?)",
+                                    [(address, None if math.isnan(lat) else lat, None if math.isnan(lon) else lon) for address, (lat, lon) in locations.items()])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+class Geocoder:
+    #api_key: sent as the "key" parameter (None: not sent, e.g. for a local fake endpoint)
+    #requests_per_second, concurrency: rate limit and number of requests in flight
+    #retries, backoff: attempts after a failed request and the first wait (seconds) between them, doubled every attempt
+    #cache: a GeocodeCache or the path of one (None: no persistent cache)
+    #suffix: appended to every address before it is sent, e.g. ", Santa Monica, CA"
+    #cache_not_found: cache the addresses the service cannot find, so they are not asked for again (False: ask for them every run)
+    def __init__(self, api_key=None, base_url=GOOGLE_GEOCODING_URL, requests_per_second=10, concurrency=8, retries=4, backoff=1.0, timeout=30, cache=None, suffix="",
+                 cache_not_found=True):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.requests_per_second = requests_per_second
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = GeocodeCache(cache) if isinstance(cache, str) else cache
+        self.suffix = suffix
+        self.cache_not_found = cache_not_found
+        self.requests = 0
+
+    #Cache key of an address: the normalized address as it is sent, suffix included, so the same street name in another city is
+    #another key
+    def key(self, address):
+        return normalize_address(str(address).strip() + self.suffix)
+
+    def _url(self, query):
+        params = {"address": query}
+        if self.api_key:
+            params["key"] = self.api_key
+        return self.base_url + "?" + urllib.parse.urlencode(params)
+
+    #Geocodes query (the address as written, with the suffix) and returns it with its cache key
+    async def _locate(self, key, query, limiter, semaphore):
+        self.requests += 1
+        count("geocoding requests")
+        result = await fetch_json(self._url(query), limiter, semaphore, self.retries, self.backoff, self.timeout, ok_statuses=("OK", "ZERO_RESULTS"))
+        if not result.get("results"):
+            return key, (math.nan, math.nan)
+        location = result["results"][0]["geometry"]["location"]
+        return key, (float(location["lat"]), float(location["lng"]))
+
+    #{cache key (see key()): (latitude, longitude)} for the given addresses, NaN where the service finds nothing. Addresses with
+    #the same key are sent once, as the first of them is written.
+    async def locate_many(self, addresses):
+        queries = {}
+        for address in addresses:
+            queries.setdefault(self.key(address), str(address).strip() + self.suffix)
+        wanted = sorted(queries)
+        locations = self.cache.get_many(wanted) if self.cache is not None else {}
+        if not self.cache_not_found:
+            locations = {key: location for key, location in locations.items() if not math.isnan(location[0])}
+        missing = [key for key in wanted if key not in locations]
+        count({"geocode cache hits": len(wanted) - len(missing), "geocode cache misses": len(missing)})
+
+        limiter = RateLimiter(self.requests_per_second)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.create_task(self._locate(key, queries[key], limiter, semaphore)) for key in missing]
+        found = {}
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, location = await finished
+                locations[key] = location
+                if self.cache_not_found or not math.isnan(location[0]):
+                    found[key] = location
+                #Cached in batches as results come in, so an interrupted run resumes close to where it stopped
+                if self.cache is not None and len(found) >= CACHE_BATCH:
+                    self.cache.put_many(found)
+                    found = {}
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.cache is not None and found:
+                self.cache.put_many(found)
+        return locations
+
+    #(latitude, longitude) arrays for a sequence of addresses
+    def geocode(self, addresses):
+        addresses = list(addresses)
+        locations = asyncio.run(self.locate_many(addresses))
+        coordinates = np.array([locations[self.key(address)] for address in addresses], dtype=np.float64).reshape(-1, 2)
+        return coordinates[:, 0], coordinates[:, 1]
+
+
+#Copy of a node table with its coordinate columns filled from its address column: street_address -> latitude / longitude for the
+#consumer nodes, depot_address -> depot_latitude / depot_longitude for the depot nodes
+def geocode_nodes(nodes, geocoder, address_column=None):
+    prefix = "depot_" if "depot_address" in nodes.columns else ""
+    if address_column is None:
+        address_column = "depot_address" if prefix else "street_address"
+    nodes = nodes.copy()
+    nodes[prefix + "latitude"], nodes[prefix + "longitude"] = geocoder.geocode(nodes[address_column])
+    return nodes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m zedz_model.geocoder", description="Fill the coordinates of a node table from its addresses")
+    parser.add_argument("nodes_file", help="node table (.csv or .xlsx) with a street_address or depot_address column")
+    parser.add_argument("--output", required=True, help="where the geocoded table is written (.csv or .xlsx)")
+    parser.add_argument("--address-column", default=None)
+    parser.add_argument("--suffix", default="", help='appended to every address, e.g. ", Santa Monica, CA"')
+    parser.add_argument("--cache", default="geocode_cache.sqlite", help="persistent geocoding cache")
+    parser.add_argument("--base-url", default=GOOGLE_GEOCODING_URL)
+    parser.add_argument("--requests-per-second", type=float, default=10)
+    parser.add_argument("--retry-not-found", action="store_true", help="ask again for the addresses cached as not found, and do not cache them")
+    args = parser.parse_args(argv)
+
+    geocoder = Geocoder(os.environ.get("GOOGLE_MAPS_API_KEY"), args.base_url, args.requests_per_second, cache=args.cache, suffix=args.suffix,
+                        cache_not_found=not args.retry_not_found)
+    read = pd.read_excel if args.nodes_file.lower().endswith(".xlsx") else pd.read_csv
+    nodes = geocode_nodes(read(args.nodes_file), geocoder, args.address_column)
+    if args.output.lower().endswith(".xlsx"):
+        nodes.to_excel(args.output, index=False)
+    else:
+        nodes.to_csv(args.output, index=False)
+    latitude = nodes["depot_latitude" if "depot_latitude" in nodes.columns else "latitude"]
+    print("%s: %d rows, %d not found, %d requests" % (args.output, len(nodes), latitude.isna().sum(), geocoder.requests))
+
+
+if __name__ == "__main__":
+    main()
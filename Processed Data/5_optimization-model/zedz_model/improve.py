@@ -0,0 +1,114 @@
+#Local-search improvement of formed tours (2-opt and Or-opt)
+#
+#The greedy engine measures candidates from the first stop of a tour, so the stops of a tour are not visited in a short order.
+#improve_order() reorders the stops of every tour with the best 2-opt move (reverse a stretch of stops) or Or-opt move (move a
+#run of 1 to 3 consecutive stops elsewhere) until no move shortens the tour or the iteration / time budget runs out. The set of
+#stops of a tour never changes, so tour counts stay the same and only the distances drop.
+#
+#A tour is an open path: it starts with the leg from the depot and ends at its last stop. Distances are not symmetric, so the
+#cost of a reversed stretch is not the cost of the stretch; both are read from prefix sums over the path, which makes the change
+#in length of every move O(1). All moves of a tour are evaluated at once as NumPy arrays over (start, end) positions.
+
+import time
+
+import numpy as np
+
+#Maximum number of moves applied to one tour
+MAX_ITERATIONS = 1000
+
+#Longest run of consecutive stops an Or-opt move relocates
+OR_OPT_LENGTH = 3
+
+#Cost given to a missing or unreachable arc, so moves that avoid such arcs are always improvements
+UNREACHABLE = 1e12
+
+#Moves have to shorten the tour by more than this (meters)
+TOLERANCE = 1e-6
+
+
+#Best 2-opt move of the path: returns (delta, i, j) for reversing path[i:j + 1]
+#P[i, x]: cost from the stop before position i (the depot for i = 0) to path[x]
+#Q[j, x]: cost from path[x] to the stop after position j (0 after the last stop)
+#F, R: prefix sums of the arc costs along the path and against it
+def _best_two_opt(P, Q, F, R):
+    m = len(F)
+    delta = (P - np.diag(P)[:, None]) + (R[None, :] - R[:, None]) - (F[None, :] - F[:, None]) + (Q.T - np.diag(Q)[None, :])
+    delta[np.tril_indices(m)] = np.inf
+    best = int(np.argmin(delta))
+    return delta.flat[best], best // m, best % m
+
+
+#Best Or-opt move of runs of length L: returns (delta, i, g) for moving path[i:i + L] into gap g (between path[g - 1] and path[g];
+#gap 0 follows the depot, gap m the last stop)
+def _best_or_opt(A, start, P, Q, L):
+    m = len(start)
+    i = np.arange(m - L + 1)
+    last = i + L - 1
+    #Removing the run joins the stop before it to the stop after it
+    join = np.where(i + L < m, P[i, np.minimum(i + L, m - 1)], 0.0)
+    gain = P[i, i] + Q[last, last] - join
+    #Inserting the run into gap g: (stop before g -> first of run) + (last of run -> stop after g) - (arc the run is put into)
+    before = np.vstack([start, A])
+    after = np.vstack([A.T, np.zeros(m)])
+    arc = np.concatenate([[start[0]], np.diag(A, 1), [0.0]])
+    delta = before[:, i].T + after[:, last].T - arc[None, :] - gain[:, None]
+    g = np.arange(m + 1)
+    delta[(g[None, :] >= i[:, None]) & (g[None, :] <= i[:, None] + L)] = np.inf
+    best = int(np.argmin(delta))
+    return delta.flat[best], best // (m + 1), best % (m + 1)
+
+
+#Improved visiting order of one tour: dist is the (penalized) arc cost matrix between its stops in their current order and start
+#the cost of the leg from the depot to each stop. Returns a permutation of range(len(start)).
+def improve_path(dist, start, max_iterations=MAX_ITERATIONS, deadline=None):
+    m = len(start)
+    path = np.arange(m)
+    if m < 3:
+        return path
+    for _ in range(max_iterations):
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        A = dist[np.ix_(path, path)]
+        start_cost = start[path]
+        P = np.vstack([start_cost, A[:-1]])
+        Q = np.vstack([A[:, 1:].T, np.zeros(m)])
+        F = np.concatenate([[0.0], np.cumsum(np.diag(A, 1))])
+        R = np.concatenate([[0.0], np.cumsum(np.diag(A, -1))])
+
+        best = _best_two_opt(P, Q, F, R) + ("2-opt", 0)
+        for L in range(1, min(OR_OPT_LENGTH, m - 1) + 1):
+            move = _best_or_opt(A, start_cost, P, Q, L) + ("or-opt", L)
+            if move[0] < best[0]:
+                best = move
+        delta, a, b, kind, L = best
+        if not delta < -TOLERANCE:
+            break
+        if kind == "2-opt":
+            path = np.concatenate([path[:a], path[a:b + 1][::-1], path[b + 1:]])
+        else:
+            run = path[a:a + L]
+            rest = np.concatenate([path[:a], path[a + L:]])
+            position = b if b < a else b - L
+            path = np.concatenate([rest[:position], run, rest[position:]])
+    return path
+
+
+#Improves the visiting order the tour engine produced: order lists stops (indices into nodes / depot_legs) tour after tour, tour t
+#being order[offsets[t]:offsets[t + 1]]. Arcs missing from dist or of max_leg or more count as unreachable. A missing depot leg
+#(NaN) raises IndexError: as unreachable it would move its stop off the start of the tour and the tour would be judged on the
+#legs that happen to be known. The budget is max_iterations moves per tour and time_limit seconds for all tours together
+#(None: no limit). Returns the new order.
+def improve_order(dist, nodes, depot_legs, order, offsets, max_leg, max_iterations=MAX_ITERATIONS, time_limit=None):
+    missing = np.isnan(depot_legs[order])
+    if missing.any():
+        raise IndexError("no depot leg for %d of %d stops, the tours cannot be improved" % (missing.sum(), len(order)))
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    order = order.copy()
+    for t in range(len(offsets) - 1):
+        stops = order[offsets[t]:offsets[t + 1]]
+        tour_nodes = nodes[stops]
+        tour_dist = np.asarray(dist[np.ix_(tour_nodes, tour_nodes)], dtype=np.float64)
+        tour_dist = np.where(np.isnan(tour_dist) | (tour_dist >= max_leg), UNREACHABLE, tour_dist)
+        start = depot_legs[stops]
+        order[offsets[t]:offsets[t + 1]] = stops[improve_path(tour_dist, start, max_iterations, deadline)]
+    return order
@@ -0,0 +1,137 @@
+#Compiled kernels of tour formation
+#
+#The greedy nearest-neighbour construction (see tours.py) is a sequential loop: every step depends on the stops chosen before it.
+#With numba installed (optional: pip install numba) it runs as a compiled loop over int32 stop-index arrays and the arc matrix,
+#and so does the leg-by-leg lookup of the tours' distances. Without numba, or with the environment variable ZEDZ_NUMBA=0,
+#tours.py keeps using its NumPy path (neighbour lists and vectorized row scans). Both paths return the same tours: the compiled
+#greedy kernel scans every remaining stop in shipment order and keeps the first nearest one, which is the stop the NumPy path
+#picks.
+#
+#The kernels read the arc matrix as it is stored (float64, memory-mapped or not) rather than a float32 copy: a float32 copy of a
+#large city's matrix would cost memory on every worker, and rounding distances to float32 can turn two different distances into a
+#tie and so change the tours. check_kernels() compares both paths on any arc store, e.g. a synthetic city (see synthetic.py).
+#
+#Functions are compiled on their first call (and cached in __pycache__ for the next process).
+
+import os
+
+import numpy as np
+
+from . import profiling
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+#Whether the compiled kernels are used
+ENABLED = njit is not None and os.environ.get("ZEDZ_NUMBA", "1") != "0"
+
+
+def _greedy_kernel(nodes, dist, capacity, from_first, max_leg):
+    n = len(nodes)
+    order = np.empty(n, dtype=np.int64)
+    offsets = np.empty(n + 1, dtype=np.int64)
+    offsets[0] = 0
+    tours = 0
+    visited = np.zeros(n, dtype=np.bool_)
+    next_start = 0
+    count = 0
+    while count < n:
+        #A new tour starts at the first remaining stop
+        while visited[next_start]:
+            next_start += 1
+        current = first_stop = next_start
+        visited[current] = True
+        order[count] = current
+        count += 1
+        tour_len = 1
+        while tour_len < capacity and count < n:
+            anchor = nodes[first_stop] if from_first else nodes[current]
+            #Nearest remaining stop closer than max_leg; missing arcs (NaN) fail every comparison and are never chosen
+            chosen = -1
+            chosen_dist = max_leg
+            for stop in range(n):
+                if not visited[stop]:
+                    d = dist[anchor, nodes[stop]]
+                    if d < chosen_dist:
+                        chosen = stop
+                        chosen_dist = d
+            #No reachable candidate: close the tour and start the next one from the depot
+            if chosen == -1:
+                break
+            visited[chosen] = True
+            order[count] = chosen
+            count += 1
+            tour_len += 1
+            current = chosen
+        tours += 1
+        offsets[tours] = count
+    return order, offsets[:tours + 1]
+
+
+def _legs_kernel(ordered_nodes, offsets, dist, first_legs):
+    legs = np.empty(len(ordered_nodes))
+    for t in range(len(offsets) - 1):
+        legs[offsets[t]] = first_legs[t]
+        for i in range(offsets[t] + 1, offsets[t + 1]):
+            legs[i] = dist[ordered_nodes[i - 1], ordered_nodes[i]]
+    return legs
+
+
+if njit is not None:
+    _greedy_kernel = njit(cache=True, nogil=True)(_greedy_kernel)
+    _legs_kernel = njit(cache=True, nogil=True)(_legs_kernel)
+
+
+#Compiles the kernels (or loads them from the cache of an earlier process) for a float64 arc matrix, so the first tour formation
+#is not timed with the compilation in it. Does nothing without numba.
+def warm_up():
+    if njit is None:
+        return
+    nodes = np.zeros(1, dtype=np.int32)
+    dist = np.zeros((1, 1))
+    order, offsets = _greedy_kernel(nodes, dist, 1, True, 1.0)
+    _legs_kernel(nodes[order], offsets, dist, np.zeros(1))
+
+
+#Greedy nearest-neighbour ordering of stops 0..n-1 (nodes are their arc store indices), like tours._greedy_order: returns the
+#visiting order and the tour offsets into it
+def greedy_order(nodes, dist, capacity, nearest_to, max_leg):
+    nodes = np.asarray(nodes, dtype=np.int32)
+    order, offsets = _greedy_kernel(nodes, dist, int(capacity), nearest_to == "first", float(max_leg))
+    #Every stop but the first of a tour is chosen by scanning all stops
+    profiling.count({"compiled greedy steps": len(nodes), "distance lookups": (len(nodes) - len(offsets) + 1) * len(nodes)})
+    return order, offsets
+
+
+#The legs of tours visiting ordered_nodes (tour t is offsets[t]:offsets[t + 1]) whose first legs, from the depot, are first_legs
+def tour_legs(ordered_nodes, offsets, dist, first_legs):
+    legs = _legs_kernel(np.asarray(ordered_nodes, dtype=np.int32), np.asarray(offsets, dtype=np.int64), dist, np.asarray(first_legs, dtype=np.float64))
+    profiling.count("distance lookups", len(ordered_nodes) - len(offsets) + 1)
+    return legs
+
+
+#Forms the tours of every carrier and scenario of shipment_df with the compiled kernels and with the NumPy path and returns the
+#(scenario, carrier, partition label) of every partition whose tours differ (an empty list when both paths agree)
+def check_kernels(shipment_df, arc_store, scenarios=("status quo", "mandatory ZEDZ"), **options):
+    global ENABLED
+    from .tours import scenario_tours
+
+    if njit is None:
+        raise RuntimeError("numba is not installed, there are no compiled kernels to check")
+    enabled = ENABLED
+    try:
+        ENABLED = True
+        compiled = {scenario: scenario_tours(shipment_df, arc_store, scenario, **options) for scenario in scenarios}
+        ENABLED = False
+        reference = {scenario: scenario_tours(shipment_df, arc_store, scenario, **options) for scenario in scenarios}
+    finally:
+        ENABLED = enabled
+    differ = []
+    for scenario in scenarios:
+        for (carrier, label), tours in compiled[scenario].items():
+            expected = reference[scenario][(carrier, label)]
+            if not all(np.array_equal(getattr(tours, field), getattr(expected, field), equal_nan=field == "legs") for field in ("rows", "nodes", "legs", "offsets", "parcels")):
+                differ.append((scenario, carrier, label))
+    return differ
@@ -0,0 +1,281 @@
+#Batched, cached and concurrent distance-matrix client
+#
+#For runs against a hosted router (the Google Distance Matrix API, or any server answering with the same response shape) instead
+#of the offline router in router.py. arcs_creation.ipynb sent one 1x1 request per ordered pair, one after another, with no retry
+#and nothing kept between depot files. DistanceMatrixClient instead:
+#  - collapses nodes with the same (rounded) coordinates and asks for every remaining pair once,
+#  - looks every pair up in a persistent sqlite pair cache first, so pairs collected for one depot file are never fetched again,
+#  - packs the missing pairs into blocks of up to max_elements origins x destinations per request,
+#  - sends the blocks concurrently with asyncio under a requests-per-second limit, retrying failed blocks with exponential
+#    backoff; every finished block is written to the cache at once, so an interrupted run resumes where it stopped.
+#With symmetric=True only one direction of each pair is requested and the other is taken to be the same, which halves the requests
+#at the cost of ignoring one-way streets.
+#
+#base_url points the client at another server, e.g. a local stand-in that imitates the API for testing.
+#Command line, from the 5_optimization-model directory (the API key is read from GOOGLE_MAPS_API_KEY):
+#    python -m zedz_model.matrix_client "Entire Nodes.xlsx" --depot 9 --cache pair_cache.sqlite
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from .profiling import count
+from .network import ARC_COLUMNS, write_arc_file
+from .router import depot_nodes
+
+GOOGLE_DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+#Decimal places coordinates are rounded to before they are compared or cached (about 1 m)
+COORDINATE_DECIMALS = 5
+
+#Response statuses worth retrying: the request was fine but the server was busy or over its quota
+RETRY_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+class RequestFailed(RuntimeError):
+    pass
+
+
+#Persistent cache of the distance (meters) and duration (seconds) between pairs of rounded coordinates, by travel mode ("driving",
+#"walking", ...)
+class PairCache:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS pairs (mode TEXT, origin_lat REAL, origin_lon REAL, destination_lat REAL, destination_lon REAL, "
+                                "distance REAL, duration REAL, PRIMARY KEY (mode, origin_lat, origin_lon, destination_lat, destination_lon))")
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pairs").fetchone()[0]
+
+    #{(origin, destination): (distance, duration)} for the given pairs of (lat, lon) points that are cached for the mode.
+    #The pairs are looked up in one query, joined from a temporary table of the wanted pairs.
+    def get_many(self, pairs, mode="driving"):
+        self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (origin_lat REAL, origin_lon REAL, destination_lat REAL, destination_lon REAL)")
+        self.connection.execute("DELETE FROM wanted")
+        self.connection.executemany("INSERT INTO wanted VALUES (?, ?, ?, ?)", [(*origin, *destination) for origin, destination in pairs])
+        rows = self.connection.execute("SELECT pairs.origin_lat, pairs.origin_lon, pairs.destination_lat, pairs.destination_lon, distance, duration FROM wanted "
+                                       "JOIN pairs ON pairs.mode = ? AND pairs.origin_lat = wanted.origin_lat AND pairs.origin_lon = wanted.origin_lon "
+                                       "AND pairs.destination_lat = wanted.destination_lat AND pairs.destination_lon = wanted.destination_lon", (mode,)).fetchall()
+        self.connection.execute("DELETE FROM wanted")
+        self.connection.commit()
+        return {((a, b), (c, d)): (math.nan if dist is None else dist, math.nan if dur is None else dur) for a, b, c, d, dist, dur in rows}
+
+    #Stores {(origin, destination): (distance, duration)} for the mode
+    def put_many(self, values, mode="driving"):
+        self.connection.executemany("INSERT OR REPLACE INTO pairs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    [(mode, *origin, *destination, _nan_to_none(dist), _nan_to_none(dur)) for (origin, destination), (dist, dur) in values.items()])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def _nan_to_none(value):
+    return None if value is None or math.isnan(value) else float(value)
+
+
+#Token bucket allowing rate acquisitions per second on average, in bursts of at most burst
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _get_json(url, timeout):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+#GET request for a JSON response of the Google Maps web services shape, under the rate limiter and semaphore. Network errors,
+#HTTP 429 / 5xx and the RETRY_STATUSES are retried up to retries times with exponential backoff; any other failure raises
+#RequestFailed. Returns the decoded response, whose "status" is one of ok_statuses.
+async def fetch_json(url, limiter, semaphore, retries=4, backoff=1.0, timeout=30, ok_statuses=("OK",)):
+    for attempt in range(retries + 1):
+        async with semaphore:
+            await limiter.acquire()
+            try:
+                result = await asyncio.to_thread(_get_json, url, timeout)
+                error = None if result.get("status") in ok_statuses else result.get("status")
+                retry = error in RETRY_STATUSES
+            except urllib.error.HTTPError as exc:
+                error = "HTTP %d" % exc.code
+                retry = exc.code == 429 or exc.code >= 500
+            except (urllib.error.URLError, OSError, ValueError) as exc:
+                error = str(exc)
+                retry = True
+        if error is None:
+            return result
+        if not retry or attempt == retries:
+            raise RequestFailed("request failed after %d attempts: %s" % (attempt + 1, error))
+        await asyncio.sleep(backoff * 2 ** attempt)
+
+
+def _round_point(lat, lon):
+    return (round(float(lat), COORDINATE_DECIMALS), round(float(lon), COORDINATE_DECIMALS))
+
+
+class DistanceMatrixClient:
+    #api_key: sent as the "key" parameter (None: not sent, e.g. for a local stand-in server)
+    #max_elements / max_origins / max_destinations: the server's limits per request (the Google defaults)
+    #requests_per_second, concurrency: rate limit and number of requests in flight
+    #retries, backoff: attempts after a failed request and the first wait (seconds) between them, doubled every attempt
+    #cache: a PairCache or the path of one (None: no persistent cache)
+    def __init__(self, api_key=None, base_url=GOOGLE_DISTANCE_MATRIX_URL, mode="driving", max_elements=100, max_origins=25, max_destinations=25,
+                 requests_per_second=10, concurrency=8, retries=4, backoff=1.0, timeout=30, cache=None, symmetric=False):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.mode = mode
+        side = max(1, int(math.sqrt(max_elements)))
+        self.block_origins = min(max_origins, side)
+        self.block_destinations = min(max_destinations, max_elements // self.block_origins)
+        self.requests_per_second = requests_per_second
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = PairCache(cache) if isinstance(cache, str) else cache
+        self.symmetric = symmetric
+        self.requests = 0
+
+    def _url(self, origins, destinations):
+        params = {
+            "origins": "|".join("%r,%r" % point for point in origins),
+            "destinations": "|".join("%r,%r" % point for point in destinations),
+            "mode": self.mode,
+        }
+        if self.api_key:
+            params["key"] = self.api_key
+        return self.base_url + "?" + urllib.parse.urlencode(params)
+
+    #Fetches one block: returns {(origin, destination): (distance, duration)}, NaN for pairs the server finds no route for
+    async def _fetch_block(self, origins, destinations, limiter, semaphore):
+        self.requests += 1
+        count("distance matrix requests")
+        result = await fetch_json(self._url(origins, destinations), limiter, semaphore, self.retries, self.backoff, self.timeout)
+        values = {}
+        for origin, row in zip(origins, result["rows"]):
+            for destination, element in zip(destinations, row["elements"]):
+                if element.get("status") == "OK":
+                    values[(origin, destination)] = (float(element["distance"]["value"]), float(element["duration"]["value"]))
+                else:
+                    values[(origin, destination)] = (math.nan, math.nan)
+        return values
+
+    #Packs the missing pairs into blocks: destinations are cut into chunks, and each chunk is requested together with the origins
+    #that miss at least one of its destinations
+    def _blocks(self, missing):
+        by_destination = {}
+        for origin, destination in missing:
+            by_destination.setdefault(destination, set()).add(origin)
+        destinations = sorted(by_destination)
+        blocks = []
+        for start in range(0, len(destinations), self.block_destinations):
+            chunk = destinations[start:start + self.block_destinations]
+            origins = sorted(set().union(*(by_destination[destination] for destination in chunk)))
+            for origin_start in range(0, len(origins), self.block_origins):
+                blocks.append((origins[origin_start:origin_start + self.block_origins], chunk))
+        return blocks
+
+    #{(origin, destination): (distance, duration)} for every ordered pair of the given rounded points
+    async def pair_values(self, points):
+        points = sorted(set(points))
+        if self.symmetric:
+            wanted = [(a, b) for i, a in enumerate(points) for b in points[i + 1:]]
+        else:
+            wanted = [(a, b) for a in points for b in points if a != b]
+        values = self.cache.get_many(wanted, self.mode) if self.cache is not None else {}
+        if self.symmetric and self.cache is not None:
+            #A pair cached in the other direction counts as well
+            reverse = self.cache.get_many([(b, a) for a, b in wanted if (a, b) not in values], self.mode)
+            values.update({(a, b): value for (b, a), value in reverse.items()})
+        missing = [pair for pair in wanted if pair not in values]
+        count({"pair cache hits": len(wanted) - len(missing), "pair cache misses": len(missing)})
+
+        limiter = RateLimiter(self.requests_per_second)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.create_task(self._fetch_block(origins, destinations, limiter, semaphore)) for origins, destinations in self._blocks(missing)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                block = await finished
+                if self.cache is not None:
+                    self.cache.put_many(block, self.mode)
+                values.update(block)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if self.symmetric:
+            values.update({(b, a): values[(a, b)] for a, b in wanted})
+        for point in points:
+            values[(point, point)] = (0.0, 0.0)
+        return values
+
+    #Distance and duration matrices between the given points (NaN where the server finds no route)
+    async def matrix(self, lat, lon):
+        points = [_round_point(a, b) for a, b in zip(lat, lon)]
+        values = await self.pair_values(points)
+        dist = np.array([[values[(a, b)][0] for b in points] for a in points])
+        dur = np.array([[values[(a, b)][1] for b in points] for a in points])
+        return dist, dur
+
+    #The arc table between nodes (with "ID", "latitude" and "longitude" columns), with the columns of the depot arc files
+    def arc_table(self, nodes):
+        dist, dur = asyncio.run(self.matrix(nodes["latitude"].to_numpy(), nodes["longitude"].to_numpy()))
+        ids = nodes["ID"].to_numpy()
+        n = len(ids)
+        return pd.DataFrame({
+            "Distance in meter": dist.ravel(),
+            "duration in seconds": dur.ravel(),
+            "origin_id": np.repeat(ids, n),
+            "destination_id": np.tile(ids, n),
+        }, columns=ARC_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m zedz_model.matrix_client", description="Build depot arc files with a hosted distance matrix API")
+    parser.add_argument("nodes_file", help='node table with ID, latitude and longitude columns (e.g. "Entire Nodes.xlsx")')
+    parser.add_argument("--depot", type=int, action="append", required=True, help="write depot-<n>_arcs.xlsx for this depot (repeatable)")
+    parser.add_argument("--cache", default="pair_cache.sqlite", help="persistent pair cache")
+    parser.add_argument("--base-url", default=GOOGLE_DISTANCE_MATRIX_URL)
+    parser.add_argument("--requests-per-second", type=float, default=10)
+    parser.add_argument("--symmetric", action="store_true", help="request one direction per pair and mirror it")
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args(argv)
+
+    client = DistanceMatrixClient(os.environ.get("GOOGLE_MAPS_API_KEY"), args.base_url, requests_per_second=args.requests_per_second,
+                                  cache=args.cache, symmetric=args.symmetric)
+    entire_nodes = pd.read_excel(args.nodes_file)
+    for depot in args.depot:
+        path = os.path.join(args.output_dir, "depot-%d_arcs.xlsx" % depot)
+        write_arc_file(client.arc_table(depot_nodes(entire_nodes, depot)), path)
+        print("%s: %d requests so far, %d cached pairs" % (path, client.requests, len(client.cache)))
+
+
+if __name__ == "__main__":
+    main()
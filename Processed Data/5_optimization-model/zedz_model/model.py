@@ -0,0 +1,310 @@
+#Entry points of a full model run
+#
+#"ZEDZ Shipment Model Final.py" used to run everything at module level, so importing it read every input, formed every tour
+#and wrote every "FinalResults" file. The run is split here into explicit steps that can be called one by one:
+#
+#    inputs = model_inputs(".")                          #nothing is read yet
+#    shipment_df = synthesize(inputs, config)            #reads the node tables and the network on first use
+#    stops = consolidate_shipments(shipment_df)          #one row per (carrier, depot, receiver) stop
+#    tour_arrays = form_scenario_tours(stops, inputs, config)
+#    tables = aggregate_tables(tour_arrays)
+#    export_tables(tables, ".")
+#
+#or all at once with run_model(config), which can keep the output of every stage in a StageCache (see stage_cache.py) and
+#skip the stages whose inputs did not change. ModelInputs reads each input on first access and model_inputs() keeps one instance per
+#input directory and process, so a worker process, a test or another script only pays for the inputs it actually uses, and
+#only once. The settings of a run are a config dict (DEFAULT_CONFIG), which load_config() reads from a TOML or JSON file;
+#the command line is "python -m zedz_model --config model.toml" (see __main__.py).
+#
+#Sweeps of many policy variants over one day (scenarios.ScenarioEngine) and the depot-by-depot pipeline for city-scale volumes
+#(streaming.py, whose tours are formed per depot and not per carrier) are separate entry points that a run never calls.
+
+import copy
+import json
+import os
+import tomllib
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import scenario_tables, vehicle_table
+from .consolidation import consolidate_shipments
+from .estimator import EstimatedArcStore, estimated_arc_store, estimated_legs, fit_arc_estimator
+from .montecarlo import run_replications, summarize_replications
+from .network import load_network
+from .profiling import Profiler, stage
+from .router import ROUTE_ROWS, RouteRows, RoutedArcStore, load_road_graph
+from .runner import run_scenarios
+from .stage_cache import StageCache
+from .synthesizer import parcel_weights, synthesize_shipments
+from .zones import zedz_flags
+
+#Settings of a run and their defaults (TOML has no null: leave a setting out to keep its default)
+#directory: where the inputs are; output_dir: where the "FinalResults" files go
+#seed: seed of the shipment draws (None: a fresh random day)
+#stops_per_vehicle, improve, engine, payloads, processes: tour formation, see run_scenarios()
+#replications, replication_seed: Monte Carlo mode, see run_replications() (0: off)
+#profile_report, profile_memory, profile_functions: run profile, see profiling.py (profile_report None: not written)
+#stage_cache: directory of the stage cache (None: every stage is computed)
+#arc_neighbours: keep this many neighbours per node in a sparse arc store (see network.py; None: dense matrices)
+#road_file: street network (.geojson / .osm, in directory) the arcs missing from the arc files are routed on, with up to
+#route_rows shortest-path rows cached per process (see router.RoutedArcStore; None: missing arcs stay missing)
+#estimate_arcs: None (or false): a missing arc stops the run with an error naming it. Opt in with "missing" to estimate the arcs
+#still missing (after routing) with a detour-factor estimator fitted on the collected arcs, or "all" to estimate every arc from
+#coordinates alone for a quick first screening (see estimator.py). Runs with estimates mix measured and estimated distances:
+#every "dist" table then gets an "Estimated_share_of_dist" column, and an "estimated legs" table says how many legs, and how
+#much of the distance, were estimated.
+DEFAULT_CONFIG = {
+    "directory": ".",
+    "output_dir": ".",
+    "seed": None,
+    "scenarios": ["status quo", "mandatory ZEDZ"],
+    "company_names": ["USPS", "UPS", "Amazon Logistics", "FedEx"],
+    "company_share": [0.38, 0.24, 0.21, 0.17],
+    "stops_per_vehicle": {"diesel": 30, "EV": 33},
+    "improve": False,
+    "engine": "greedy",
+    "payloads": {"diesel": None, "EV": None},
+    "processes": None,
+    "replications": 0,
+    "replication_seed": 2022,
+    "profile_report": None,
+    "profile_memory": False,
+    "profile_functions": False,
+    "stage_cache": None,
+    "arc_neighbours": None,
+    "road_file": None,
+    "route_rows": 1024,
+    "estimate_arcs": None,
+}
+
+#"FinalResults" file of every result table
+RESULT_FILES = {
+    "status quo dist": "FinalResults - status quo dist.xlsx",
+    "mandatory ZEDZ dist": "FinalResults - mandatory ZEDZ dist.xlsx",
+    "status quo tours": "FinalResults - status quo tours.xlsx",
+    "mandatory ZEDZ tours": "FinalResults - mandatory ZEDZ tours.xlsx",
+    "status quo vehicles": "FinalResults - status quo vehicles.xlsx",
+    "mandatory ZEDZ vehicles": "FinalResults - mandatory ZEDZ vehicles.xlsx",
+    "monte carlo replicates": "FinalResults - monte carlo replicates.xlsx",
+    "monte carlo summary": "FinalResults - monte carlo summary.xlsx",
+    "estimated legs": "FinalResults - estimated legs.xlsx",
+}
+
+#ModelInputs of every input directory read in this process
+_inputs = {}
+
+
+class ModelInputs:
+    #Every input is read from directory on first access and kept (arc_neighbours, road_file, route_rows, estimate_arcs: see
+    #DEFAULT_CONFIG)
+    def __init__(self, directory=".", arc_neighbours=None, road_file=None, route_rows=ROUTE_ROWS, estimate_arcs=None):
+        estimate_arcs = estimate_arcs or None
+        if estimate_arcs not in (None, "missing", "all"):
+            raise ValueError("unknown estimate_arcs %r (expected None, 'missing' or 'all')" % (estimate_arcs,))
+        self.directory = directory
+        self.arc_neighbours = arc_neighbours
+        self.road_file = road_file
+        self.route_rows = route_rows
+        self.estimate_arcs = estimate_arcs
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @cached_property
+    def consumer_nodes(self):
+        with stage("load"):
+            return pd.read_csv(self._path("consumer_nodes edited.csv"))
+
+    @cached_property
+    def logistic_nodes(self):
+        with stage("load"):
+            return pd.read_csv(self._path("depot_nodes edited.csv"))
+
+    #The daily parcel counts and weights of the consumer nodes ("consumer_nodes_new.csv")
+    @cached_property
+    def parcel_table(self):
+        with stage("load"):
+            return pd.read_csv(self._path("consumer_nodes_new.csv"))
+
+    #Number of parcels delivered to each consumer node per day
+    @cached_property
+    def parcels_per_day(self):
+        return [round(num) for num in self.parcel_table["parcel_delivered(#/day)"].tolist()]
+
+    #Average weight (kg) of a parcel to each consumer node
+    @cached_property
+    def parcel_weight(self):
+        return parcel_weights(self.parcel_table)
+
+    #"Entire Nodes.xlsx": every node with its coordinates, in the index order of the arc store
+    @cached_property
+    def entire_nodes(self):
+        with stage("load"):
+            return pd.read_excel(self._path("Entire Nodes.xlsx"))
+
+    #ZEDZ flag of every node of "Entire Nodes.xlsx", which has none of its own: the "ZEDZ(inside =1)" column of the consumer and
+    #depot tables (the flags the synthesizer uses), the ZEDZ polygon for a node in neither table
+    @cached_property
+    def node_zones(self):
+        nodes = self.entire_nodes
+        streets = pd.to_numeric(nodes["street_id"], errors="coerce").map(self.consumer_nodes.set_index("street_id")["ZEDZ(inside =1)"])
+        depots = pd.to_numeric(nodes["depot_id"], errors="coerce").map(self.logistic_nodes.drop_duplicates("depot_id").set_index("depot_id")["ZEDZ(inside =1)"])
+        return zedz_flags(nodes["longitude"], nodes["latitude"], known=streets.fillna(depots).to_numpy(dtype=np.float64))
+
+    #The network as compiled from the arc files: memory-mapped from its artifact (compiled first if it is missing or out of date)
+    @cached_property
+    def network(self):
+        with stage("load"):
+            return load_network(self.directory, neighbours=self.arc_neighbours)
+
+    #DetourEstimator fitted on the collected arcs of the network, with its errors on held-out arcs (see estimator.py)
+    @cached_property
+    def detour_estimator(self):
+        with stage("load"):
+            return fit_arc_estimator(self.network, self.entire_nodes["latitude"], self.entire_nodes["longitude"], self.node_zones)
+
+    #The ArcStore of the tours: the network, routing the arcs it is missing on the road_file when there is one and estimating
+    #the arcs still missing with estimate_arcs "missing"; with estimate_arcs "all", a store of estimated arcs only
+    @cached_property
+    def arc_store(self):
+        if self.estimate_arcs == "all":
+            with stage("load"):
+                return estimated_arc_store(self.entire_nodes, self.detour_estimator, self.node_zones)
+        arc_store = self.network
+        with stage("load"):
+            if self.road_file is not None:
+                rows = RouteRows(load_road_graph(self._path(self.road_file)), self.entire_nodes["latitude"], self.entire_nodes["longitude"], self.route_rows)
+                arc_store = RoutedArcStore(arc_store, rows)
+            if self.estimate_arcs == "missing":
+                arc_store = EstimatedArcStore(arc_store, self.detour_estimator, self.entire_nodes["latitude"], self.entire_nodes["longitude"], self.node_zones)
+            return arc_store
+
+
+#The ModelInputs of a directory and network settings, shared by every caller in this process
+def model_inputs(directory=".", arc_neighbours=None, road_file=None, route_rows=ROUTE_ROWS, estimate_arcs=None):
+    key = (os.path.abspath(directory), arc_neighbours, road_file, route_rows, estimate_arcs or None)
+    if key not in _inputs:
+        _inputs[key] = ModelInputs(directory, arc_neighbours, road_file, route_rows, estimate_arcs)
+    return _inputs[key]
+
+
+#A complete config: DEFAULT_CONFIG updated with the given settings; unknown settings raise a KeyError
+def make_config(settings=None):
+    settings = dict(settings or {})
+    unknown = sorted(set(settings) - set(DEFAULT_CONFIG))
+    if unknown:
+        raise KeyError("unknown model settings: %s" % ", ".join(unknown))
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config.update(settings)
+    return config
+
+
+#Reads a config file: TOML (.toml) or JSON, holding any of the settings of DEFAULT_CONFIG
+def load_config(path):
+    if str(path).lower().endswith(".toml"):
+        with open(path, "rb") as f:
+            return make_config(tomllib.load(f))
+    with open(path) as f:
+        return make_config(json.load(f))
+
+
+#Part I: the shipments of one day (rng: a numpy Generator or seed, defaulting to the config's seed)
+def synthesize(inputs, config=None, rng=None):
+    config = make_config(config)
+    with stage("synthesize"):
+        return synthesize_shipments(inputs.consumer_nodes, inputs.logistic_nodes, inputs.parcels_per_day, config["company_names"], config["company_share"],
+                                    arc_store=inputs.arc_store, rng=config["seed"] if rng is None else rng, parcel_weight=inputs.parcel_weight)
+
+
+#Part II + III: the tours of every scenario of the config, as {scenario: {(carrier, partition label): Tours}}
+def form_scenario_tours(shipment_df, inputs, config=None):
+    config = make_config(config)
+    with stage("tour formation"):
+        return run_scenarios(shipment_df, inputs.arc_store, config["scenarios"], capacities=config["stops_per_vehicle"], processes=config["processes"],
+                             improve=config["improve"], engine=config["engine"], payloads=config["payloads"])
+
+
+#The result tables of every scenario, keyed like RESULT_FILES ("status quo dist", "mandatory ZEDZ tours", ...)
+def aggregate_tables(all_tour_arrays):
+    tables = {}
+    with stage("aggregation"):
+        for scenario, tour_arrays in all_tour_arrays.items():
+            tables[scenario + " dist"], tables[scenario + " tours"] = scenario_tables(tour_arrays, scenario)
+            tables[scenario + " vehicles"] = vehicle_table(tour_arrays, scenario)
+    return tables
+
+
+#Monte Carlo mode: the replicate and summary tables of config["replications"] seeded replicates
+def replicate(inputs, config=None):
+    config = make_config(config)
+    with stage("monte carlo"):
+        replicates = run_replications(inputs.consumer_nodes, inputs.logistic_nodes, inputs.parcels_per_day, config["company_names"], config["company_share"], inputs.arc_store,
+                                      config["replications"], seed=config["replication_seed"], scenarios=tuple(config["scenarios"]), capacities=config["stops_per_vehicle"],
+                                      processes=config["processes"], improve=config["improve"], engine=config["engine"], payloads=config["payloads"], parcel_weight=inputs.parcel_weight)
+        return {"monte carlo replicates": replicates, "monte carlo summary": summarize_replications(replicates)}
+
+
+#Writes result tables to their "FinalResults" files in output_dir; returns the paths written
+def export_tables(tables, output_dir="."):
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    with stage("excel export"):
+        for name, table in tables.items():
+            path = os.path.join(output_dir, RESULT_FILES.get(name, "FinalResults - %s.xlsx" % name))
+            table.to_excel(path)
+            paths.append(path)
+    return paths
+
+
+#Stage cache keys of a run: {"shipments", "tours", "tables", "replicates"}, each None when that stage is not cached.
+#The day's shipments are only cached when they are drawn from a seed.
+def stage_keys(cache, inputs, config):
+    keys = dict.fromkeys(["shipments", "tours", "tables", "replicates"])
+    if cache is None:
+        return keys
+    inputs_key = [inputs.consumer_nodes, inputs.logistic_nodes, inputs.parcels_per_day, inputs.parcel_weight, inputs.arc_store]
+    tour_params = {name: config[name] for name in ("scenarios", "stops_per_vehicle", "improve", "engine", "payloads")}
+    if config["seed"] is not None:
+        keys["shipments"] = cache.key("shipments", *inputs_key, seed=config["seed"], company_names=config["company_names"], company_share=config["company_share"])
+        keys["tours"] = cache.key("tours", keys["shipments"], **tour_params)
+        keys["tables"] = cache.key("tables", keys["tours"])
+    if config["replications"] > 0:
+        keys["replicates"] = cache.key("replicates", *inputs_key, replications=config["replications"], seed=config["replication_seed"],
+                                       company_names=config["company_names"], company_share=config["company_share"], **tour_params)
+    return keys
+
+
+#A full model run: synthesize, form the tours, aggregate, Monte Carlo replicates when the config asks for them, and export.
+#With a stage_cache in the config, stages whose key is cached are loaded instead of computed.
+#Runs with estimated arcs add the share of estimated distance to every "dist" table and the "estimated legs" table (see
+#estimator.estimated_legs()).
+#Returns {"shipments", "stops", "tours", "tables", "files", "profiler"}.
+def run_model(config=None, inputs=None):
+    config = make_config(config)
+    if inputs is None:
+        inputs = model_inputs(config["directory"], config["arc_neighbours"], config["road_file"], config["route_rows"], config["estimate_arcs"])
+    cache = StageCache(config["stage_cache"]) if config["stage_cache"] is not None else None
+    profiler = Profiler(memory=config["profile_memory"], cprofile=config["profile_functions"]).start()
+    try:
+        keys = stage_keys(cache, inputs, config)
+        fetch = cache.fetch if cache is not None else lambda stage, key, compute: compute()
+        shipment_df = fetch("shipments", keys["shipments"], lambda: synthesize(inputs, config, rng=np.random.default_rng(config["seed"])))
+        with stage("consolidation"):
+            stops = consolidate_shipments(shipment_df)
+        all_tour_arrays = fetch("tours", keys["tours"], lambda: form_scenario_tours(stops, inputs, config))
+        tables = dict(fetch("tables", keys["tables"], lambda: aggregate_tables(all_tour_arrays)))
+        if inputs.estimate_arcs is not None:
+            with stage("aggregation"):
+                tables["estimated legs"] = estimated_legs(all_tour_arrays, stops, inputs.arc_store.arc_store if inputs.estimate_arcs == "missing" else None)
+                for scenario, share in tables["estimated legs"]["estimated share of distance"].items():
+                    tables[scenario + " dist"] = tables[scenario + " dist"].assign(Estimated_share_of_dist=share)
+        if config["replications"] > 0:
+            tables.update(fetch("replicates", keys["replicates"], lambda: replicate(inputs, config)))
+        files = export_tables(tables, config["output_dir"])
+    finally:
+        profiler.stop()
+    if config["profile_report"] is not None:
+        profiler.write(config["profile_report"])
+    return {"shipments": shipment_df, "stops": stops, "tours": all_tour_arrays, "tables": tables, "files": files, "profiler": profiler}
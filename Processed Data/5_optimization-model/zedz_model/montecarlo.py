@@ -0,0 +1,131 @@
+#Monte Carlo replication mode
+#
+#A single model run is one random realization of the shipment synthesizer. run_replications() repeats synthesizer + tour
+#formation + distance calculation N times with independent, seeded random streams (spawned from one SeedSequence, so a
+#replication set is reproducible from its seed and replicate i always gets the same stream), spreading the replicates over
+#worker processes that load the network once. summarize_replications() reports the mean, percentiles and a confidence interval
+#of the mean for every distance and tour count of the "FinalResults" tables.
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import scenario_tables
+from .consolidation import consolidate_shipments
+from .runner import default_context
+from .synthesizer import synthesize_shipments
+from .tours import CANDIDATES, CARRIERS, SCENARIOS, VEHICLE_CAPACITY, scenario_tours
+
+#Model inputs of a worker process, set by _init_worker
+_worker_inputs = None
+
+
+def _init_worker(inputs):
+    global _worker_inputs
+    _worker_inputs = inputs
+
+
+#Runs one replicate and returns its results as a flat dict of "<scenario>: <column>" values
+def _run_replicate(task):
+    replicate, seed_sequence = task
+    inputs = _worker_inputs
+    shipment_df = synthesize_shipments(inputs["consumer_nodes"], inputs["logistic_nodes"], inputs["parcels_per_day"], inputs["company_names"], inputs["company_share"], inputs["arc_store"], rng=np.random.default_rng(seed_sequence), parcel_weight=inputs["parcel_weight"])
+    shipment_df = consolidate_shipments(shipment_df)
+    result = {"replicate": replicate}
+    for scenario in inputs["scenarios"]:
+        tour_arrays = scenario_tours(shipment_df, inputs["arc_store"], scenario, inputs["carriers"], inputs["capacities"], candidates=inputs["candidates"], improve=inputs["improve"], engine=inputs["engine"], payloads=inputs["payloads"])
+        dist, tours = scenario_tables(tour_arrays, scenario, inputs["carriers"])
+        for column, value in pd.concat([dist, tours], axis=1).iloc[0].items():
+            result["%s: %s" % (scenario, column)] = value
+    return result
+
+
+#Runs n seeded replicates of the model, with up to processes worker processes (None: one per core, 1: no pool).
+#Returns a dataframe with one row per replicate.
+def run_replications(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store, n, seed=None, scenarios=tuple(SCENARIOS), carriers=CARRIERS, capacities=VEHICLE_CAPACITY, processes=None, candidates=CANDIDATES, mp_context=None, improve=False, engine="greedy", payloads=None, parcel_weight=None):
+    inputs = {
+        "consumer_nodes": consumer_nodes, "logistic_nodes": logistic_nodes, "parcels_per_day": parcels_per_day,
+        "company_names": company_names, "company_share": company_share, "arc_store": arc_store,
+        "scenarios": scenarios, "carriers": carriers, "capacities": capacities, "candidates": candidates,
+        "improve": improve, "engine": engine, "payloads": payloads, "parcel_weight": parcel_weight,
+    }
+    tasks = list(enumerate(np.random.SeedSequence(seed).spawn(n)))
+
+    if mp_context is None:
+        mp_context = default_context()
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, n)
+
+    if processes <= 1 or mp_context is None:
+        _init_worker(inputs)
+        results = [_run_replicate(task) for task in tasks]
+    else:
+        if candidates:
+            arc_store.neighbours(candidates)
+        with ProcessPoolExecutor(processes, mp_context=mp_context, initializer=_init_worker, initargs=(inputs,)) as pool:
+            results = list(pool.map(_run_replicate, tasks, chunksize=max(1, n // (4 * processes))))
+    return pd.DataFrame(results).set_index("replicate")
+
+
+#Degrees of freedom from which _t_quantile uses the Cornish-Fisher expansion (off by less than 1e-8 there) instead of the
+#exact distribution
+T_EXACT_DOF = 1000
+
+
+#P(|T| < sqrt(dof) tan(theta)) for Student's t distribution with an integer number of degrees of freedom: the finite series in
+#cos(theta) of Abramowitz & Stegun 26.7.3/26.7.4
+def _t_central(theta, dof):
+    c2 = math.cos(theta) ** 2
+    term = total = 1.0
+    if dof % 2 == 0:
+        for k in range(2, dof, 2):
+            term *= c2 * (k - 1) / k
+            total += term
+        return math.sin(theta) * total
+    if dof == 1:
+        return 2 * theta / math.pi
+    for k in range(3, dof, 2):
+        term *= c2 * (k - 1) / k
+        total += term
+    return 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * total)
+
+
+#Quantile of Student's t distribution (0.5 < p < 1): the exact distribution inverted by bisection, or for many degrees of
+#freedom the normal quantile with the Cornish-Fisher expansion
+def _t_quantile(p, dof):
+    if dof >= T_EXACT_DOF:
+        z = NormalDist().inv_cdf(p)
+        return (z + (z ** 3 + z) / (4 * dof) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * dof ** 2)
+                + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * dof ** 3))
+    central = 2 * p - 1
+    low, high = 0.0, math.pi / 2
+    for _ in range(60):
+        theta = (low + high) / 2
+        if _t_central(theta, dof) < central:
+            low = theta
+        else:
+            high = theta
+    return math.sqrt(dof) * math.tan((low + high) / 2)
+
+
+#Mean, standard deviation, percentiles and the confidence interval of the mean of every column of the replicates
+def summarize_replications(replicates, confidence=0.95, percentiles=(5, 50, 95)):
+    values = replicates.to_numpy(dtype=np.float64)
+    n = len(values)
+    mean = values.mean(axis=0)
+    std = values.std(axis=0, ddof=1) if n > 1 else np.full(values.shape[1], np.nan)
+    half_width = _t_quantile(0.5 + confidence / 2, n - 1) * std / math.sqrt(n) if n > 1 else np.full(values.shape[1], np.nan)
+
+    summary = pd.DataFrame({"mean": mean, "std": std}, index=replicates.columns)
+    for percentile, column in zip(percentiles, np.percentile(values, percentiles, axis=0)):
+        summary["p%d" % percentile] = column
+    summary["ci_low"] = mean - half_width
+    summary["ci_high"] = mean + half_width
+    summary["replicates"] = n
+    summary.index.name = "result"
+    return summary
@@ -0,0 +1,530 @@
+#Arc network for the ZEDZ Shipment Model
+#
+#The depot arc files ("depot-x_arccs.xlsx") hold the driving distance and duration between pairs of nodes, where both ends are
+#given as the "ID" column of "Entire Nodes.xlsx". Looking these up with boolean masks on the concatenated arc table costs a full
+#scan per lookup, so the arcs are compiled once into dense matrices addressed by compact node indices (the row of the node in
+#"Entire Nodes.xlsx"). street_id and depot_id are mapped onto the same indices, so every lookup is a plain array access.
+#
+#Parsing the Excel inputs dominates start-up, so compile_network() writes the compiled store to a versioned binary artifact
+#(a directory of .npy files plus a manifest of the source files it was built from). load_network() memory-maps that artifact
+#and only rebuilds it when a source file has changed, so concurrent runs share a single read-only copy of the matrices.
+#
+#Dense matrices grow with the square of the nodes: fine for Santa Monica's ~370 nodes, tens of GB for a metro region of 50k+.
+#SparseArcStore keeps the k nearest neighbours of every node plus the full rows of the depots in CSR form, with distances and
+#durations as integer tenths (uint32), and estimates the arcs it dropped when they are looked up (see SparseArcStore).
+#load_network(directory, neighbours=k) compiles and memory-maps it like the dense store.
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .profiling import count, stage
+
+#Bump whenever the layout of the artifact written by compile_network changes
+ARTIFACT_VERSION = 1
+
+#Distances (meters) and durations (seconds) of a SparseArcStore are stored in units of 1 / SPARSE_SCALE
+SPARSE_SCALE = 10
+
+#Stored value of an arc that was never collected
+_MISSING = np.iinfo(np.uint32).max
+
+#Columns of the depot arc files. Arc files written by the model (router.py, matrix_client.py, synthetic.py) have these columns
+#only, without an index column; the shipped files also carry their old pandas index ("Unnamed: 0") and the coordinates of both
+#ends, which are not read.
+ARC_COLUMNS = ["Distance in meter", "duration in seconds", "origin_id", "destination_id"]
+
+
+#Builds a lookup array so that lookup[some_id] gives the compact index of that id (-1 if the id is unknown)
+def _id_lookup(ids):
+    valid = ids >= 0
+    size = int(ids[valid].max()) + 1 if valid.any() else 0
+    lookup = np.full(size, -1, dtype=np.int64)
+    lookup[ids[valid]] = np.nonzero(valid)[0]
+    return lookup
+
+
+#Maps an array of ids to compact indices with a lookup array built by _id_lookup (-1 for unknown ids)
+def _map_ids(lookup, ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    out = np.full(ids.shape, -1, dtype=np.int64)
+    known = (ids >= 0) & (ids < len(lookup))
+    out[known] = lookup[ids[known]]
+    return out
+
+
+#Converts an "Entire Nodes.xlsx" id column ("-" where not applicable) to integers, with -1 for missing values
+def _id_column(column):
+    return pd.to_numeric(column, errors="coerce").fillna(-1).astype(np.int64).to_numpy()
+
+
+class ArcStore:
+    #node_ids: the "ID" of each node in "Entire Nodes.xlsx", in compact index order
+    #street_ids, depot_ids: the street_id / depot_id of each node (-1 where the node is not a street / depot)
+    #dist, dur: square matrices of driving distance (meters) and duration (seconds), NaN where no arc was collected
+    sparse = False
+
+    def __init__(self, node_ids, street_ids, depot_ids, dist, dur):
+        self.node_ids = node_ids
+        self.street_ids = street_ids
+        self.depot_ids = depot_ids
+        self.dist = dist
+        self.dur = dur
+        self._node_lookup = _id_lookup(np.asarray(node_ids, dtype=np.int64))
+        self._street_lookup = _id_lookup(np.asarray(street_ids, dtype=np.int64))
+        self._depot_lookup = _id_lookup(np.asarray(depot_ids, dtype=np.int64))
+        self._neighbours = {}
+        #Directory of the artifact the store was memory-mapped from, if any (lets worker processes map the same files)
+        self.artifact_dir = None
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    #Compact indices of "Entire Nodes.xlsx" IDs, street_ids and depot_ids (scalars or arrays)
+    def node_index(self, node_ids):
+        return _map_ids(self._node_lookup, node_ids)
+
+    def street_index(self, street_ids):
+        return _map_ids(self._street_lookup, street_ids)
+
+    def depot_index(self, depot_ids):
+        return _map_ids(self._depot_lookup, depot_ids)
+
+    #Driving distance / duration between compact indices; a and b may be scalars or arrays (fancy indexing)
+    def dist_idx(self, a, b):
+        count("distance lookups", np.broadcast(a, b).size)
+        return self.dist[a, b]
+
+    def dur_idx(self, a, b):
+        return self.dur[a, b]
+
+    #Returns the actual driving distance between two street_ids, raising IndexError if the arc was never collected
+    def calc_dist_nodes(self, A_ID, B_ID):
+        a = self._street_lookup[int(A_ID)]
+        b = self._street_lookup[int(B_ID)]
+        count("distance lookups")
+        the_arc_dist = self.dist[a, b]
+        if a < 0 or b < 0 or np.isnan(the_arc_dist):
+            raise IndexError("no arc between street %s and street %s" % (A_ID, B_ID))
+        return the_arc_dist
+
+    #The k nearest nodes of every node by driving distance, as (indices, distances) arrays of shape (nodes, k).
+    #Each row is sorted by distance (ties by node index) and missing arcs are treated as infinitely far. Computed once per k.
+    def neighbours(self, k):
+        k = min(k, len(self))
+        count("neighbour list cache hits" if k in self._neighbours else "neighbour list cache misses")
+        if k not in self._neighbours:
+            dist = np.where(np.isnan(self.dist), np.inf, self.dist)
+            nearest = np.argpartition(dist, k - 1, axis=1)[:, :k] if k < len(self) else np.tile(np.arange(k), (len(self), 1))
+            nearest_dist = np.take_along_axis(dist, nearest, axis=1)
+            #Sort by distance, then node index, so equal distances keep a deterministic order
+            order = np.lexsort((nearest, nearest_dist), axis=1)
+            nearest = np.take_along_axis(nearest, order, axis=1)
+            self._neighbours[k] = (nearest.astype(np.int32), np.take_along_axis(nearest_dist, order, axis=1))
+        return self._neighbours[k]
+
+    #Distance from each depot_id to each street_id (vectorized), NaN where the arc is missing or an id is not in the store
+    def depot_to_street(self, depot_ids, street_ids):
+        count("distance lookups", np.size(street_ids))
+        a, b = np.broadcast_arrays(self.depot_index(depot_ids), self.street_index(street_ids))
+        known = (a >= 0) & (b >= 0)
+        out = np.full(a.shape, np.nan)
+        out[known] = self.dist[a[known], b[known]]
+        return out
+
+    #Hash identifying the network of the store: of the source files recorded in the manifest of the artifact it was loaded from,
+    #or of its matrices when it was not loaded from an artifact
+    def fingerprint(self):
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            manifest_path = None if self.artifact_dir is None else os.path.join(self.artifact_dir, "manifest.json")
+            if manifest_path is not None and os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                digest.update(json.dumps([manifest["version"]] + [entry["sha256"] for entry in manifest["sources"]]).encode())
+                if "neighbours" in manifest:
+                    digest.update(json.dumps({"neighbours": manifest["neighbours"]}).encode())
+            else:
+                for array in self._arrays():
+                    digest.update(np.ascontiguousarray(array).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    #The arrays making up the store
+    def _arrays(self):
+        return [self.node_ids, self.street_ids, self.depot_ids, self.dist, self.dur]
+
+    #Bytes taken by the store's arrays
+    def nbytes(self):
+        return sum(np.asarray(array).nbytes for array in self._arrays())
+
+    #Writes the store as .npy files into artifact_dir
+    def save(self, artifact_dir):
+        os.makedirs(artifact_dir, exist_ok=True)
+        nodes = np.stack([self.node_ids, self.street_ids, self.depot_ids]).astype(np.int64)
+        arcs = np.stack([self.dist, self.dur]).astype(np.float64)
+        _save_npy(os.path.join(artifact_dir, "nodes.npy"), nodes)
+        _save_npy(os.path.join(artifact_dir, "arcs.npy"), arcs)
+
+    #Reads a store written by save(); with mmap_mode="r" the matrices are memory-mapped read-only and shared between processes
+    @classmethod
+    def load(cls, artifact_dir, mmap_mode="r"):
+        nodes = np.load(os.path.join(artifact_dir, "nodes.npy"))
+        arcs = np.load(os.path.join(artifact_dir, "arcs.npy"), mmap_mode=mmap_mode)
+        arc_store = cls(nodes[0], nodes[1], nodes[2], arcs[0], arcs[1])
+        arc_store.artifact_dir = artifact_dir
+        return arc_store
+
+
+#Writes an array next to its final location first so a reader never sees a half-written file
+def _save_npy(path, array):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+#Compiles "Entire Nodes.xlsx" and the concatenated depot arcs into an ArcStore.
+#When the same origin/destination pair appears in several arc files the first occurrence wins, as it did with the
+#masked lookups on the concatenated table.
+def build_arc_store(entire_nodes, depot_arcs):
+    node_ids = entire_nodes["ID"].to_numpy(dtype=np.int64)
+    street_ids = _id_column(entire_nodes["street_id"])
+    depot_ids = _id_column(entire_nodes["depot_id"])
+    n = len(node_ids)
+
+    node_lookup = _id_lookup(node_ids)
+    origin = _map_ids(node_lookup, depot_arcs["origin_id"].to_numpy())
+    destination = _map_ids(node_lookup, depot_arcs["destination_id"].to_numpy())
+    known = (origin >= 0) & (destination >= 0)
+
+    flat = origin[known] * n + destination[known]
+    flat, first = np.unique(flat, return_index=True)
+    arc_dist = depot_arcs["Distance in meter"].to_numpy(dtype=np.float64)[known][first]
+    arc_dur = depot_arcs["duration in seconds"].to_numpy(dtype=np.float64)[known][first]
+
+    dist = np.full((n, n), np.nan)
+    dur = np.full((n, n), np.nan)
+    dist.flat[flat] = arc_dist
+    dur.flat[flat] = arc_dur
+    return ArcStore(node_ids, street_ids, depot_ids, dist, dur)
+
+
+#Arc matrix of a SparseArcStore (its dist or dur), read like the dense matrices: m[a, b] with scalars, arrays or np.ix_ index
+#arrays. Arcs that were not stored are estimated (see SparseArcStore.estimate).
+class SparseMatrix:
+    def __init__(self, store, values, estimate):
+        self.store = store
+        self.values = values
+        self.estimate = estimate
+        self.shape = (len(store.indptr) - 1,) * 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        a, b = (np.asarray(index, dtype=np.int64) for index in key)
+        #One arc that is stored: read straight from its row
+        if a.ndim == 0 and b.ndim == 0:
+            start, end = self.store.indptr[a], self.store.indptr[a + 1]
+            position = start + np.searchsorted(self.store.indices[start:end], b)
+            if position < end and self.store.indices[position] == b and self.values[position] != _MISSING:
+                count("stored arcs read")
+                return self.values[position] / SPARSE_SCALE
+        #One origin (a row or a single arc): searched in its own row
+        if a.ndim == 0:
+            return self.store._lookup_row(int(a), b, self.values, self.estimate)[()]
+        a, b = np.broadcast_arrays(a, b)
+        return self.store._lookup(a, b, self.values, self.estimate)[()]
+
+
+#Sparse arc network: the k nearest neighbours of every node plus every arc leaving a depot, in CSR form.
+#The arcs leaving node a go to indices[indptr[a]:indptr[a + 1]] (in index order); their distances and durations are
+#arcs[0] and arcs[1] in units of 1 / SPARSE_SCALE, _MISSING where the source had no value.
+#An arc that was dropped is only known to be at least floor[a] long (the nearest dropped arc of its row, inf where nothing was
+#dropped), so looking it up estimates it with the network's detour factors (a DetourEstimator fitted on the arcs between streets,
+#see estimator.py: the straight line times the median detour of its distance band), and no less than floor[a].
+#That keeps the neighbour lists exact: no arc outside a node's list is shorter than the last arc in it. Arcs between nodes
+#that share no depot service area (areas: the depots of every node, -1 padded) were never collected and stay NaN, as in the
+#dense store.
+class SparseArcStore(ArcStore):
+    sparse = True
+
+    #lat, lon: coordinates of every node; k: neighbours kept per node; estimator: DetourEstimator of the dropped arcs
+    def __init__(self, node_ids, street_ids, depot_ids, lat, lon, indptr, indices, arcs, floor, areas, k, estimator):
+        self.lat = lat
+        self.lon = lon
+        self.indptr = indptr
+        self.indices = indices
+        self.arcs = arcs
+        self.floor = floor
+        self.areas = areas
+        self.k = k
+        self.estimator = estimator
+        self._keys = None
+        super().__init__(node_ids, street_ids, depot_ids, SparseMatrix(self, arcs[0], lambda a, b: self.estimate(a, b)[0]),
+                         SparseMatrix(self, arcs[1], lambda a, b: self.estimate(a, b)[1]))
+
+    #Estimated distance and duration of arcs that were dropped
+    def estimate(self, a, b):
+        from .router import haversine
+
+        straight = haversine(self.lat[a], self.lon[a], self.lat[b], self.lon[b])
+        detour, speed = self.estimator.factors(straight)
+        dist = np.maximum(straight * detour, self.floor[a])
+        return dist, dist / speed
+
+    #Values of the arcs a -> b (a one node, b an index array), like _lookup()
+    def _lookup_row(self, a, b, values, estimate):
+        start, end = self.indptr[a], self.indptr[a + 1]
+        row = self.indices[start:end]
+        position = np.minimum(np.searchsorted(row, b), max(end - start - 1, 0))
+        stored = row[position] == b if end > start else np.zeros(b.shape, dtype=bool)
+        out = np.full(b.shape, np.nan)
+        value = values[start + position[stored]]
+        out[stored] = np.where(value == _MISSING, np.nan, value / SPARSE_SCALE)
+
+        if np.isfinite(self.floor[a]) and not stored.all():
+            area_a = self.areas[a][self.areas[a] >= 0]
+            where = np.flatnonzero(~stored & np.isin(self.areas[b], area_a).any(axis=-1))
+            out.flat[where] = estimate(np.full(len(where), a), b.flat[where])
+            count("estimated arcs", len(where))
+        count("stored arcs read", int(stored.sum()))
+        return out
+
+    #Values of the arcs a -> b (equal-shaped index arrays): stored values, estimates of dropped arcs, NaN for arcs never collected
+    def _lookup(self, a, b, values, estimate):
+        n = len(self)
+        if self._keys is None:
+            #Row-major position of every stored arc, sorted since the rows are in order and each row in index order
+            self._keys = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr)) * n + self.indices
+        query = a * n + b
+        position = np.minimum(np.searchsorted(self._keys, query), max(len(self._keys) - 1, 0))
+        stored = self._keys[position] == query if len(self._keys) else np.zeros(query.shape, dtype=bool)
+        out = np.full(query.shape, np.nan)
+        value = values[position[stored]]
+        out[stored] = np.where(value == _MISSING, np.nan, value / SPARSE_SCALE)
+
+        dropped = ~stored & np.isfinite(self.floor[a])
+        if dropped.any():
+            area_a, area_b = self.areas[a[dropped]], self.areas[b[dropped]]
+            shared = ((area_a[:, :, None] == area_b[:, None, :]) & (area_a[:, :, None] >= 0)).any(axis=(1, 2))
+            where = np.flatnonzero(dropped)[shared]
+            out.flat[where] = estimate(a.flat[where], b.flat[where])
+            count("estimated arcs", len(where))
+        count("stored arcs read", int(stored.sum()))
+        return out
+
+    #The nearest nodes of every node, like ArcStore.neighbours(), from the stored arcs: at most the k kept per node (rows with
+    #fewer arcs are padded with the node itself at an infinite distance)
+    def neighbours(self, k):
+        k = min(k, len(self))
+        count("neighbour list cache hits" if k in self._neighbours else "neighbour list cache misses")
+        if k not in self._neighbours:
+            n = len(self)
+            rows = np.repeat(np.arange(n), np.diff(self.indptr))
+            dist = np.where(self.arcs[0] == _MISSING, np.inf, self.arcs[0] / SPARSE_SCALE)
+            order = np.lexsort((self.indices, dist, rows))
+            rank = np.arange(len(order)) - self.indptr[rows[order]]
+            listed = order[rank < k]
+            nearest = np.repeat(np.arange(n, dtype=np.int32)[:, None], k, axis=1)
+            nearest_dist = np.full((n, k), np.inf)
+            nearest[rows[listed], rank[rank < k]] = self.indices[listed]
+            nearest_dist[rows[listed], rank[rank < k]] = dist[listed]
+            self._neighbours[k] = (nearest, nearest_dist)
+        return self._neighbours[k]
+
+    def _arrays(self):
+        return [self.node_ids, self.street_ids, self.depot_ids, self.lat, self.lon, self.indptr, self.indices, self.arcs, self.floor, self.areas,
+                np.array([self.k]), self.estimator.bands, self.estimator.detour, self.estimator.speed]
+
+    def save(self, artifact_dir):
+        os.makedirs(artifact_dir, exist_ok=True)
+        _save_npy(os.path.join(artifact_dir, "nodes.npy"), np.stack([self.node_ids, self.street_ids, self.depot_ids]).astype(np.int64))
+        _save_npy(os.path.join(artifact_dir, "coordinates.npy"), np.stack([self.lat, self.lon]).astype(np.float64))
+        _save_npy(os.path.join(artifact_dir, "indptr.npy"), self.indptr)
+        _save_npy(os.path.join(artifact_dir, "indices.npy"), self.indices)
+        _save_npy(os.path.join(artifact_dir, "arcs.npy"), self.arcs)
+        _save_npy(os.path.join(artifact_dir, "floor.npy"), self.floor)
+        _save_npy(os.path.join(artifact_dir, "areas.npy"), self.areas)
+        _save_npy(os.path.join(artifact_dir, "neighbours.npy"), np.array([self.k]))
+        self.estimator.save(os.path.join(artifact_dir, "estimator.json"))
+
+    @classmethod
+    def load(cls, artifact_dir, mmap_mode="r"):
+        from .estimator import DetourEstimator
+
+        def read(name):
+            return np.load(os.path.join(artifact_dir, name), mmap_mode=mmap_mode)
+
+        nodes = np.load(os.path.join(artifact_dir, "nodes.npy"))
+        coordinates = np.load(os.path.join(artifact_dir, "coordinates.npy"))
+        k = int(np.load(os.path.join(artifact_dir, "neighbours.npy"))[0])
+        estimator = DetourEstimator.load(os.path.join(artifact_dir, "estimator.json"))
+        arc_store = cls(nodes[0], nodes[1], nodes[2], coordinates[0], coordinates[1], read("indptr.npy"), read("indices.npy"), read("arcs.npy"),
+                        np.load(os.path.join(artifact_dir, "floor.npy")), np.load(os.path.join(artifact_dir, "areas.npy")), k, estimator)
+        arc_store.artifact_dir = artifact_dir
+        return arc_store
+
+
+#Compiles "Entire Nodes.xlsx" (with its latitude / longitude columns) and the concatenated depot arcs into a SparseArcStore
+#keeping the k nearest neighbours of every node (ties by node index, as ArcStore.neighbours() orders them) and every arc leaving
+#a depot. As in build_arc_store() the first occurrence of a pair wins. No dense matrix is built on the way.
+def build_sparse_arc_store(entire_nodes, depot_arcs, k):
+    from .estimator import DetourEstimator
+    from .router import haversine
+
+    node_ids = entire_nodes["ID"].to_numpy(dtype=np.int64)
+    street_ids = _id_column(entire_nodes["street_id"])
+    depot_ids = _id_column(entire_nodes["depot_id"])
+    lat = entire_nodes["latitude"].to_numpy(dtype=np.float64)
+    lon = entire_nodes["longitude"].to_numpy(dtype=np.float64)
+    n = len(node_ids)
+
+    node_lookup = _id_lookup(node_ids)
+    origin = _map_ids(node_lookup, depot_arcs["origin_id"].to_numpy())
+    destination = _map_ids(node_lookup, depot_arcs["destination_id"].to_numpy())
+    known = (origin >= 0) & (destination >= 0)
+    flat, first = np.unique(origin[known] * n + destination[known], return_index=True)
+    origin, destination = flat // n, flat % n
+    arc_dist = depot_arcs["Distance in meter"].to_numpy(dtype=np.float64)[known][first]
+    arc_dur = depot_arcs["duration in seconds"].to_numpy(dtype=np.float64)[known][first]
+
+    #Detour factors fitted on every arc between streets (not only the kept ones), for the estimates of the dropped arcs
+    streets = (depot_ids[origin] < 0) & (depot_ids[destination] < 0) & np.isfinite(arc_dist)
+    straight = haversine(lat[origin[streets]], lon[origin[streets]], lat[destination[streets]], lon[destination[streets]])
+    estimator = DetourEstimator.fit(straight, arc_dist[streets], arc_dur[streets])
+
+    #Service areas: every depot with its arc file's nodes, the nodes it has arcs to
+    from_depot = depot_ids[origin] >= 0
+    members = np.unique(np.concatenate([destination[from_depot] * n + origin[from_depot], np.flatnonzero(depot_ids >= 0) * (n + 1)]))
+    member_node, member_depot = members // n, members % n
+    starts = np.searchsorted(member_node, np.arange(n))
+    areas = np.full((n, max(int(np.bincount(member_node, minlength=n).max()), 1) if len(members) else 1), -1, dtype=np.int32)
+    areas[member_node, np.arange(len(members)) - starts[member_node]] = member_depot
+
+    #Rank of every arc in its row by (distance, destination)
+    sort_dist = np.where(np.isnan(arc_dist), np.inf, arc_dist)
+    order = np.lexsort((destination, sort_dist, origin))
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order)) - np.searchsorted(origin[order], origin[order], side="left")
+    kept = from_depot | (rank < k)
+    #The nearest dropped arc of every row
+    floor = np.full(n, np.inf)
+    np.minimum.at(floor, origin[~kept], sort_dist[~kept])
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origin[kept], minlength=n), out=indptr[1:])
+    arcs = np.stack([arc_dist[kept], arc_dur[kept]]) * SPARSE_SCALE
+    arcs = np.where(np.isfinite(arcs), np.round(arcs), _MISSING).astype(np.uint32)
+    return SparseArcStore(node_ids, street_ids, depot_ids, lat, lon, indptr, destination[kept].astype(np.int32), arcs, floor, areas, k, estimator)
+
+
+#The arcs of a depot arc file (its ARC_COLUMNS)
+def read_arc_file(path):
+    return pd.read_excel(path, usecols=ARC_COLUMNS)
+
+
+#Writes an arc table as a depot arc file: its ARC_COLUMNS, without the index
+def write_arc_file(arcs, path):
+    arcs[ARC_COLUMNS].to_excel(path, index=False)
+
+
+#The input files the network is built from: "Entire Nodes.xlsx" followed by every depot arc file, ordered by depot number.
+#The arc files are not named consistently ("depot-1_arccs.xlsx", "depot-2_arcs.xlsx", ...), so they are matched by pattern.
+def network_sources(directory="."):
+    arc_files = glob.glob(os.path.join(directory, "depot-*_arc*.xlsx"))
+    arc_files.sort(key=lambda path: int(re.match(r"depot-(\d+)_", os.path.basename(path)).group(1)))
+    return [os.path.join(directory, "Entire Nodes.xlsx")] + arc_files
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _describe_source(path):
+    stat = os.stat(path)
+    return {"name": os.path.basename(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_hash(path)}
+
+
+#Reads the source files and writes the compiled store plus its manifest to artifact_dir
+#(neighbours: build a SparseArcStore keeping that many neighbours per node instead of a dense ArcStore)
+def compile_network(sources, artifact_dir, neighbours=None):
+    entire_nodes = pd.read_excel(sources[0])
+    depot_arcs = pd.concat([read_arc_file(path) for path in sources[1:]])
+    if neighbours is None:
+        arc_store = build_arc_store(entire_nodes, depot_arcs)
+    else:
+        arc_store = build_sparse_arc_store(entire_nodes, depot_arcs, neighbours)
+    arc_store.save(artifact_dir)
+
+    #The manifest is written last, so an interrupted build is never mistaken for a complete artifact
+    manifest = {"version": ARTIFACT_VERSION, "sources": [_describe_source(path) for path in sources]}
+    if neighbours is not None:
+        manifest["neighbours"] = neighbours
+    _write_manifest(artifact_dir, manifest)
+    return arc_store
+
+
+def _write_manifest(artifact_dir, manifest):
+    manifest_path = os.path.join(artifact_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+#Checks whether the artifact in artifact_dir was built from the current sources.
+#Size and mtime are compared first; a file whose mtime changed is only treated as modified if its hash changed too.
+def _artifact_is_current(sources, artifact_dir, neighbours=None):
+    try:
+        with open(os.path.join(artifact_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("version") != ARTIFACT_VERSION or manifest.get("neighbours") != neighbours:
+        return False
+    recorded = manifest.get("sources", [])
+    if [entry["name"] for entry in recorded] != [os.path.basename(path) for path in sources]:
+        return False
+    touched = False
+    for entry, path in zip(recorded, sources):
+        stat = os.stat(path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            if _file_hash(path) != entry["sha256"]:
+                return False
+            entry["mtime_ns"] = stat.st_mtime_ns
+            touched = True
+    #Record the new mtimes of files that were only touched, so they are not re-hashed on every run
+    if touched:
+        _write_manifest(artifact_dir, manifest)
+    return True
+
+
+#Returns the ArcStore for the inputs in directory, memory-mapped from the artifact when it is up to date and rebuilt otherwise.
+#With neighbours it is a SparseArcStore keeping that many neighbours per node, in its own artifact ("network_cache/knn-<k>").
+def load_network(directory=".", artifact_dir=None, mmap_mode="r", neighbours=None):
+    if artifact_dir is None:
+        artifact_dir = os.path.join(directory, "network_cache")
+        if neighbours is not None:
+            artifact_dir = os.path.join(artifact_dir, "knn-%d" % neighbours)
+    sources = network_sources(directory)
+    if _artifact_is_current(sources, artifact_dir, neighbours):
+        count("network artifact reused")
+    else:
+        count("network artifact compiled")
+        with stage("compile network"):
+            compile_network(sources, artifact_dir, neighbours)
+    store_class = ArcStore if neighbours is None else SparseArcStore
+    return store_class.load(artifact_dir, mmap_mode=mmap_mode)
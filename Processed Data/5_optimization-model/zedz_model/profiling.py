@@ -0,0 +1,222 @@
+#Stage-level profiling of a model run
+#
+#A Profiler records, for every named stage of a run (loading, synthesis, tour formation per scenario and carrier, aggregation,
+#Excel export...), its wall-clock and CPU time and, with memory=True, its peak traced memory (tracemalloc). Stages nest: a stage
+#opened inside another is reported as "outer/inner". Counters count the hot-path events of the model (distance lookups, arc
+#rows scanned, neighbour-list and cache hits and misses), and cprofile=True captures a cProfile of the whole run as well.
+#report() gives everything as one dict; write() saves it as JSON or, for a ".csv" path, as one table.
+#
+#The library reports into whichever profiler is active (started and not yet stopped) through the module-level stage() and
+#count(); with none active they do nothing. Tour formation jobs that run in worker processes send their timings and counters
+#back with their tours (see runner.py); tracemalloc and cProfile only see the main process.
+#
+#    profiler = Profiler(memory=True)
+#    profiler.start()
+#    with profiler.stage("synthesize"):
+#        shipment_df = synthesize_shipments(...)
+#    profiler.stop()
+#    profiler.write("run profile.json")
+
+import cProfile
+import csv
+import json
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+#Number of functions of the cProfile capture listed in the report, by cumulative time
+PROFILE_FUNCTIONS = 30
+
+#Profiler that stage() and count() report into, and every running profiler in the order they were started (a profiler started
+#inside another one, e.g. the profiler of a tour formation job run in-process, hands the outer one back when it stops)
+_active = None
+_running = []
+
+#Open stages of every profiler, outermost first. tracemalloc has one peak for the whole process, so a stage opening anywhere
+#(also in another profiler) first adds the peak so far to all of them before restarting it.
+_open_frames = []
+
+
+class Profiler:
+    #memory: record the peak traced memory of every stage with tracemalloc (slows allocation-heavy code down noticeably)
+    #cprofile: capture a cProfile of everything between start() and stop()
+    def __init__(self, memory=False, cprofile=False):
+        self.memory = memory
+        self.cprofile = cprofile
+        self.stages = {}
+        self.counters = Counter()
+        self.started = None
+        self.seconds = 0.0
+        self._open = []
+        self._running = False
+        self._start_time = None
+        self._profile = None
+        self._started_tracing = False
+
+    def start(self):
+        global _active
+        _running.append(self)
+        _active = self
+        self.started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._running = True
+        self._start_time = time.perf_counter()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.cprofile:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    def stop(self):
+        global _active
+        if self._profile is not None:
+            self._profile.disable()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self.seconds = time.perf_counter() - self._start_time
+        self._running = False
+        #Profilers may be stopped in any order: the active one is always the last started that is still running
+        for i in reversed(range(len(_running))):
+            if _running[i] is self:
+                del _running[i]
+                break
+        _active = _running[-1] if _running else None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    #Name of a stage opened now: nested under the stages that are open
+    def _stage_name(self, name):
+        return "/".join([frame["name"] for frame in self._open] + [str(name)])
+
+    #Adds one call of a stage; repeated stages (e.g. one per depot) add up
+    def record(self, name, seconds, cpu_seconds=None, peak_memory=None, memory_change=None):
+        entry = self.stages.setdefault(name, {"stage": name, "calls": 0, "seconds": 0.0, "cpu_seconds": None, "peak_memory": None, "memory_change": None})
+        entry["calls"] += 1
+        entry["seconds"] += seconds
+        if cpu_seconds is not None:
+            entry["cpu_seconds"] = (entry["cpu_seconds"] or 0.0) + cpu_seconds
+        if peak_memory is not None:
+            entry["peak_memory"] = max(entry["peak_memory"] or 0, peak_memory)
+        if memory_change is not None:
+            entry["memory_change"] = (entry["memory_change"] or 0) + memory_change
+
+    #Times the code of a with block as a stage
+    @contextmanager
+    def stage(self, name):
+        frame = {"name": str(name), "peak": 0}
+        full_name = self._stage_name(name)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            #The peak so far belongs to the open stages (of every profiler); the peak is then restarted for this one
+            current, peak = tracemalloc.get_traced_memory()
+            for outer in _open_frames:
+                outer["peak"] = max(outer["peak"], peak)
+            tracemalloc.reset_peak()
+            frame["current"] = current
+        self._open.append(frame)
+        _open_frames.append(frame)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield self
+        finally:
+            seconds = time.perf_counter() - wall
+            cpu_seconds = time.process_time() - cpu
+            self._open.pop()
+            for i in reversed(range(len(_open_frames))):
+                if _open_frames[i] is frame:
+                    del _open_frames[i]
+                    break
+            peak_memory = memory_change = None
+            if tracing and tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                frame["peak"] = max(frame["peak"], peak)
+                for outer in _open_frames:
+                    outer["peak"] = max(outer["peak"], peak)
+                peak_memory = frame["peak"]
+                memory_change = current - frame["current"]
+            self.record(full_name, seconds, cpu_seconds, peak_memory, memory_change)
+
+    #Adds to a counter (or to several, given a dict / Counter of counts)
+    def count(self, name, n=1):
+        counts = name if isinstance(name, dict) else {name: n}
+        for name, n in counts.items():
+            self.counters[name] += int(n)
+
+    #The most expensive functions of the cProfile capture, by cumulative time
+    def profile_functions(self, limit=PROFILE_FUNCTIONS):
+        if self._profile is None:
+            return []
+        stats = pstats.Stats(self._profile)
+        functions = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            functions.append({"function": "%s:%d(%s)" % (filename, line, function), "calls": calls, "seconds": own, "cumulative_seconds": cumulative})
+        functions.sort(key=lambda entry: entry["cumulative_seconds"], reverse=True)
+        return functions[:limit]
+
+    #Writes the cProfile capture in the pstats format (for snakeviz, pstats.Stats, ...)
+    def dump_profile(self, path):
+        if self._profile is None:
+            raise ValueError("the profiler was not started with cprofile=True")
+        self._profile.dump_stats(path)
+
+    def report(self):
+        return {
+            "started": self.started,
+            #Up to now while the profiler is still running
+            "seconds": time.perf_counter() - self._start_time if self._running else self.seconds,
+            "stages": list(self.stages.values()),
+            "counters": dict(sorted(self.counters.items())),
+            "profile": self.profile_functions(),
+        }
+
+    #Saves the report: JSON, or for a ".csv" path one table with a row per stage, counter and profiled function
+    def write(self, path):
+        report = self.report()
+        if not str(path).lower().endswith(".csv"):
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            return
+        fields = ["kind", "name", "calls", "seconds", "cpu_seconds", "peak_memory", "memory_change", "value"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fields)
+            writer.writeheader()
+            writer.writerow({"kind": "run", "name": report["started"], "seconds": report["seconds"]})
+            for entry in report["stages"]:
+                writer.writerow({"kind": "stage", "name": entry["stage"], **{field: entry[field] for field in fields[2:7]}})
+            for name, value in report["counters"].items():
+                writer.writerow({"kind": "counter", "name": name, "value": value})
+            for entry in report["profile"]:
+                writer.writerow({"kind": "function", "name": entry["function"], "calls": entry["calls"], "seconds": entry["seconds"], "value": entry["cumulative_seconds"]})
+
+
+#The profiler that is reporting (None if no profiler is started)
+def active_profiler():
+    return _active
+
+
+#Stage of the active profiler, or a no-op block if there is none
+def stage(name):
+    return nullcontext() if _active is None else _active.stage(name)
+
+
+#Adds to a counter of the active profiler, if there is one
+def count(name, n=1):
+    if _active is not None:
+        _active.count(name, n)
+
+
+#Adds a stage timed elsewhere (e.g. in a worker process) to the active profiler, nested under its open stages
+def record(name, seconds, cpu_seconds=None):
+    if _active is not None:
+        _active.record(_active._stage_name(name), seconds, cpu_seconds)
@@ -0,0 +1,484 @@
+#Offline road-network router
+#
+#The depot arc files were created in "2_data-creation-2_Nodes&Arcs/arcs_creation.ipynb" with one Google Distance Matrix request
+#per ordered pair of nodes. This module computes the same tables locally: it loads a street graph from an on-disk extract
+#(GeoJSON LineStrings or an OpenStreetMap .osm XML file), snaps the nodes of "Entire Nodes.xlsx" to its nearest vertices and runs
+#one Dijkstra search per origin over a CSR adjacency, stopping once every destination is settled. The output has the
+#"Distance in meter" / "duration in seconds" / "origin_id" / "destination_id" columns of the depot arc files.
+#
+#Routes minimise driving time, like the fastest route Google returns, and report the length of that route. The stretch from a node
+#to the vertex it is snapped to is added as a straight line driven at ACCESS_SPEED. Nodes are snapped through a uniform grid of
+#the vertices, so snapping costs about the same per node whatever the size of the extract.
+#
+#The searches are plain Python, one per distinct snapped vertex, spread over worker processes; there is no bulk many-to-many
+#shortest-path routine. A library one (scipy.sparse.csgraph) minimises a single weight, so the length of the fastest route
+#would still have to be summed along its predecessor tree, and the model does not depend on scipy. A search costs about 0.2 s
+#on a 100,000-vertex, 400,000-edge graph, so the matrix of 3,000 nodes on a metro extract takes about 10 CPU minutes.
+#
+#RoutedArcStore puts the router behind an arc store: a pair the arc files never collected (two receivers outside a common depot
+#service area) is answered from a whole shortest-path row of its origin, computed on the first miss and kept in a bounded LRU
+#cache (RouteRows), so tour formation never fails on a missing arc and memory is bounded by the rows in use.
+#
+#Command line, from the 5_optimization-model directory:
+#    python -m zedz_model.router streets.geojson "Entire Nodes.xlsx" --depot 9 --depot 10
+#writes "depot-9_arcs.xlsx" and "depot-10_arcs.xlsx"; --all writes the matrix between every pair of nodes instead.
+
+import argparse
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .network import ARC_COLUMNS, ArcStore, write_arc_file
+from .profiling import count
+from .runner import default_context
+
+#Mean earth radius (meters)
+EARTH_RADIUS = 6371008.8
+
+#Speed (km/h) assumed for a street without a usable "maxspeed" tag, by its "highway" class
+DEFAULT_SPEEDS = {
+    "motorway": 100, "motorway_link": 60, "trunk": 80, "trunk_link": 50, "primary": 60, "primary_link": 40,
+    "secondary": 50, "secondary_link": 40, "tertiary": 40, "tertiary_link": 30, "unclassified": 30,
+    "residential": 30, "living_street": 10, "service": 15,
+}
+FALLBACK_SPEED = 30
+
+#Speed (km/h) of the straight stretch between a node and the street vertex it is snapped to
+ACCESS_SPEED = 15
+
+#"highway" classes a delivery vehicle cannot drive on
+NOT_DRIVABLE = {"footway", "path", "cycleway", "steps", "pedestrian", "bridleway", "corridor", "track", "proposed", "construction", "platform", "elevator"}
+
+#Shortest-path rows kept by a RouteRows cache (each is two float64 arrays over the nodes)
+ROUTE_ROWS = 1024
+
+#Vertices closer than this many decimal degrees (about 1 cm) are merged when a GeoJSON file is read
+COORDINATE_DECIMALS = 7
+
+#Average number of vertices per cell of the grid RoadGraph.snap() searches
+SNAP_CELL_VERTICES = 4
+
+
+#Great-circle distance (meters) between arrays of points
+def haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class RoadGraph:
+    #lat, lon: coordinates of every vertex
+    #indptr, indices: CSR adjacency; the edges leaving vertex v go to indices[indptr[v]:indptr[v + 1]]
+    #length, time: length (meters) and driving time (seconds) of every edge
+    def __init__(self, lat, lon, indptr, indices, length, time):
+        self.lat = lat
+        self.lon = lon
+        self.indptr = indptr
+        self.indices = indices
+        self.length = length
+        self.time = time
+        self._grid = None
+
+    def __len__(self):
+        return len(self.lat)
+
+    #Builds the CSR graph from edge arrays (tail vertex u, head vertex v)
+    @classmethod
+    def from_edges(cls, lat, lon, u, v, length, time):
+        order = np.argsort(u, kind="stable")
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(u, minlength=len(lat)), out=indptr[1:])
+        return cls(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64), indptr, np.asarray(v, dtype=np.int64)[order],
+                   np.asarray(length, dtype=np.float64)[order], np.asarray(time, dtype=np.float64)[order])
+
+    #Uniform grid over the vertices on an equirectangular projection (x = longitude * scale, y = latitude), built on first use:
+    #(scale, x, y, origin, cell size, cells across, cells up, vertices sorted by cell, start of every cell in them)
+    def _snap_grid(self):
+        if self._grid is None:
+            scale = math.cos(math.radians(float(np.mean(self.lat))))
+            x, y = self.lon * scale, self.lat
+            origin = (float(x.min()), float(y.min()))
+            width, height = float(x.max()) - origin[0], float(y.max()) - origin[1]
+            #Cells of about SNAP_CELL_VERTICES vertices, but no more than 65536 across a long, thin extent
+            size = max(math.sqrt(width * height * SNAP_CELL_VERTICES / len(x)), max(width, height) / 65536, 1e-9)
+            nx, ny = int(width / size) + 1, int(height / size) + 1
+            cell = ((y - origin[1]) // size).astype(np.int64) * nx + ((x - origin[0]) // size).astype(np.int64)
+            by_cell = np.argsort(cell, kind="stable")
+            starts = np.searchsorted(cell[by_cell], np.arange(nx * ny + 1))
+            self._grid = (scale, x, y, origin, size, nx, ny, by_cell, starts)
+        return self._grid
+
+    #Nearest vertex of every point and the distance (meters) to it.
+    #Points are compared on an equirectangular projection. Each point searches the grid cells around its own in growing square
+    #rings and stops once the nearest vertex found is closer than any cell not searched yet; ties go to the lowest vertex index.
+    def snap(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        scale, x, y, origin, size, nx, ny, by_cell, starts = self._snap_grid()
+        vertex = np.empty(len(lat), dtype=np.int64)
+        for i in range(len(lat)):
+            px, py = lon[i] * scale, lat[i]
+            cx, cy = int((px - origin[0]) // size), int((py - origin[1]) // size)
+            #Rings before the first one hold no cell of the grid (the point is outside it), rings after the last one neither
+            first_ring = max(-cx, cx - nx + 1, -cy, cy - ny + 1, 0)
+            last_ring = max(abs(cx), abs(cx - nx + 1), abs(cy), abs(cy - ny + 1))
+            best, best_d2 = -1, math.inf
+            for ring in range(first_ring, last_ring + 1):
+                if best >= 0 and best_d2 <= ((ring - 1) * size) ** 2:
+                    break
+                rows = range(max(cy - ring, 0), min(cy + ring, ny - 1) + 1)
+                candidates = []
+                for row in rows:
+                    if row in (cy - ring, cy + ring):
+                        columns = range(max(cx - ring, 0), min(cx + ring, nx - 1) + 1)
+                    else:
+                        columns = [column for column in (cx - ring, cx + ring) if 0 <= column < nx]
+                    for column in columns:
+                        c = row * nx + column
+                        if starts[c] < starts[c + 1]:
+                            candidates.append(by_cell[starts[c]:starts[c + 1]])
+                if not candidates:
+                    continue
+                candidates = np.concatenate(candidates)
+                d2 = (x[candidates] - px) ** 2 + (y[candidates] - py) ** 2
+                nearest = d2.min()
+                if nearest < best_d2 or (nearest == best_d2 and candidates[d2 == nearest].min() < best):
+                    best, best_d2 = int(candidates[d2 == nearest].min()), nearest
+            vertex[i] = best
+        return vertex, haversine(lat, lon, self.lat[vertex], self.lon[vertex])
+
+
+#Speed (km/h) of a street from its tags
+def _street_speed(tags, speeds):
+    maxspeed = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", str(tags.get("maxspeed") or ""))
+    if maxspeed:
+        return float(maxspeed.group(1)) * (1.609344 if maxspeed.group(2) else 1.0)
+    return speeds.get(tags.get("highway"), FALLBACK_SPEED)
+
+
+#1 for a street open in its drawing direction only, -1 for the reverse direction only, 0 for both directions
+def _street_direction(tags):
+    oneway = str(tags.get("oneway") or "").lower()
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway in ("-1", "reverse"):
+        return -1
+    return 0
+
+
+#Builds the graph from streets given as (vertex index sequence, tags), the vertices being points of lat / lon
+def _graph_from_streets(lat, lon, streets, speeds):
+    tails, heads, kmh = [], [], []
+    for vertices, tags in streets:
+        if tags.get("highway") in NOT_DRIVABLE or len(vertices) < 2:
+            continue
+        vertices = np.asarray(vertices, dtype=np.int64)
+        u, v = vertices[:-1], vertices[1:]
+        direction = _street_direction(tags)
+        speed = _street_speed(tags, speeds)
+        if direction >= 0:
+            tails.append(u)
+            heads.append(v)
+            kmh.append(np.full(len(u), speed))
+        if direction <= 0:
+            tails.append(v)
+            heads.append(u)
+            kmh.append(np.full(len(u), speed))
+    if not tails:
+        raise ValueError("the road file holds no drivable streets")
+    u, v, kmh = np.concatenate(tails), np.concatenate(heads), np.concatenate(kmh)
+    length = haversine(lat[u], lon[u], lat[v], lon[v])
+    return RoadGraph.from_edges(lat, lon, u, v, length, length / (kmh / 3.6))
+
+
+#Reads the LineString / MultiLineString features of a GeoJSON file; coordinates shared by several features become one vertex
+def load_geojson(path, speeds=DEFAULT_SPEEDS):
+    with open(path) as f:
+        features = json.load(f)["features"]
+    lines = []
+    for feature in features:
+        geometry = feature.get("geometry") or {}
+        tags = feature.get("properties") or {}
+        if geometry.get("type") == "LineString":
+            lines.append((geometry["coordinates"], tags))
+        elif geometry.get("type") == "MultiLineString":
+            lines.extend((coordinates, tags) for coordinates in geometry["coordinates"])
+
+    points = np.concatenate([np.asarray(coordinates, dtype=np.float64)[:, :2] for coordinates, _ in lines])
+    points, vertex = np.unique(np.round(points, COORDINATE_DECIMALS), axis=0, return_inverse=True)
+    vertex = vertex.ravel()
+    streets = []
+    start = 0
+    for coordinates, tags in lines:
+        streets.append((vertex[start:start + len(coordinates)], tags))
+        start += len(coordinates)
+    return _graph_from_streets(points[:, 1], points[:, 0], streets, speeds)
+
+
+#Reads the ways tagged "highway" of an OpenStreetMap XML extract
+def load_osm(path, speeds=DEFAULT_SPEEDS):
+    node_index = {}
+    lat, lon = [], []
+    ways = []
+    for _, element in ET.iterparse(path):
+        if element.tag == "node":
+            node_index[element.get("id")] = len(lat)
+            lat.append(float(element.get("lat")))
+            lon.append(float(element.get("lon")))
+        elif element.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+            if "highway" in tags:
+                ways.append(([nd.get("ref") for nd in element.iter("nd")], tags))
+        if element.tag in ("node", "way", "relation"):
+            element.clear()
+    streets = [([node_index[ref] for ref in refs if ref in node_index], tags) for refs, tags in ways]
+    return _graph_from_streets(np.asarray(lat), np.asarray(lon), streets, speeds)
+
+
+#Loads a road graph from a .geojson / .json or .osm file
+def load_road_graph(path, speeds=DEFAULT_SPEEDS):
+    if path.lower().endswith(".osm"):
+        return load_osm(path, speeds)
+    return load_geojson(path, speeds)
+
+
+#CSR adjacency of a worker process (indptr, indices, time, length) and the target vertices of its searches, set by _init_worker
+_worker_adjacency = None
+_worker_targets = None
+
+
+def _init_worker(graph, targets):
+    global _worker_adjacency, _worker_targets
+    #Plain lists index far faster than numpy arrays inside the Dijkstra loop
+    _worker_adjacency = (graph.indptr.tolist(), graph.indices.tolist(), graph.time.tolist(), graph.length.tolist())
+    _worker_targets = targets
+
+
+#Fastest routes from a source vertex to the target vertices of the worker
+def _route_from(source):
+    return _shortest_paths(_worker_adjacency, source, _worker_targets)
+
+
+#Fastest routes from one source vertex to the targets over an adjacency (indptr, indices, time, length lists): returns (driving
+#time, route length) arrays over the targets, inf where a target cannot be reached. The search stops as soon as every target is
+#settled.
+def _shortest_paths(adjacency, source, targets):
+    indptr, indices, time, length = adjacency
+    best = {source: 0.0}
+    route_length = {source: 0.0}
+    settled = set()
+    remaining = set(targets)
+    heap = [(0.0, source)]
+    while heap and remaining:
+        t, vertex = heapq.heappop(heap)
+        if vertex in settled:
+            continue
+        settled.add(vertex)
+        remaining.discard(vertex)
+        for edge in range(indptr[vertex], indptr[vertex + 1]):
+            head = indices[edge]
+            arrival = t + time[edge]
+            if arrival < best.get(head, math.inf):
+                best[head] = arrival
+                route_length[head] = route_length[vertex] + length[edge]
+                heapq.heappush(heap, (arrival, head))
+    times = np.array([best[target] if target in settled else math.inf for target in targets])
+    lengths = np.array([route_length[target] if target in settled else math.inf for target in targets])
+    return times, lengths
+
+
+#Driving distance and duration matrices between points, one Dijkstra search per distinct snapped vertex, spread over up to
+#processes worker processes (None: one per core, 1: no pool). Unreachable pairs are NaN.
+def route_matrix(graph, lat, lon, processes=None, mp_context=None):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    vertex, offset = graph.snap(lat, lon)
+    sources = np.unique(vertex)
+    #Every search has the same targets, so they are sent once per worker and a task is only its source
+    targets = sources.tolist()
+
+    if mp_context is None:
+        mp_context = default_context()
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(targets))
+    if processes <= 1 or mp_context is None:
+        _init_worker(graph, targets)
+        routes = [_route_from(source) for source in targets]
+    else:
+        with ProcessPoolExecutor(processes, mp_context=mp_context, initializer=_init_worker, initargs=(graph, targets)) as pool:
+            routes = list(pool.map(_route_from, targets, chunksize=max(1, len(targets) // (4 * processes))))
+    times = np.vstack([route[0] for route in routes])
+    lengths = np.vstack([route[1] for route in routes])
+
+    #Expand from distinct vertices back to points, and add the straight stretches to and from the street
+    position = np.searchsorted(sources, vertex)
+    access = offset[:, None] + offset[None, :]
+    dist = lengths[position][:, position] + access
+    dur = times[position][:, position] + access / (ACCESS_SPEED / 3.6)
+    #Points snapped to the same vertex are connected by a straight line instead of a detour over the vertex
+    same = vertex[:, None] == vertex[None, :]
+    direct = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    dist = np.where(same, direct, dist)
+    dur = np.where(same, direct / (ACCESS_SPEED / 3.6), dur)
+    dist[~np.isfinite(dist)] = np.nan
+    dur[~np.isfinite(dur)] = np.nan
+    return dist, dur
+
+
+#Shortest-path rows between points (the nodes of an arc store), one Dijkstra search per row, computed on demand.
+#max_rows: maximum number of cached rows (None: unbounded); the least recently used ones are dropped first.
+class RouteRows:
+    def __init__(self, graph, lat, lon, max_rows=ROUTE_ROWS):
+        self.graph = graph
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.max_rows = max_rows
+        self.vertex, self.offset = graph.snap(self.lat, self.lon)
+        self.targets = np.unique(self.vertex)
+        self._position = np.searchsorted(self.targets, self.vertex)
+        self._adjacency = None
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.lat)
+
+    #(distance, duration) arrays from point a to every point, as the rows of route_matrix() give them (NaN where unreachable)
+    def row(self, a):
+        a = int(a)
+        row = self.cache.get(a)
+        if row is not None:
+            self.hits += 1
+            count("route row cache hits")
+            self.cache.move_to_end(a)
+            return row
+        self.misses += 1
+        count("route row cache misses")
+        if self._adjacency is None:
+            #Plain lists index far faster than numpy arrays inside the Dijkstra loop
+            self._adjacency = (self.graph.indptr.tolist(), self.graph.indices.tolist(), self.graph.time.tolist(), self.graph.length.tolist())
+        times, lengths = _shortest_paths(self._adjacency, int(self.vertex[a]), self.targets.tolist())
+        access = self.offset[a] + self.offset
+        dist = lengths[self._position] + access
+        dur = times[self._position] + access / (ACCESS_SPEED / 3.6)
+        same = self.vertex == self.vertex[a]
+        direct = haversine(self.lat[a], self.lon[a], self.lat, self.lon)
+        dist = np.where(same, direct, dist)
+        dur = np.where(same, direct / (ACCESS_SPEED / 3.6), dur)
+        dist[~np.isfinite(dist)] = np.nan
+        dur[~np.isfinite(dur)] = np.nan
+        row = (dist, dur)
+        self.cache[a] = row
+        if self.max_rows is not None and len(self.cache) > self.max_rows:
+            self.cache.popitem(last=False)
+        return row
+
+
+#Arc matrix of a RoutedArcStore: the matrix of the store it wraps, with the arcs missing there (NaN) read from the routed row of
+#their origin (field 0: distance, 1: duration)
+class RoutedMatrix:
+    def __init__(self, matrix, rows, field):
+        self.matrix = matrix
+        self.rows = rows
+        self.field = field
+        self.shape = (len(rows), len(rows))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        values = np.array(self.matrix[key], dtype=np.float64)
+        missing = np.flatnonzero(np.isnan(values))
+        if len(missing):
+            a, b = (np.ravel(index) for index in np.broadcast_arrays(*(np.asarray(index, dtype=np.int64) for index in key)))
+            #One row per distinct origin of the missing arcs
+            origins, group = np.unique(a[missing], return_inverse=True)
+            order = np.argsort(group, kind="stable")
+            for origin, at in zip(origins, np.split(missing[order], np.cumsum(np.bincount(group, minlength=len(origins)))[:-1])):
+                values.flat[at] = self.rows.row(origin)[self.field][b[at]]
+        return values[()]
+
+
+#An arc store whose arcs missing from arc_store (never collected) are computed from a road graph (see RouteRows).
+#The neighbour lists of arc_store only rank the collected arcs, so a RoutedArcStore has none: the greedy engine scans every
+#remaining stop. Every process keeps its own row cache.
+class RoutedArcStore(ArcStore):
+    def __init__(self, arc_store, rows):
+        super().__init__(arc_store.node_ids, arc_store.street_ids, arc_store.depot_ids, RoutedMatrix(arc_store.dist, rows, 0), RoutedMatrix(arc_store.dur, rows, 1))
+        self.arc_store = arc_store
+        self.rows = rows
+
+    def neighbours(self, k):
+        return None
+
+    #Hash of the wrapped store and of the road graph and points the rows are routed on
+    def fingerprint(self):
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(self.arc_store.fingerprint().encode())
+            for array in (self.rows.graph.indptr, self.rows.graph.indices, self.rows.graph.length, self.rows.graph.time, self.rows.lat, self.rows.lon):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def nbytes(self):
+        return self.arc_store.nbytes() + sum(dist.nbytes + dur.nbytes for dist, dur in self.rows.cache.values())
+
+
+#The arc table between the given nodes (with "ID", "latitude" and "longitude" columns), every ordered pair origin by origin, with
+#the columns of the depot arc files. Distances and durations are rounded to whole meters and seconds like the API returns them.
+def arc_table(graph, nodes, processes=None, mp_context=None):
+    dist, dur = route_matrix(graph, nodes["latitude"].to_numpy(), nodes["longitude"].to_numpy(), processes, mp_context)
+    ids = nodes["ID"].to_numpy()
+    n = len(ids)
+    return pd.DataFrame({
+        "Distance in meter": np.round(dist.ravel()),
+        "duration in seconds": np.round(dur.ravel()),
+        "origin_id": np.repeat(ids, n),
+        "destination_id": np.tile(ids, n),
+    }, columns=ARC_COLUMNS)
+
+
+#Rows of "Entire Nodes.xlsx" in the arc file of a depot: the depot itself and every street served from it by some company
+def depot_nodes(entire_nodes, depot_id):
+    served = entire_nodes[["USPS Depot", "UPS Depot", "Amazon Depot", "FedEX Depot"]] == "Depot-%d" % depot_id
+    is_depot = pd.to_numeric(entire_nodes["depot_id"], errors="coerce") == depot_id
+    return entire_nodes[is_depot | served.any(axis=1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m zedz_model.router", description="Build depot arc files from an offline road network")
+    parser.add_argument("road_file", help="street network extract (.geojson or .osm)")
+    parser.add_argument("nodes_file", help='node table with ID, latitude and longitude columns (e.g. "Entire Nodes.xlsx")')
+    parser.add_argument("--depot", type=int, action="append", default=[], help="write depot-<n>_arcs.xlsx for this depot (repeatable)")
+    parser.add_argument("--all", action="store_true", help="write the arcs between every pair of nodes to all_arcs.xlsx")
+    parser.add_argument("--output-dir", default=".", help="directory the arc files are written to")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+    if not args.depot and not args.all:
+        parser.error("give at least one --depot or --all")
+
+    graph = load_road_graph(args.road_file)
+    entire_nodes = pd.read_excel(args.nodes_file)
+    jobs = [(depot_nodes(entire_nodes, depot), "depot-%d_arcs.xlsx" % depot) for depot in args.depot]
+    if args.all:
+        jobs.append((entire_nodes, "all_arcs.xlsx"))
+    for nodes, name in jobs:
+        path = os.path.join(args.output_dir, name)
+        write_arc_file(arc_table(graph, nodes, args.processes), path)
+        print("%s: %d nodes" % (path, len(nodes)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#Parallel tour formation
+#
+#Every (scenario, carrier, partition, vehicle) combination only reads its own shipments and the arc store, so the tour formations
+#of a run are independent jobs. run_scenarios() sends them to a process pool whose workers share the arc store read-only: forked
+#workers inherit it, other workers memory-map the same network artifact. The results are merged into the same
+#{scenario: {(carrier, partition label): Tours}} layout scenario_tours() gives for one scenario.
+#Every job is timed in its worker and sends its profiling counters back with its tours, so an active Profiler (see
+#profiling.py) gets a stage per (scenario, carrier, partition) wherever the job ran.
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from . import profiling
+from .network import ArcStore
+from .tours import CANDIDATES, CARRIERS, SCENARIOS, VEHICLE_CAPACITY, _payload, form_tours, scenario_partitions
+
+#Arc store of a worker process, set by _init_worker
+_worker_store = None
+
+
+def _init_worker(arc_store, artifact_dir, store_class=ArcStore):
+    global _worker_store
+    _worker_store = store_class.load(artifact_dir) if arc_store is None else arc_store
+
+
+#Forms the tours of one job in a worker; the job only carries the columns the engine reads, for its own shipments.
+#Returns (key, tours, job profiler).
+def _run_job(job):
+    key, receiver_ids, depot_legs, weights, quantities, capacity, nearest_to, candidates, improve, engine, payload = job
+    with profiling.Profiler() as profiler:
+        with profiler.stage("/".join(part for part in key if part)):
+            shipments = pd.DataFrame({"Receiver_ID": receiver_ids, "Distance": depot_legs})
+            if weights is not None:
+                shipments["Weight"] = weights
+            if quantities is not None:
+                shipments["Quantity"] = quantities
+            tours = form_tours(shipments, np.arange(len(shipments)), _worker_store, capacity, nearest_to, candidates=candidates, improve=improve, engine=engine, payload=payload)
+    return key, tours, profiler
+
+
+#Process pool context of the model's worker pools (tour formation, replications, routing): fork where the platform has it,
+#since forked workers share the parent's arc store without re-importing the calling script. Elsewhere None is returned and the
+#jobs run in-process, unless a context is passed explicitly (the caller then has to guard its entry point with
+#if __name__ == "__main__").
+def default_context():
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+#Forms the tours of every carrier under each of the given scenarios, with up to processes worker processes
+#(None: one per core, 1: no pool). Returns {scenario: {(carrier, partition label): Tours}}.
+def run_scenarios(shipment_df, arc_store, scenarios=tuple(SCENARIOS), carriers=CARRIERS, capacities=VEHICLE_CAPACITY, processes=None, nearest_to="first", candidates=CANDIDATES, mp_context=None, improve=False, engine="greedy", payloads=None):
+    receiver_ids = shipment_df["Receiver_ID"].to_numpy()
+    depot_legs = shipment_df["Distance"].to_numpy(dtype=np.float64)
+    weights = shipment_df["Weight"].to_numpy(dtype=np.float64) if "Weight" in shipment_df.columns else None
+    quantities = shipment_df["Quantity"].to_numpy(dtype=np.int64) if "Quantity" in shipment_df.columns else None
+
+    jobs = []
+    partitions = {}
+    for scenario in scenarios:
+        for carrier, label, vehicle, rows in scenario_partitions(shipment_df, scenario, carriers):
+            key = (scenario, carrier, label)
+            partitions[key] = (vehicle, rows)
+            jobs.append((key, receiver_ids[rows], depot_legs[rows], None if weights is None else weights[rows], None if quantities is None else quantities[rows], capacities[vehicle], nearest_to, candidates, improve, engine, _payload(payloads, vehicle)))
+    #Largest jobs first, so a long job does not start last
+    jobs.sort(key=lambda job: len(job[1]), reverse=True)
+
+    if mp_context is None:
+        mp_context = default_context()
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(jobs))
+
+    if processes <= 1 or mp_context is None:
+        _init_worker(arc_store, None)
+        finished = [_run_job(job) for job in jobs]
+    else:
+        if candidates:
+            #Computed once here, so forked workers inherit the neighbour lists instead of each building them
+            arc_store.neighbours(candidates)
+        if mp_context.get_start_method() != "fork" and arc_store.artifact_dir is not None:
+            initargs = (None, arc_store.artifact_dir, type(arc_store))
+        else:
+            initargs = (arc_store, None)
+        with ProcessPoolExecutor(processes, mp_context=mp_context, initializer=_init_worker, initargs=initargs) as pool:
+            futures = [pool.submit(_run_job, job) for job in jobs]
+            finished = [future.result() for future in as_completed(futures)]
+
+    for key, _, profiler in finished:
+        for name, entry in profiler.stages.items():
+            profiling.record(name, entry["seconds"], entry["cpu_seconds"])
+        profiling.count(profiler.counters)
+
+    #Merge in the order the sequential engine produces the tours
+    finished = {key: tours for key, tours, _ in finished}
+    results = {scenario: {} for scenario in scenarios}
+    for key, (vehicle, rows) in partitions.items():
+        scenario, carrier, label = key
+        tours = finished[key]
+        #Map the job's local row positions back onto shipment_df
+        tours.rows = rows[tours.rows]
+        tours.carrier = carrier
+        tours.vehicle = vehicle
+        results[scenario][(carrier, label)] = tours
+    return results
@@ -0,0 +1,61 @@
+#Clarke-Wright savings tour construction
+#
+#An alternative to the greedy engine of tours.py, selected with form_tours(..., engine="savings"). Every stop starts on a tour of
+#its own; two tours are then joined end to start in order of decreasing savings, as long as the joined tour stays within the
+#vehicle's stop capacity and payload. Tours are open paths from the depot (the model does not count the way back), so linking stop
+#i to stop j saves the depot leg to j and costs the arc i -> j: saving(i, j) = d(depot, j) - d(i, j). Distances are not symmetric,
+#so both directions of every pair are scored, all at once from the arc matrix.
+#
+#Clarke-Wright savings never change while tours are joined, so the candidate links are sorted once and taken in that order
+#(the order a max-heap of the savings would pop them in), O(n^2 log n) for n stops.
+
+import numpy as np
+
+
+#Visiting order of stops 0..n-1 (nodes are their arc store indices, depot_legs the distance from the depot to each) and the tour
+#offsets into it, like the greedy engine returns. weights is the payload of every stop (None: no payload limit applies) and
+#payload the vehicle's payload capacity (None: unlimited). Arcs missing from dist or of max_leg or more are never used.
+#A stop heavier than the payload on its own still gets a tour of its own. Every saving needs the depot leg of its stop, so a
+#missing one (NaN) raises IndexError rather than leaving its stop on a tour of its own.
+def savings_order(nodes, dist, depot_legs, capacity, max_leg, weights=None, payload=None):
+    n = len(nodes)
+    missing = np.isnan(depot_legs)
+    if missing.any():
+        raise IndexError("no depot leg for %d of %d stops, the savings of linking them are unknown" % (missing.sum(), n))
+    arcs = np.asarray(dist[np.ix_(nodes, nodes)], dtype=np.float64)
+    savings = depot_legs[None, :] - arcs
+    usable = ~(np.isnan(arcs) | (arcs >= max_leg)) & (savings > 0)
+    np.fill_diagonal(usable, False)
+    tail, head = np.nonzero(usable)
+    #Largest savings first; equal savings keep the order of the earliest shipments
+    by_saving = np.argsort(-savings[tail, head], kind="stable")
+    tail, head = tail[by_saving], head[by_saving]
+
+    if weights is None or payload is None:
+        weights = np.zeros(n)
+        payload = np.inf
+    #Every stop starts as a tour of its own: tour[i] is the tour of stop i and members[t] its stops in visiting order
+    tour = np.arange(n)
+    members = [[i] for i in range(n)]
+    load = np.asarray(weights, dtype=np.float64).copy()
+    is_first = np.ones(n, dtype=bool)
+    is_last = np.ones(n, dtype=bool)
+    for i, j in zip(tail.tolist(), head.tolist()):
+        #i has to end its tour and j start another one
+        if not (is_last[i] and is_first[j]):
+            continue
+        a, b = tour[i], tour[j]
+        if a == b or len(members[a]) + len(members[b]) > capacity or load[a] + load[b] > payload:
+            continue
+        members[a].extend(members[b])
+        tour[members[b]] = a
+        members[b] = None
+        load[a] += load[b]
+        is_last[i] = False
+        is_first[j] = False
+
+    #Tours in order of their earliest shipment
+    tours = sorted((t for t in members if t is not None), key=min)
+    order = np.fromiter((stop for t in tours for stop in t), dtype=np.int64, count=n)
+    offsets = np.concatenate([[0], np.cumsum([len(t) for t in tours])]).astype(np.int64)
+    return order, offsets
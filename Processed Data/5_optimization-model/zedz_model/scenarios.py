@@ -0,0 +1,99 @@
+#Incremental evaluation of ZEDZ policy variants
+#
+#Under the mandatory ZEDZ a carrier's shipments are split into the partition served by EVs (receiver or depot inside the zone)
+#and the partition served by diesel vehicles. Most policy variants (another zone boundary, another EV or diesel stop capacity)
+#leave many of these partitions untouched; e.g. shipments far from the zone form the same diesel tours in every boundary
+#variant. ScenarioEngine caches the tours of every partition under a key made of the partition's content and the vehicle
+#parameters, so evaluating a variant only forms the tours of the partitions it actually changes.
+#
+#ScenarioEngine is an entry point of its own, for sweeping many variants (e.g. the candidate boundaries of zones.zone_variants())
+#over one synthesized day: run_model() and "python -m zedz_model" never call it and keep evaluating the two fixed scenarios of
+#the config. Its tours are formed like run_scenarios() forms them: given the consolidated stops of a run (see
+#consolidation.py), a variant with the model's boundary and capacities gives the tables of that run.
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .aggregate import scenario_tables
+from .profiling import count
+from .tours import CANDIDATES, CARRIERS, VEHICLE_CAPACITY, _payload, form_tours, scenario_partitions
+
+
+class ScenarioEngine:
+    #shipment_df: the synthesized shipments every variant is evaluated on (with the "Distance" column)
+    #max_entries: maximum number of cached partitions (None: unbounded); the least recently used ones are dropped first
+    #improve, engine, payloads: tour improvement and construction, see form_tours() / scenario_tours()
+    def __init__(self, shipment_df, arc_store, carriers=CARRIERS, nearest_to="first", candidates=CANDIDATES, max_entries=None, improve=False, engine="greedy", payloads=None):
+        self.shipment_df = shipment_df
+        self.arc_store = arc_store
+        self.carriers = carriers
+        self.nearest_to = nearest_to
+        self.candidates = candidates
+        self.max_entries = max_entries
+        self.improve = improve
+        self.engine = engine
+        self.payloads = payloads
+        self._weights = shipment_df["Weight"].to_numpy(dtype=np.float64) if "Weight" in shipment_df.columns else None
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._receiver_ids = shipment_df["Receiver_ID"].to_numpy(dtype=np.int64)
+        self._depot_legs = shipment_df["Distance"].to_numpy(dtype=np.float64)
+
+    #Cache key of a partition: hash of its shipments (rows, receivers, depot distances) plus the vehicle and improvement parameters
+    def partition_key(self, carrier, rows, capacity, payload=None):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(rows, dtype=np.int64).tobytes())
+        digest.update(self._receiver_ids[rows].tobytes())
+        digest.update(self._depot_legs[rows].tobytes())
+        if self._weights is not None:
+            digest.update(self._weights[rows].tobytes())
+        improve = tuple(sorted(self.improve.items())) if isinstance(self.improve, dict) else bool(self.improve)
+        return (carrier, digest.hexdigest(), int(capacity), self.nearest_to, improve, self.engine, payload)
+
+    #The shipments with their ZEDZ flags recomputed for another zone boundary.
+    #zedz_streets / zedz_depots are the street_ids / depot_ids inside the zone; None keeps the flags already in shipment_df.
+    def zoned_shipments(self, zedz_streets=None, zedz_depots=None):
+        flags = {}
+        if zedz_streets is not None:
+            flags["Receiver_ZEDZ"] = np.isin(self._receiver_ids, np.asarray(list(zedz_streets), dtype=np.int64)).astype(np.int64)
+        if zedz_depots is not None:
+            flags["Sender_ZEDZ"] = np.isin(self.shipment_df["Sender_ID"].to_numpy(dtype=np.int64), np.asarray(list(zedz_depots), dtype=np.int64)).astype(np.int64)
+        return self.shipment_df.assign(**flags) if flags else self.shipment_df
+
+    #Tours of every carrier under one policy variant, as {(carrier, partition label): Tours}.
+    #Only partitions that are not in the cache yet are formed.
+    def evaluate(self, scenario="mandatory ZEDZ", zedz_streets=None, zedz_depots=None, capacities=VEHICLE_CAPACITY):
+        shipments = self.zoned_shipments(zedz_streets, zedz_depots)
+        results = {}
+        for carrier, label, vehicle, rows in scenario_partitions(shipments, scenario, self.carriers):
+            payload = _payload(self.payloads, vehicle)
+            key = self.partition_key(carrier, rows, capacities[vehicle], payload)
+            tours = self.cache.get(key)
+            if tours is None:
+                self.misses += 1
+                count("scenario cache misses")
+                tours = form_tours(self.shipment_df, rows, self.arc_store, capacities[vehicle], self.nearest_to, carrier, vehicle, self.candidates, self.improve, self.engine, payload)
+                self.cache[key] = tours
+                if self.max_entries is not None and len(self.cache) > self.max_entries:
+                    self.cache.popitem(last=False)
+            else:
+                self.hits += 1
+                count("scenario cache hits")
+                self.cache.move_to_end(key)
+            results[(carrier, label)] = tours
+        return results
+
+    #Evaluates a list of policy variants, each a dict of evaluate() arguments plus an optional "name".
+    #Returns one row per variant with the distance and tour columns of the "FinalResults" tables.
+    def sweep(self, variants, scenario="mandatory ZEDZ"):
+        rows = []
+        for number, variant in enumerate(variants):
+            variant = dict(variant)
+            name = variant.pop("name", number)
+            dist, tours = scenario_tables(self.evaluate(scenario, **variant), scenario, self.carriers)
+            rows.append(pd.concat([dist, tours], axis=1).assign(variant=name))
+        return pd.concat(rows, ignore_index=True).set_index("variant")
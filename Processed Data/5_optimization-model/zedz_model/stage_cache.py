@@ -0,0 +1,191 @@
+#Content-addressed cache of the stages of a model run
+#
+#A run is synthesize -> tour formation -> aggregation. Every stage's output only depends on its inputs and parameters (the
+#seed, company_share, the node tables with their ZEDZ flags, stops_per_vehicle, the tour engine, the network...), so
+#StageCache keys an output by a hash of all of them and keeps it on disk as an uncompressed .npz file (plain arrays, no
+#pickles). A stage whose key is already in the cache is loaded instead of computed: changing how the results are tabulated
+#reruns the aggregation only, changing stops_per_vehicle the tour formation and aggregation, and so on.
+#
+#Shipments drawn without a seed are a new random day on every run and are never cached (nor anything computed from them).
+#STAGE_VERSIONS is part of every key: bump a stage's version whenever a code change alters what the stage produces.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .network import ArcStore
+from .profiling import count
+from .tours import Tours
+
+#Version of the output of every stage
+STAGE_VERSIONS = {"shipments": 1, "tours": 1, "tables": 1, "replicates": 1}
+
+
+#Feeds a key part into a hash: arrays and dataframes by content, arc stores by their fingerprint, everything else as JSON
+def _update(digest, part):
+    if isinstance(part, ArcStore):
+        digest.update(b"arc store:" + part.fingerprint().encode())
+    elif isinstance(part, pd.DataFrame):
+        digest.update(json.dumps([str(column) for column in part.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+    elif isinstance(part, np.ndarray):
+        digest.update(("%s%s" % (part.dtype.str, part.shape)).encode())
+        digest.update(np.ascontiguousarray(part).tobytes())
+    elif isinstance(part, dict):
+        digest.update(b"{")
+        for name in sorted(part, key=str):
+            digest.update(json.dumps(str(name)).encode())
+            _update(digest, part[name])
+        digest.update(b"}")
+    elif isinstance(part, (list, tuple)):
+        digest.update(b"[")
+        for item in part:
+            _update(digest, item)
+        digest.update(b"]")
+    else:
+        digest.update(json.dumps(part, default=str).encode())
+
+
+#Writes arrays to path.npz through a temporary file, so a reader never sees a half-written entry
+def _save_npz(path, arrays):
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+#Whether a column or index holds text (stored as a fixed-width unicode array, since object arrays would need pickles)
+def _is_text(values):
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
+
+
+#Text values as a fixed-width unicode array, and where they are missing (NaN or None would come back as the text "nan")
+def _text_arrays(values):
+    missing = pd.isna(values)
+    return np.where(missing, "", values).astype(str), missing
+
+
+def _text_values(text, missing):
+    values = text.astype(object)
+    values[missing] = np.nan
+    return values
+
+
+#A dataframe as arrays: every column, the index, the missing values of the text ones, and the column names and which of them
+#hold text as JSON
+def _frame_arrays(df):
+    arrays = {}
+    for i, values in enumerate([df[column] for column in df.columns] + [df.index]):
+        name = "column%d" % i if i < len(df.columns) else "index"
+        if _is_text(values):
+            arrays[name], arrays[name + "_missing"] = _text_arrays(values.to_numpy())
+        else:
+            arrays[name] = values.to_numpy()
+    meta = {"columns": [str(column) for column in df.columns], "objects": [bool(_is_text(df[column])) for column in df.columns],
+            "index_name": df.index.name, "index_object": bool(_is_text(df.index))}
+    arrays["meta"] = np.array(json.dumps(meta))
+    return arrays
+
+
+def _read_frame(arrays, prefix=""):
+    meta = json.loads(str(arrays[prefix + "meta"]))
+    columns = {}
+    for i, (column, is_object) in enumerate(zip(meta["columns"], meta["objects"])):
+        name = prefix + "column%d" % i
+        columns[column] = _text_values(arrays[name], arrays[name + "_missing"]) if is_object else arrays[name]
+    index = arrays[prefix + "index"]
+    index = pd.Index(_text_values(index, arrays[prefix + "index_missing"]) if meta["index_object"] else index, name=meta["index_name"])
+    return pd.DataFrame(columns, columns=meta["columns"], index=index)
+
+
+class StageCache:
+    #directory: where the cached outputs are kept (created on first use)
+    def __init__(self, directory="stage_cache"):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    #Key of a stage's output: hash of the stage, its version and every input and parameter it depends on (the key of the stage
+    #before it stands for all of that stage's inputs)
+    def key(self, stage, *parts, **params):
+        digest = hashlib.blake2b(digest_size=20)
+        _update(digest, [stage, STAGE_VERSIONS[stage]])
+        for part in parts:
+            _update(digest, part)
+        _update(digest, params)
+        return digest.hexdigest()
+
+    def _path(self, stage, key):
+        return os.path.join(self.directory, "%s-%s.npz" % (stage, key))
+
+    #The cached output of a stage (None if it is not cached)
+    def get(self, stage, key):
+        path = self._path(stage, key)
+        if key is None or not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as arrays:
+            kind = str(arrays["kind"])
+            if kind == "frame":
+                return _read_frame(arrays)
+            if kind == "frames":
+                return {name: _read_frame(arrays, "%d_" % i) for i, name in enumerate(json.loads(str(arrays["names"])))}
+            return self._read_tours(arrays)
+
+    #Stores a stage's output: a dataframe, a dict of dataframes or the {scenario: {(carrier, label): Tours}} of a tour formation
+    def put(self, stage, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        if isinstance(value, pd.DataFrame):
+            arrays = dict(_frame_arrays(value), kind=np.array("frame"))
+        elif all(isinstance(table, pd.DataFrame) for table in value.values()):
+            arrays = {"kind": np.array("frames"), "names": np.array(json.dumps(list(value)))}
+            for i, table in enumerate(value.values()):
+                arrays.update({"%d_%s" % (i, name): array for name, array in _frame_arrays(table).items()})
+        else:
+            arrays = self._tours_arrays(value)
+        _save_npz(self._path(stage, key), arrays)
+
+    #The output of a stage: loaded from the cache under key, or computed with compute() and stored (key None: never cached)
+    def fetch(self, stage, key, compute):
+        value = self.get(stage, key)
+        if value is not None:
+            self.hits += 1
+            count("stage cache hits")
+            return value
+        value = compute()
+        if key is not None:
+            self.misses += 1
+            count("stage cache misses")
+            self.put(stage, key, value)
+        return value
+
+    @staticmethod
+    def _tours_arrays(all_tour_arrays):
+        arrays = {"kind": np.array("tours")}
+        entries = []
+        for scenario, tour_arrays in all_tour_arrays.items():
+            for (carrier, label), tours in tour_arrays.items():
+                i = len(entries)
+                entries.append([scenario, carrier, label, tours.carrier, tours.vehicle])
+                for field in ("rows", "nodes", "legs", "offsets", "parcels"):
+                    if getattr(tours, field) is not None:
+                        arrays["%d_%s" % (i, field)] = getattr(tours, field)
+        arrays["entries"] = np.array(json.dumps(entries))
+        return arrays
+
+    @staticmethod
+    def _read_tours(arrays):
+        all_tour_arrays = {}
+        for i, (scenario, carrier, label, tours_carrier, vehicle) in enumerate(json.loads(str(arrays["entries"]))):
+            fields = [arrays["%d_%s" % (i, field)] for field in ("rows", "nodes", "legs", "offsets")]
+            parcels = arrays["%d_parcels" % i] if "%d_parcels" % i in arrays else None
+            all_tour_arrays.setdefault(scenario, {})[(carrier, label)] = Tours(*fields, tours_carrier, vehicle, parcels)
+        return all_tour_arrays
+
+    #Removes every cached output
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"):
+                    os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,101 @@
+#Streaming synthesizer and tour formation for city-scale parcel volumes
+#
+#synthesize_shipments() builds one dataframe of every parcel of the day, with the address and carrier name of each parcel, and
+#the tour formation then selects every carrier's partitions from it. For regions with millions of daily parcels the pipeline
+#below never holds the whole day: the carrier draws are made for all consumer nodes at once (the same draws
+#synthesize_shipments() makes from the same rng), but the parcels are only expanded one depot at a time, into compact numeric
+#columns (int32 ids, uint8 ZEDZ flags, float32 distances), and handed straight to that depot's tour formation.
+#Peak memory is then bounded by the largest depot's daily volume instead of the city's.
+#
+#Tours are formed per depot, so a tour never mixes the shipments of two depots of the same carrier. run_model() forms every
+#carrier's tours over all of its depots at once, so the two give different tours, tour counts and distances for the same day:
+#compare streamed runs with streamed runs only. This pipeline is an entry point of its own for volumes that do not fit in
+#memory; run_model() and "python -m zedz_model" never call it.
+
+import numpy as np
+import pandas as pd
+
+from .consolidation import consolidate_shipments
+from .profiling import stage
+from .synthesizer import COMPANY_ID_COLUMNS, check_depot_legs, draw_carriers
+from .tours import CANDIDATES, CARRIERS, SCENARIOS, VEHICLE_CAPACITY, _payload, concat_tours, form_tours
+
+
+#Yields the shipments of the day depot by depot, as (depot_id, carrier, shipments).
+#shipments is a dataframe with one row per parcel in consumer node order and the columns "Node" (row in consumer_nodes),
+#"Receiver_ID", "Receiver_ZEDZ", "Sender_ZEDZ" and, when an arc_store is given, "Distance" (depot to receiver), and when
+#parcel_weight is given "Weight" (see synthesize_shipments(); a missing depot leg raises IndexError). Depots without parcels are
+#skipped. rng may be a numpy Generator or a seed.
+def depot_shipments(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store=None, rng=None, parcel_weight=None):
+    rng = np.random.default_rng(rng)
+    counts = draw_carriers(parcels_per_day, company_share, rng)
+
+    depot_columns = [COMPANY_ID_COLUMNS[name] for name in company_names]
+    node_depots = consumer_nodes[depot_columns].to_numpy(dtype=np.int64)
+    street_ids = consumer_nodes["street_id"].to_numpy(dtype=np.int32)
+    receiver_zedz = consumer_nodes["ZEDZ(inside =1)"].to_numpy(dtype=np.uint8)
+
+    depot_ids = logistic_nodes["depot_id"].to_numpy(dtype=np.int64)
+    unknown = np.setdiff1d(node_depots[counts > 0], depot_ids)
+    if len(unknown):
+        raise KeyError("depot_id not found in the logistic nodes: %s" % unknown.tolist())
+
+    carriers = logistic_nodes["logistics_company_name"].to_numpy()
+    sender_zedz = logistic_nodes["ZEDZ(inside =1)"].to_numpy(dtype=np.uint8)
+    for depot_row, depot_id in enumerate(depot_ids):
+        #(node, company) pairs sent from this depot, in row-major order so the parcels stay grouped by node as before
+        nodes, companies = np.nonzero((node_depots == depot_id) & (counts > 0))
+        if not len(nodes):
+            continue
+        node_row = np.repeat(nodes.astype(np.int32), counts[nodes, companies])
+        shipments = pd.DataFrame({
+            "Node": node_row,
+            "Receiver_ID": street_ids[node_row],
+            "Receiver_ZEDZ": receiver_zedz[node_row],
+            "Sender_ZEDZ": np.full(len(node_row), sender_zedz[depot_row], dtype=np.uint8),
+        })
+        if arc_store is not None:
+            shipments["Distance"] = arc_store.depot_to_street(np.full(len(node_row), depot_id), street_ids[node_row]).astype(np.float32)
+            check_depot_legs(np.full(len(node_row), depot_id), shipments["Distance"].to_numpy())
+        if parcel_weight is not None:
+            shipments["Weight"] = np.asarray(parcel_weight, dtype=np.float32)[node_row]
+        yield int(depot_id), carriers[depot_row], shipments
+
+
+#Yields the tours of every depot as (depot_id, carrier, shipments, {scenario: {partition label: Tours}}), synthesizing and
+#forming one depot at a time. The rows of these Tours are positions in the depot's shipments (see depot_shipments()).
+def stream_depot_tours(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store, scenarios=tuple(SCENARIOS), capacities=VEHICLE_CAPACITY, rng=None, nearest_to="first", candidates=CANDIDATES, improve=False, engine="greedy", payloads=None, parcel_weight=None):
+    batches = depot_shipments(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store, rng, parcel_weight)
+    for depot_id, carrier, shipments in batches:
+        #One row per stop (the "Node" of a stop is that of its receiver)
+        shipments = consolidate_shipments(shipments)
+        results = {}
+        for scenario in scenarios:
+            results[scenario] = {}
+            for label, shipment_filter, vehicle in SCENARIOS[scenario]:
+                rows = np.arange(len(shipments)) if shipment_filter is None else np.flatnonzero(shipment_filter(shipments))
+                #One stage per (scenario, carrier, partition), adding up over the carrier's depots
+                with stage("/".join(part for part in (scenario, carrier, label) if part)):
+                    results[scenario][label] = form_tours(shipments, rows, arc_store, capacities[vehicle], nearest_to, carrier, vehicle, candidates, improve, engine, _payload(payloads, vehicle))
+        yield depot_id, carrier, shipments, results
+
+
+#Forms the tours of every carrier depot by depot and merges them into the {scenario: {(carrier, partition label): Tours}}
+#layout of run_scenarios(), so scenario_tables() and vehicle_table() apply unchanged. As no shipment dataframe exists, the
+#rows of the merged Tours are the consumer_nodes rows of the stops.
+def streamed_scenario_tours(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store, scenarios=tuple(SCENARIOS), carriers=CARRIERS, capacities=VEHICLE_CAPACITY, rng=None, nearest_to="first", candidates=CANDIDATES, improve=False, engine="greedy", payloads=None, parcel_weight=None):
+    collected = {scenario: {(carrier, label): [] for carrier in carriers for label, _, _ in SCENARIOS[scenario]} for scenario in scenarios}
+    for _, carrier, shipments, results in stream_depot_tours(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store, scenarios, capacities, rng, nearest_to, candidates, improve, engine, payloads, parcel_weight):
+        if carrier not in carriers:
+            continue
+        node_rows = shipments["Node"].to_numpy()
+        for scenario, partitions in results.items():
+            for label, tours in partitions.items():
+                tours.rows = node_rows[tours.rows]
+                collected[scenario][(carrier, label)].append(tours)
+
+    merged = {}
+    for scenario in scenarios:
+        vehicles = {label: vehicle for label, _, vehicle in SCENARIOS[scenario]}
+        merged[scenario] = {key: concat_tours(tours_list, key[0], vehicles[key[1]]) for key, tours_list in collected[scenario].items()}
+    return merged
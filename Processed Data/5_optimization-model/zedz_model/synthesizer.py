@@ -0,0 +1,89 @@
+#Shipment synthesizer (Part I of the ZEDZ Shipment Model)
+#
+#Generates the shipments of an average day: every parcel delivered to a consumer node is assigned to a company according to
+#company_share, and is sent from that company's depot for the node (the USPS_ID / UPS_ID / Amazon_ID / FedEx_ID columns of
+#"consumer_nodes edited.csv"). All carrier draws for a node are made in one multinomial call and the shipment dataframe is
+#assembled column by column, instead of appending one row per parcel.
+
+import numpy as np
+import pandas as pd
+
+from .profiling import stage
+
+#Columns of the shipment dataframe, in the order the rest of the model expects
+SHIPMENT_COLUMNS = ["Receiver", "Receiver_ID", "Receiver Lat", "Receiver Lon", "Receiver_ZEDZ", "Sender", "Sender_ID", "Sender Lat", "Sender Lon", "Sender_ZEDZ"]
+
+#Column of the consumer nodes holding the depot each company serves the node from
+COMPANY_ID_COLUMNS = {"USPS": "USPS_ID", "UPS": "UPS_ID", "Amazon Logistics": "Amazon_ID", "FedEx": "FedEx_ID"}
+
+
+#Draws how many of each node's parcels go to each company: returns an array of shape (nodes, companies)
+def draw_carriers(parcels_per_day, company_share, rng):
+    parcels = np.asarray(parcels_per_day, dtype=np.int64)
+    return rng.multinomial(parcels, company_share)
+
+
+#Raises IndexError when some shipments have no depot leg (NaN distance): the arc from their sending depot to their receiver was
+#never collected, e.g. because the depot has no "depot-x_arccs.xlsx" file. The message lists every such depot with its
+#number of shipments.
+def check_depot_legs(sender_id, distance):
+    missing = np.isnan(distance)
+    if missing.any():
+        depots, shipments = np.unique(np.asarray(sender_id)[missing], return_counts=True)
+        listed = ", ".join("depot %d: %d" % (depot, n) for depot, n in zip(depots.tolist(), shipments.tolist()))
+        raise IndexError("no arc from the sending depot for %d of %d shipments (%s); these depots have no arc file or an incomplete one. "
+                         "Route the missing arcs (road_file) or estimate them (estimate_arcs = \"missing\")" % (missing.sum(), len(missing), listed))
+
+
+#Returns the shipment dataframe for one day.
+#parcels_per_day holds the number of parcels for each row of consumer_nodes. When an arc_store is given the "Distance" column
+#(driving distance from the sending depot to the receiver) is attached as well, raising IndexError if an arc is missing (see
+#check_depot_legs()), and when parcel_weight (kg of a parcel for each row of consumer_nodes, see parcel_weights()) is given the
+#"Weight" column. rng may be a numpy Generator or a seed.
+def synthesize_shipments(consumer_nodes, logistic_nodes, parcels_per_day, company_names, company_share, arc_store=None, rng=None, parcel_weight=None):
+    rng = np.random.default_rng(rng)
+    counts = draw_carriers(parcels_per_day, company_share, rng)
+    n_nodes, n_companies = counts.shape
+
+    #One entry per parcel: the consumer node row and the company it was assigned to, grouped by node as before
+    node_row = np.repeat(np.repeat(np.arange(n_nodes), n_companies), counts.ravel())
+    company = np.repeat(np.tile(np.arange(n_companies), n_nodes), counts.ravel())
+
+    depot_columns = [COMPANY_ID_COLUMNS[name] for name in company_names]
+    sender_id = consumer_nodes[depot_columns].to_numpy(dtype=np.int64)[node_row, company]
+
+    #Row of each sender depot in logistic_nodes
+    depot_ids = logistic_nodes["depot_id"].to_numpy(dtype=np.int64)
+    depot_row = pd.Index(depot_ids).get_indexer(sender_id)
+    if (depot_row < 0).any():
+        missing = np.unique(sender_id[depot_row < 0])
+        raise KeyError("depot_id not found in the logistic nodes: %s" % missing.tolist())
+
+    shipment_df = pd.DataFrame({
+        "Receiver": consumer_nodes["street_address"].to_numpy()[node_row],
+        "Receiver_ID": consumer_nodes["street_id"].to_numpy()[node_row],
+        "Receiver Lat": consumer_nodes["latitude"].to_numpy()[node_row],
+        "Receiver Lon": consumer_nodes["longitude"].to_numpy()[node_row],
+        "Receiver_ZEDZ": consumer_nodes["ZEDZ(inside =1)"].to_numpy()[node_row],
+        "Sender": logistic_nodes["logistics_company_name"].to_numpy()[depot_row],
+        "Sender_ID": sender_id,
+        "Sender Lat": logistic_nodes["depot_latitude"].to_numpy()[depot_row],
+        "Sender Lon": logistic_nodes["depot_longitude"].to_numpy()[depot_row],
+        "Sender_ZEDZ": logistic_nodes["ZEDZ(inside =1)"].to_numpy()[depot_row],
+    }, columns=SHIPMENT_COLUMNS)
+
+    if arc_store is not None:
+        with stage("distance attach"):
+            shipment_df["Distance"] = arc_store.depot_to_street(sender_id, shipment_df["Receiver_ID"].to_numpy())
+            check_depot_legs(sender_id, shipment_df["Distance"].to_numpy())
+    if parcel_weight is not None:
+        shipment_df["Weight"] = np.asarray(parcel_weight, dtype=np.float64)[node_row]
+    return shipment_df
+
+
+#Average weight (kg) of a parcel delivered to each consumer node, from the daily parcel count and weight columns of
+#"consumer_nodes edited.csv" / "consumer_nodes_new.csv"
+def parcel_weights(consumer_nodes):
+    parcels = consumer_nodes["parcel_delivered(#/day)"].to_numpy(dtype=np.float64)
+    kg = consumer_nodes["parcel_delivered(kg/day)"].to_numpy(dtype=np.float64)
+    return np.divide(kg, parcels, out=np.zeros_like(kg), where=parcels > 0)
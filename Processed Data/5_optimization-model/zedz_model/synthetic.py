@@ -0,0 +1,201 @@
+#Synthetic cities for benchmarking the model beyond Santa Monica
+#
+#synthetic_city() generates a seeded city of any size with the input files of the model: the consumer and depot node tables
+#("consumer_nodes edited.csv", "depot_nodes edited.csv", "consumer_nodes_new.csv"), "Entire Nodes.xlsx" and one arc table per
+#depot ("depot-x_arccs.xlsx": the depot and every node it serves, all ordered pairs). Streets and depots are spread uniformly
+#over a square city that grows with the number of nodes at Santa Monica's density, every company serves each street from its
+#nearest depot, the ZEDZ is a square in the city centre covering the requested share of its area, and arcs are the great-circle
+#distance times a random detour factor, driven at a constant speed. The same size and seed always give the same city.
+#
+#The benchmarks in "benchmarks/" run the model on these cities; SyntheticCity.write() saves one as input files to run the
+#script itself on.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .network import ARC_COLUMNS, build_arc_store, build_sparse_arc_store, write_arc_file
+from .router import EARTH_RADIUS, haversine
+from .synthesizer import COMPANY_ID_COLUMNS
+
+#The companies of the model and their share of the parcels (APP report)
+COMPANY_SHARE = {"USPS": 0.38, "UPS": 0.24, "Amazon Logistics": 0.21, "FedEx": 0.17}
+
+#Columns of the consumer nodes naming each company's depot and its parcel weight, as in "consumer_nodes edited.csv"
+COMPANY_DEPOT_COLUMNS = {"USPS": ("USPS_Depot_name", "USPS_Depot_parcel(kg)"), "UPS": ("UPS_Depot_name", "UPS_Depot_parcel(kg)"),
+                         "Amazon Logistics": ("Amazon_Depot_name", "Amazon_Depot_Depot_parcel(kg)"), "FedEx": ("FedEX_Depot_name", "FedEX_Depot_parcel(kg)")}
+
+#Columns of "Entire Nodes.xlsx" naming each company's depot of a street and its parcel weight
+ENTIRE_NODES_DEPOT_COLUMNS = {"USPS": ("USPS Depot", "pd(kg)"), "UPS": ("UPS Depot", "pd(kg).1"), "Amazon Logistics": ("Amazon Depot", "pd(kg).2"), "FedEx": ("FedEX Depot", "pd(kg).3")}
+
+#Santa Monica: about 350 consumer nodes on 22 km2, around this centre (latitude, longitude)
+NODE_DENSITY = 350 / 22e6
+CENTER = (34.02, -118.48)
+
+#Mean weight of a parcel (kg) and the spread of the daily parcels over the streets (sigma of a lognormal)
+PARCEL_WEIGHT = 1.1
+PARCEL_SPREAD = 0.5
+
+#Road distance over great-circle distance, drawn uniformly per arc, and the driving speed (m/s) of the arc durations
+DETOUR = (1.2, 1.6)
+SPEED = 9.0
+
+
+class SyntheticCity:
+    #The model inputs of the city: consumer_nodes / logistic_nodes as read from "consumer_nodes edited.csv" /
+    #"depot_nodes edited.csv", parcels_per_day for every consumer node, entire_nodes as read from "Entire Nodes.xlsx",
+    #depot_arcs {depot_id: arc table}, and the ZEDZ as (longitude, latitude) vertices
+    def __init__(self, consumer_nodes, logistic_nodes, parcels_per_day, entire_nodes, depot_arcs, company_names, company_share, zedz):
+        self.consumer_nodes = consumer_nodes
+        self.logistic_nodes = logistic_nodes
+        self.parcels_per_day = parcels_per_day
+        self.entire_nodes = entire_nodes
+        self.depot_arcs = depot_arcs
+        self.company_names = company_names
+        self.company_share = company_share
+        self.zedz = zedz
+
+    #Number of arcs of all depot arc tables
+    def arc_count(self):
+        return sum(len(arcs) for arcs in self.depot_arcs.values())
+
+    #Compiles the city's network like load_network() compiles the arc files (neighbours: into a SparseArcStore keeping that many
+    #neighbours per node)
+    def arc_store(self, neighbours=None):
+        depot_arcs = pd.concat(list(self.depot_arcs.values()), ignore_index=True)
+        if neighbours is not None:
+            return build_sparse_arc_store(self.entire_nodes, depot_arcs, neighbours)
+        return build_arc_store(self.entire_nodes, depot_arcs)
+
+    #Writes the city as the model's input files into directory (the arc tables as "depot-x_arccs.xlsx")
+    def write(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.consumer_nodes.to_csv(os.path.join(directory, "consumer_nodes edited.csv"), index=False)
+        self.consumer_nodes.drop(columns=list(COMPANY_ID_COLUMNS.values())).to_csv(os.path.join(directory, "consumer_nodes_new.csv"), index=False)
+        self.logistic_nodes.to_csv(os.path.join(directory, "depot_nodes edited.csv"), index=False)
+        self.entire_nodes.to_excel(os.path.join(directory, "Entire Nodes.xlsx"), index=False)
+        for depot_id, arcs in self.depot_arcs.items():
+            write_arc_file(arcs, os.path.join(directory, "depot-%d_arccs.xlsx" % depot_id))
+
+
+#Converts offsets (meters east, north) from CENTER into (latitude, longitude)
+def _to_coordinates(east, north):
+    lat = CENTER[0] + np.degrees(north / EARTH_RADIUS)
+    lon = CENTER[1] + np.degrees(east / (EARTH_RADIUS * np.cos(np.radians(CENTER[0]))))
+    return lat, lon
+
+
+#Arc table between the given rows of "Entire Nodes.xlsx" (every ordered pair), in the columns of the depot arc files
+def _arc_table(ids, lat, lon, rng):
+    n = len(ids)
+    straight = haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    dist = np.round(straight * rng.uniform(*DETOUR, size=(n, n)))
+    return pd.DataFrame({
+        "Distance in meter": dist.ravel().astype(np.int64),
+        "duration in seconds": np.round(dist / SPEED).ravel().astype(np.int64),
+        "origin_id": np.repeat(ids, n),
+        "destination_id": np.tile(ids, n),
+    }, columns=ARC_COLUMNS)
+
+
+#Generates a city of nodes consumer nodes and depots depots (shared out over the first carriers companies of COMPANY_SHARE,
+#every company getting at least one), parcels_per_day parcels in total and a ZEDZ covering zedz_share of the city's area
+def synthetic_city(nodes=350, depots=16, carriers=4, parcels_per_day=7000, zedz_share=0.1, seed=0):
+    company_names = list(COMPANY_SHARE)[:carriers]
+    if not 1 <= len(company_names) == carriers <= depots:
+        raise ValueError("carriers must be 1 to %d and at most the number of depots" % len(COMPANY_SHARE))
+    share = np.array([COMPANY_SHARE[name] for name in company_names])
+    share = share / share.sum()
+    rng = np.random.default_rng(seed)
+
+    side = np.sqrt(nodes / NODE_DENSITY)
+    street_lat, street_lon = _to_coordinates(*rng.uniform(-side / 2, side / 2, size=(2, nodes)))
+    depot_lat, depot_lon = _to_coordinates(*rng.uniform(-side / 2, side / 2, size=(2, depots)))
+    half = np.sqrt(zedz_share) * side / 2
+    south, west = _to_coordinates(-half, -half)
+    north, east = _to_coordinates(half, half)
+    zedz = [(west, south), (east, south), (east, north), (west, north)]
+    street_zedz = ((street_lat >= south) & (street_lat <= north) & (street_lon >= west) & (street_lon <= east)).astype(np.int64)
+    depot_zedz = ((depot_lat >= south) & (depot_lat <= north) & (depot_lon >= west) & (depot_lon <= east)).astype(np.int64)
+
+    #Depots go to the companies in proportion to their share; depot_id k is the k-th depot, grouped by company
+    per_company = np.ones(len(company_names), dtype=np.int64)
+    for _ in range(depots - len(company_names)):
+        per_company[np.argmax(share * depots - per_company)] += 1
+    depot_company = np.repeat(np.arange(len(company_names)), per_company)
+    depot_ids = np.arange(1, depots + 1)
+
+    #Parcels per street, and each company's depot of a street: its nearest one
+    pop = rng.lognormal(0.0, PARCEL_SPREAD, size=nodes)
+    parcels = parcels_per_day * pop / pop.sum()
+    kg = parcels * PARCEL_WEIGHT
+    straight = haversine(street_lat[:, None], street_lon[:, None], depot_lat[None, :], depot_lon[None, :])
+    serving = np.zeros((nodes, len(COMPANY_SHARE)), dtype=np.int64)
+    for c in range(len(company_names)):
+        own = np.flatnonzero(depot_company == c)
+        serving[:, c] = depot_ids[own[np.argmin(straight[:, own], axis=1)]]
+
+    street_ids = np.arange(1, nodes + 1)
+    addresses = np.char.add(np.char.add("Street ", street_ids.astype(str)), ", Synthetic City, CA")
+    consumer_nodes = pd.DataFrame({
+        "street_id": street_ids,
+        "street_address": addresses,
+        "latitude": street_lat,
+        "longitude": street_lon,
+        "ZEDZ(inside =1)": street_zedz,
+        "pop_distribution": pop * 100,
+        "parcel_delivered(#/year)": parcels * 365,
+        "parcel_delivered(#/day)": parcels,
+        "parcel_delivered(kg/day)": kg,
+    })
+    for c, name in enumerate(COMPANY_SHARE):
+        name_column, kg_column = COMPANY_DEPOT_COLUMNS[name]
+        served = c < len(company_names)
+        consumer_nodes[name_column] = np.char.add("depot-", serving[:, c].astype(str)) if served else "-"
+        consumer_nodes[kg_column] = kg * share[c] if served else 0.0
+    for c, name in enumerate(COMPANY_SHARE):
+        consumer_nodes[COMPANY_ID_COLUMNS[name]] = serving[:, c]
+
+    depot_parcels = np.array([parcels[serving[:, depot_company[d]] == depot_ids[d]].sum() * share[depot_company[d]] for d in range(depots)])
+    logistic_nodes = pd.DataFrame({
+        "logistics_company_id": depot_company + 1,
+        "logistics_company_name": np.array(company_names, dtype=object)[depot_company],
+        "logistics_company_share": share[depot_company],
+        "depot_id": depot_ids,
+        "depot_share": depot_parcels / max(depot_parcels.sum(), 1e-12),
+        "depot_parcel(#)": depot_parcels,
+        "depot_parcel(kg)": depot_parcels * PARCEL_WEIGHT,
+        "depot_address": np.char.add(np.char.add("Depot ", depot_ids.astype(str)), ", Synthetic City, CA"),
+        "depot_latitude": depot_lat,
+        "depot_longitude": depot_lon,
+        "ZEDZ(inside =1)": depot_zedz,
+    })
+
+    #"Entire Nodes.xlsx": the depots first, then the streets; "-" where a column does not apply
+    entire_nodes = pd.DataFrame({
+        "ID": np.arange(1, depots + nodes + 1),
+        "depot_id": np.concatenate([depot_ids.astype(object), np.full(nodes, "-", dtype=object)]),
+        "street_id": np.concatenate([np.full(depots, "-", dtype=object), street_ids.astype(object)]),
+        "longitude": np.concatenate([depot_lon, street_lon]),
+        "latitude": np.concatenate([depot_lat, street_lat]),
+        "location": ["Depot-%d" % d for d in depot_ids] + ["Street-%d" % s for s in street_ids],
+    })
+    for c, name in enumerate(COMPANY_SHARE):
+        name_column, kg_column = ENTIRE_NODES_DEPOT_COLUMNS[name]
+        served = c < len(company_names)
+        own_depot = np.where(depot_company == c, np.char.add("Depot-", depot_ids.astype(str)).astype(object), "-")
+        entire_nodes[name_column] = np.concatenate([own_depot, np.char.add("Depot-", serving[:, c].astype(str)).astype(object) if served else np.full(nodes, "-", dtype=object)])
+        entire_nodes[kg_column] = np.concatenate([np.full(depots, "-", dtype=object), (kg * share[c]).astype(object) if served else np.full(nodes, "-", dtype=object)])
+
+    #One arc table per depot: the depot and every street it serves
+    node_id = entire_nodes["ID"].to_numpy()
+    node_lat = entire_nodes["latitude"].to_numpy()
+    node_lon = entire_nodes["longitude"].to_numpy()
+    depot_arcs = {}
+    for d, depot_id in enumerate(depot_ids):
+        rows = np.concatenate([[d], depots + np.flatnonzero(serving[:, depot_company[d]] == depot_id)])
+        depot_arcs[int(depot_id)] = _arc_table(node_id[rows], node_lat[rows], node_lon[rows], rng)
+
+    parcels_per_day = [round(num) for num in parcels.tolist()]
+    return SyntheticCity(consumer_nodes, logistic_nodes, parcels_per_day, entire_nodes, depot_arcs, company_names, share.tolist(), zedz)
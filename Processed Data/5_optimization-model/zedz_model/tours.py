@@ -0,0 +1,286 @@
+#Tour formation (Part II + Part III of the ZEDZ Shipment Model)
+#
+#A tour is started at the first remaining shipment of a carrier and then repeatedly extended with the remaining receiver that is
+#closest (by driving distance) to the first stop of the tour, until the vehicle has made stops_per_vehicle stops. Once a receiver
+#is visited every other shipment to that receiver is dropped from the remaining shipments.
+#
+#One engine serves every carrier, vehicle class and ZEDZ policy: it works on integer index arrays into the shipment dataframe
+#and the arc store, and returns compact Tours arrays instead of one dataframe per tour.
+
+import numpy as np
+
+from . import kernels, profiling
+from .improve import improve_order
+from .savings import savings_order
+
+#Number of stops a vehicle makes before having to return to the depot.
+#Our analysis found that diesel vehicles can carry 30 shipments, EVs 33 (mainly because they don't have to refuel as often).
+VEHICLE_CAPACITY = {"diesel": 30, "EV": 33}
+
+#A candidate stop is only considered when it is closer than this (meters) to the stop it is measured from
+MAX_LEG = 1000000
+
+#Number of nearest neighbours per node checked before falling back to a scan of every remaining stop
+CANDIDATES = 32
+
+#Carriers, as named in the "Sender" column, and the prefix used for them in the result tables
+CARRIERS = {"UPS": "UPS", "Amazon Logistics": "Amazon", "USPS": "USPS", "FedEx": "FedEx"}
+
+
+#Shipments that must be served by an EV under a mandatory ZEDZ (receiver or sending depot inside the zone)
+def inside_zedz(shipments):
+    return ((shipments["Receiver_ZEDZ"] == 1) | (shipments["Sender_ZEDZ"] == 1)).to_numpy()
+
+
+#Shipments that never touch the zone
+def outside_zedz(shipments):
+    return ((shipments["Receiver_ZEDZ"] == 0) & (shipments["Sender_ZEDZ"] == 0)).to_numpy()
+
+
+#Policy sets: for every scenario, the partitions of a carrier's shipments as (partition label, shipment filter, vehicle class).
+#A filter of None keeps all of the carrier's shipments.
+SCENARIOS = {
+    "status quo": [("", None, "diesel")],
+    "mandatory ZEDZ": [("nZ", outside_zedz, "diesel"), ("Z", inside_zedz, "EV")],
+}
+
+
+class Tours:
+    #rows: row position in the shipment dataframe of every stop, tour after tour
+    #nodes: arc store index of the receiver of every stop
+    #legs: driving distance of every leg; the first leg of a tour runs from the depot to its first stop
+    #offsets: tour t is made up of the stops offsets[t]:offsets[t + 1]
+    #parcels: number of parcels delivered at every stop (None where unknown)
+    def __init__(self, rows, nodes, legs, offsets, carrier=None, vehicle=None, parcels=None):
+        self.rows = rows
+        self.nodes = nodes
+        self.legs = legs
+        self.offsets = offsets
+        self.carrier = carrier
+        self.vehicle = vehicle
+        self.parcels = parcels
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    #Row positions of the stops of tour t
+    def tour_rows(self, t):
+        return self.rows[self.offsets[t]:self.offsets[t + 1]]
+
+    #Number of stops of every tour
+    def stops(self):
+        return np.diff(self.offsets)
+
+    #Driving distance of every tour
+    def distances(self):
+        if len(self) == 0:
+            return np.zeros(0)
+        return np.add.reduceat(self.legs, self.offsets[:-1])
+
+    #Number of parcels delivered on every tour
+    def tour_parcels(self):
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.add.reduceat(self.parcels, self.offsets[:-1])
+
+
+#Forms the tours of one set of shipments (rows of shipment_df) served by one vehicle class.
+#shipment_df needs the "Receiver_ID" and "Distance" (depot to receiver) columns. Its rows may be parcels or stops (see
+#consolidation.py): every parcel to a receiver is delivered at one stop, counting the "Quantity" of every row if there is one.
+#nearest_to="first" measures candidates from the first stop of the tour, as the model always has; "last" measures them from
+#the stop the vehicle is currently at.
+#candidates is the number of nearest neighbours per node (from the arc store) checked before scanning every remaining stop;
+#the result is the same either way, candidates=None always scans.
+#improve reorders the stops of every tour with 2-opt / Or-opt moves (see improve.py): True with the default budget, or a dict of
+#improve_order() budget arguments (max_iterations, time_limit).
+#engine="savings" builds the tours with the Clarke-Wright savings engine (see savings.py) instead of the greedy one; it also keeps
+#every tour within payload (kg), counting the "Weight" column of shipment_df if there is one (nearest_to and candidates only
+#apply to the greedy engine).
+def form_tours(shipment_df, rows, arc_store, capacity, nearest_to="first", carrier=None, vehicle=None, candidates=CANDIDATES, improve=False, engine="greedy", payload=None):
+    rows = np.asarray(rows, dtype=np.int64)
+    receiver_ids = shipment_df["Receiver_ID"].to_numpy()[rows]
+
+    #Only the first shipment to each receiver becomes a stop, in order of appearance
+    _, first, receiver = np.unique(receiver_ids, return_index=True, return_inverse=True)
+    by_appearance = np.argsort(first)
+    first = first[by_appearance]
+    stop_rows = rows[first]
+    nodes = arc_store.street_index(receiver_ids[first])
+    if (nodes < 0).any():
+        raise KeyError("street_id not found in the arc store: %s" % receiver_ids[first][nodes < 0].tolist())
+    depot_legs = shipment_df["Distance"].to_numpy(dtype=np.float64)[stop_rows]
+
+    #Stop of every shipment, so a stop carries the parcels and the weight of all shipments to its receiver
+    stop_of = np.empty(len(first), dtype=np.int64)
+    stop_of[by_appearance] = np.arange(len(first))
+    stop_of = stop_of[receiver.ravel()]
+    quantity = shipment_df["Quantity"].to_numpy(dtype=np.float64)[rows] if "Quantity" in shipment_df.columns else None
+    parcels = np.bincount(stop_of, quantity, minlength=len(first)).astype(np.int64)
+
+    #The compiled kernels read a dense arc matrix; sparse and routed arc stores keep to the NumPy path
+    compiled = kernels.ENABLED and isinstance(arc_store.dist, np.ndarray)
+    if engine == "savings":
+        weights = None
+        if "Weight" in shipment_df.columns:
+            weights = np.bincount(stop_of, shipment_df["Weight"].to_numpy(dtype=np.float64)[rows], minlength=len(first))
+        order, offsets = savings_order(nodes, arc_store.dist, depot_legs, capacity, MAX_LEG, weights, payload)
+        profiling.count("distance lookups", len(nodes) ** 2)
+    elif engine == "greedy" and compiled:
+        order, offsets = kernels.greedy_order(nodes, arc_store.dist, capacity, nearest_to, MAX_LEG)
+    elif engine == "greedy":
+        neighbours = arc_store.neighbours(candidates) if candidates else None
+        order, offsets = _greedy_order(nodes, arc_store.dist, capacity, nearest_to, neighbours)
+    else:
+        raise ValueError("unknown tour engine: %r" % engine)
+    if improve:
+        order = improve_order(arc_store.dist, nodes, depot_legs, order, offsets, MAX_LEG, **(improve if isinstance(improve, dict) else {}))
+        profiling.count("distance lookups", int(np.sum(np.diff(offsets) ** 2)))
+
+    if len(order) and compiled:
+        ordered_nodes = nodes[order]
+        legs = kernels.tour_legs(ordered_nodes, offsets, arc_store.dist, depot_legs[order[offsets[:-1]]])
+    elif len(order):
+        legs = np.empty(len(order))
+        ordered_nodes = nodes[order]
+        legs[1:] = arc_store.dist[ordered_nodes[:-1], ordered_nodes[1:]]
+        legs[offsets[:-1]] = depot_legs[order[offsets[:-1]]]
+        profiling.count("distance lookups", len(order) - 1)
+    else:
+        legs = np.empty(0)
+        ordered_nodes = nodes[:0]
+    return Tours(stop_rows[order], ordered_nodes, legs, offsets, carrier, vehicle, parcels[order])
+
+
+#Greedy nearest-neighbour ordering of stops 0..n-1 (nodes are their arc store indices).
+#With neighbours (see ArcStore.neighbours) each step first walks the anchor's sorted neighbour list; only when that list cannot
+#decide the nearest remaining stop are all remaining stops scanned.
+#Returns the visiting order and the tour offsets into it.
+def _greedy_order(nodes, dist, capacity, nearest_to, neighbours=None):
+    n = len(nodes)
+    order = np.empty(n, dtype=np.int64)
+    offsets = [0]
+    visited = np.zeros(n, dtype=bool)
+    if neighbours is not None:
+        position = np.full(len(dist), -1, dtype=np.int64)
+        position[nodes] = np.arange(n)
+    next_start = 0
+    count = 0
+    row = None
+    row_anchor = -1
+    list_anchor = -1
+    list_pos = 0
+    listed = scans = rows_read = 0
+    while count < n:
+        #A new tour starts at the first remaining stop
+        while visited[next_start]:
+            next_start += 1
+        current = first_stop = next_start
+        visited[current] = True
+        order[count] = current
+        count += 1
+        tour_len = 1
+        while tour_len < capacity and count < n:
+            anchor = first_stop if nearest_to == "first" else current
+            chosen = -1
+            if neighbours is not None:
+                #Stops already passed in the anchor's list are visited for good, so the walk resumes where it stopped
+                if anchor != list_anchor:
+                    list_anchor = anchor
+                    list_pos = 0
+                chosen, list_pos = _nearest_listed(nodes[anchor], neighbours, position, visited, list_pos)
+                listed += chosen != -1
+            if chosen == -1:
+                scans += 1
+                if anchor != row_anchor:
+                    rows_read += 1
+                    row = np.asarray(dist[nodes[anchor], nodes], dtype=np.float64)
+                    row = np.where(np.isnan(row) | (row >= MAX_LEG), np.inf, row)
+                    row_anchor = anchor
+                candidates = np.where(visited, np.inf, row)
+                chosen = int(np.argmin(candidates))
+                if candidates[chosen] == np.inf:
+                    chosen = -2
+            #No reachable candidate: close the tour and start the next one from the depot
+            if chosen == -2:
+                break
+            visited[chosen] = True
+            order[count] = chosen
+            count += 1
+            tour_len += 1
+            current = chosen
+        offsets.append(count)
+    #Decided from a neighbour list, decided by scanning every remaining stop, and arc rows read for those scans
+    profiling.count({"neighbour list hits": listed, "full scans": scans, "arc rows read": rows_read, "distance lookups": rows_read * n})
+    return order, np.asarray(offsets, dtype=np.int64)
+
+
+#Looks up the nearest remaining stop to anchor_node in its sorted neighbour list, starting at list_pos.
+#Returns (stop, list_pos) where stop is -2 if no remaining stop is reachable and -1 if the list is too short to decide
+#(every listed node is visited or not a stop, or the closest distance ties with the end of the list).
+def _nearest_listed(anchor_node, neighbours, position, visited, list_pos):
+    nearest, nearest_dist = neighbours
+    listed = nearest[anchor_node]
+    listed_dist = nearest_dist[anchor_node]
+    k = len(listed)
+    while list_pos < k:
+        stop = position[listed[list_pos]]
+        if stop >= 0 and not visited[stop]:
+            break
+        list_pos += 1
+    if list_pos == k:
+        return -1, list_pos
+    best_dist = listed_dist[list_pos]
+    if not best_dist < MAX_LEG:
+        return -2, list_pos
+    #Among stops at the same distance the earliest shipment wins
+    best = stop
+    j = list_pos + 1
+    while j < k and listed_dist[j] == best_dist:
+        stop = position[listed[j]]
+        if stop >= 0 and not visited[stop] and stop < best:
+            best = stop
+        j += 1
+    if j == k:
+        return -1, list_pos
+    return best, list_pos
+
+
+#The partitions of every carrier's shipments under a scenario of SCENARIOS, as (carrier, partition label, vehicle, rows)
+def scenario_partitions(shipment_df, scenario, carriers=CARRIERS):
+    sender = shipment_df["Sender"].to_numpy()
+    for carrier in carriers:
+        carrier_mask = sender == carrier
+        for label, shipment_filter, vehicle in SCENARIOS[scenario]:
+            mask = carrier_mask if shipment_filter is None else carrier_mask & shipment_filter(shipment_df)
+            yield carrier, label, vehicle, np.flatnonzero(mask)
+
+
+#Payload capacity (kg) of a vehicle class from a {vehicle: kg} dict (None: no payload limit)
+def _payload(payloads, vehicle):
+    return None if payloads is None else payloads.get(vehicle)
+
+
+#Forms the tours of every carrier under a scenario of SCENARIOS.
+#payloads gives the payload capacity (kg) per vehicle class for engine="savings".
+#Returns a dict keyed by (carrier, partition label) whose values are Tours.
+def scenario_tours(shipment_df, arc_store, scenario, carriers=CARRIERS, capacities=VEHICLE_CAPACITY, nearest_to="first", candidates=CANDIDATES, improve=False, engine="greedy", payloads=None):
+    results = {}
+    for carrier, label, vehicle, rows in scenario_partitions(shipment_df, scenario, carriers):
+        results[(carrier, label)] = form_tours(shipment_df, rows, arc_store, capacities[vehicle], nearest_to, carrier, vehicle, candidates, improve, engine, _payload(payloads, vehicle))
+    return results
+
+
+#Joins the tours of several shipment sets (e.g. the depots of one carrier) into one Tours, tour after tour
+def concat_tours(tours_list, carrier=None, vehicle=None):
+    if not tours_list:
+        return Tours(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(1, dtype=np.int64), carrier, vehicle, np.zeros(0, dtype=np.int64))
+    starts = np.cumsum([0] + [len(tours.rows) for tours in tours_list[:-1]])
+    offsets = np.concatenate([[0]] + [tours.offsets[1:] + start for tours, start in zip(tours_list, starts)])
+    parcels = None if any(tours.parcels is None for tours in tours_list) else np.concatenate([tours.parcels for tours in tours_list])
+    return Tours(np.concatenate([tours.rows for tours in tours_list]), np.concatenate([tours.nodes for tours in tours_list]),
+                 np.concatenate([tours.legs for tours in tours_list]), offsets.astype(np.int64), carrier, vehicle, parcels)
+
+
+#Converts Tours back into a list of dataframes, one per tour, in the layout the result tables are built from
+def tours_to_frames(shipment_df, tours):
+    return [shipment_df.iloc[tours.tour_rows(t)].reset_index(drop=True) for t in range(len(tours))]
@@ -0,0 +1,153 @@
+#Point-in-polygon classification of nodes: the ZEDZ flag and census tracts
+#
+#within_polygon.ipynb labelled every point with one sympy encloses_point call per point and polygon, in exact rational arithmetic,
+#with a copy of the loop for the ZEDZ and each of the 19 tracts. PolygonSet tests every point against every polygon at once with
+#even-odd ray casting in floating point: a bounding-box test first keeps only the (point, polygon) pairs that can match, then the
+#crossings of all edges of those pairs are counted in chunked NumPy arrays. Classifying the nodes against thousands of candidate
+#zone boundaries is a single call.
+#
+#Coordinates are (longitude, latitude) pairs throughout, like the tract polygons of the notebook (its ZEDZ polygon was written as
+#(latitude, longitude) and is swapped in ZEDZ_POLYGON below). Points on a boundary may fall on either side.
+#
+#The "ZEDZ(inside =1)" column of the shipped node tables stays the model's source of truth: the synthesizer reads it, and
+#zedz_flags() / classify_nodes() keep the flags a table already has and test only the points without one (new nodes). The
+#polygon does not reproduce the shipped column exactly: it puts streets 125, 240, 264 and 346 inside and street 328 outside,
+#against the column (all five within 230 m of the boundary), and changing the flags of shipped nodes would change the model's
+#results.
+
+import ast
+import json
+import re
+
+import numpy as np
+
+#The ZEDZ of the model (within_polygon.ipynb), as (longitude, latitude)
+ZEDZ_POLYGON = [(-118.503558, 34.015068), (-118.494538, 34.022147), (-118.482989, 34.012335), (-118.470498, 34.002682),
+                (-118.483376, 33.995338), (-118.503397, 34.014969)]
+
+#(point, polygon, edge) triples checked per chunk, bounding the memory of a classification
+CHUNK_EDGES = 1 << 22
+
+
+class PolygonSet:
+    #polygons: list of rings, each a sequence of (longitude, latitude) vertices (closing the ring is optional)
+    #names: name of every polygon (default 1, 2, ...)
+    def __init__(self, polygons, names=None):
+        rings = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygons]
+        self.names = list(names) if names is not None else list(range(1, len(rings) + 1))
+        self.bounds = np.array([[ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()] for ring in rings]).reshape(-1, 4)
+        #Edges of every polygon, polygon after polygon: polygon k owns edges edge_offsets[k]:edge_offsets[k + 1]
+        starts = np.concatenate(rings) if rings else np.zeros((0, 2))
+        ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings]) if rings else np.zeros((0, 2))
+        self.x1, self.y1 = starts[:, 0], starts[:, 1]
+        self.x2, self.y2 = ends[:, 0], ends[:, 1]
+        self.edge_offsets = np.concatenate([[0], np.cumsum([len(ring) for ring in rings])]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    #Boolean matrix (points x polygons): whether each point lies inside each polygon
+    def contains(self, lon, lat):
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        inside = np.zeros((len(lon), len(self)), dtype=bool)
+
+        #Only (point, polygon) pairs within the polygon's bounding box need their edges checked
+        in_box = ((lon[:, None] >= self.bounds[:, 0]) & (lat[:, None] >= self.bounds[:, 1])
+                  & (lon[:, None] <= self.bounds[:, 2]) & (lat[:, None] <= self.bounds[:, 3]))
+        point, polygon = np.nonzero(in_box)
+        edge_count = np.diff(self.edge_offsets)[polygon]
+
+        start = 0
+        while start < len(point):
+            #As many pairs as fit CHUNK_EDGES edge checks (at least one)
+            stop = start + max(1, int(np.searchsorted(np.cumsum(edge_count[start:]), CHUNK_EDGES, side="right")))
+            p, k, counts = point[start:stop], polygon[start:stop], edge_count[start:stop]
+            pair = np.repeat(np.arange(len(p)), counts)
+            edge = np.repeat(self.edge_offsets[k] - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) + np.arange(counts.sum())
+            px, py = lon[p][pair], lat[p][pair]
+            x1, y1, x2, y2 = self.x1[edge], self.y1[edge], self.x2[edge], self.y2[edge]
+            straddles = (y1 > py) != (y2 > py)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                crossing_x = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+            crossings = np.bincount(pair, weights=straddles & (px < crossing_x), minlength=len(p))
+            inside[p, k] = crossings % 2 == 1
+            start = stop
+        return inside
+
+    #Name of the first polygon containing each point, or missing where no polygon does
+    def first_containing(self, lon, lat, missing=0):
+        inside = self.contains(lon, lat)
+        names = np.asarray(self.names, dtype=object)
+        return np.where(inside.any(axis=1), names[inside.argmax(axis=1)] if len(self) else missing, missing)
+
+
+#Reads the Polygon / MultiPolygon features of a GeoJSON file (outer rings only), named by the given property
+def load_polygons(path, name_property="name"):
+    with open(path) as f:
+        features = json.load(f)["features"]
+    rings, names = [], []
+    for number, feature in enumerate(features, 1):
+        geometry = feature.get("geometry") or {}
+        name = (feature.get("properties") or {}).get(name_property, number)
+        if geometry.get("type") == "Polygon":
+            rings.append(geometry["coordinates"][0])
+            names.append(name)
+        elif geometry.get("type") == "MultiPolygon":
+            for polygon in geometry["coordinates"]:
+                rings.append(polygon[0])
+                names.append(name)
+    return PolygonSet(rings, names)
+
+
+#The census tract polygons written into within_polygon.ipynb as "pointsN = [(lon, lat), ...]", named by N
+def notebook_tracts(path):
+    with open(path) as f:
+        cells = json.load(f)["cells"]
+    tracts = {}
+    for cell in cells:
+        for number, points in re.findall(r"points(\d+)\s*=\s*(\[.*?\])", "".join(cell["source"]), re.S):
+            tracts[int(number)] = ast.literal_eval(points)
+    numbers = sorted(tracts)
+    return PolygonSet([tracts[number] for number in numbers], numbers)
+
+
+#ZEDZ flag (uint8) of every point, for the model's zone or another boundary given as (longitude, latitude) vertices. known:
+#flags already known (e.g. a node table's "ZEDZ(inside =1)" column), NaN where a point has none; only those points are tested
+#against the polygon
+def zedz_flags(lon, lat, polygon=ZEDZ_POLYGON, known=None):
+    if known is None:
+        return PolygonSet([polygon]).contains(lon, lat)[:, 0].astype(np.uint8)
+    known = np.asarray(known, dtype=np.float64)
+    flags = np.nan_to_num(known).astype(np.uint8)
+    unknown = np.isnan(known)
+    if unknown.any():
+        flags[unknown] = PolygonSet([polygon]).contains(np.asarray(lon, dtype=np.float64)[unknown], np.asarray(lat, dtype=np.float64)[unknown])[:, 0]
+    return flags
+
+
+#Copy of a node table (with "latitude" / "longitude" columns, or the depot_ ones of the depot nodes) with its
+#"ZEDZ(inside =1)" column filled in and, when tracts are given, a "tract" column (0 outside every tract). The flags the table
+#already has are kept, and the rows without one are tested against the model's zone; given another boundary as zedz, every
+#row is classified against it instead.
+def classify_nodes(nodes, zedz=None, tracts=None):
+    prefix = "depot_" if "depot_latitude" in nodes.columns else ""
+    lon = nodes[prefix + "longitude"].to_numpy(dtype=np.float64)
+    lat = nodes[prefix + "latitude"].to_numpy(dtype=np.float64)
+    known = nodes["ZEDZ(inside =1)"].to_numpy(dtype=np.float64) if zedz is None and "ZEDZ(inside =1)" in nodes.columns else None
+    nodes = nodes.copy()
+    nodes["ZEDZ(inside =1)"] = zedz_flags(lon, lat, ZEDZ_POLYGON if zedz is None else zedz, known)
+    if tracts is not None:
+        nodes["tract"] = tracts.first_containing(lon, lat)
+    return nodes
+
+
+#ScenarioEngine.sweep() variants for candidate zone boundaries: for every polygon the street_ids of the consumer nodes and the
+#depot_ids of the depot nodes inside it
+def zone_variants(consumer_nodes, logistic_nodes, candidates):
+    streets = candidates.contains(consumer_nodes["longitude"].to_numpy(dtype=np.float64), consumer_nodes["latitude"].to_numpy(dtype=np.float64))
+    depots = candidates.contains(logistic_nodes["depot_longitude"].to_numpy(dtype=np.float64), logistic_nodes["depot_latitude"].to_numpy(dtype=np.float64))
+    street_ids = consumer_nodes["street_id"].to_numpy()
+    depot_ids = logistic_nodes["depot_id"].to_numpy()
+    return [{"name": name, "zedz_streets": street_ids[streets[:, k]], "zedz_depots": depot_ids[depots[:, k]]}
+            for k, name in enumerate(candidates.names)]